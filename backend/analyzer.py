@@ -1,111 +1,541 @@
 # backend/analyzer.py
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
-import json, re
+import asyncio
+import json, os, re
 
-from scripts.get_recent_transactions import get_recent_transactions_with_scores
-
-
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from backend.cache import normalize_message, response_cache
+from backend.chats import get_chat_store
+from backend.context import CHAT_WINDOW_TURNS, FLAGS_LEGEND, build_compact_context, build_conversation_context
+from backend.intents import intent_index
+from backend.llm import REPLY_SCHEMA, LLMQueueFull, llm_queue
+from backend.metrics import llm_errors, logger, record_result, sample_log, span, start_trace
+from backend.resilience import CircuitOpen
+from backend.risk import get_risk_aggregates
+from backend.store import get_store
+from backend.triage import classify_by_model, classify_by_rules
 
 import pandas as pd
 
-# Load fraud scores from CSV once at startup
-FRAUD_PATH = "data/fraud_scores.csv"
-
-fraud_df = None
-if os.path.exists(FRAUD_PATH):
-    fraud_df = pd.read_csv(FRAUD_PATH)
-else:
-    print("⚠️ No fraud_scores.csv found — running without risk context.")
-
 
 def get_user_risk_summary(user_id: str) -> str:
     """Return summarized fraud context for a user."""
-    if fraud_df is None or user_id not in fraud_df["user_id"].values:
+    with span("risk_summary"):
+        risk = get_risk_aggregates().get(user_id)
+    if risk is None:
         return "No fraud risk data available."
-    
-    user_txns = fraud_df[fraud_df["user_id"] == user_id]
-    mean_score = round(user_txns["fraud_score"].mean(), 3)
-    high_risk_pct = round((user_txns["fraud_label"].mean()) * 100, 1)
-    
-    tier = "High" if mean_score > 0.75 else "Medium" if mean_score > 0.4 else "Low"
-    return f"User fraud risk: {tier} (avg score {mean_score}, {high_risk_pct}% of recent transactions flagged)."
-
-# load once (or at app start)
-txns_df = pd.read_csv("data/transactions.csv", parse_dates=["timestamp"], keep_default_na=False)
-fraud_df = pd.read_csv("data/fraud_scores.csv")
-
-def get_fraud_transactions_for_user(user_id: str) -> pd.DataFrame:
+
+    mean_score = round(risk.mean_score, 3)
+    high_risk_pct = round(risk.flagged_pct, 1)
+    return f"User fraud risk: {risk.tier} (avg score {mean_score}, {high_risk_pct}% of recent transactions flagged)."
+
+def get_fraud_transactions_for_user(user_id: str, store=None) -> pd.DataFrame:
     """Return full transaction rows flagged as fraud for user_id, newest first."""
-    # filter fraud rows for the user
-    user_fraud = fraud_df[(fraud_df["user_id"] == user_id) & (fraud_df["fraud_label"] == 1)]
+    # the store keeps flagged rows pre-joined and sorted per user
+    with span("fraud_transactions"):
+        store = store or get_store()
+        user_fraud = store.flagged(user_id)
 
     if user_fraud.empty:
-        return pd.DataFrame(columns=txns_df.columns)  # empty df with same schema
+        return pd.DataFrame(columns=store.txn_columns)  # empty df with same schema
+    return user_fraud
 
-    # merge to get full txn details
-    merged = user_fraud.merge(txns_df, on="txn_id", how="left", suffixes=("_f",""))
-    # prefer the full txn columns from txns_df; sort newest first
-    if "timestamp" in merged.columns:
-        merged["timestamp"] = pd.to_datetime(merged["timestamp"], utc=True, errors="coerce")
-        merged = merged.sort_values("timestamp", ascending=False)
-    return merged
 
 
+# how many messages of one batch may be waiting on the model at once
+BATCH_CONCURRENCY = int(os.getenv("NOVAROUTE_BATCH_CONCURRENCY", "16"))
 
-# # Define your model
-model = genai.GenerativeModel("gemini-2.5-flash")
+# the local tier answers on its own only at or above this confidence
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("NOVAROUTE_LOCAL_CONFIDENCE", "0.85"))
 
-def analyze_message_with_gemini(message: str, user_id: str) -> dict:
-    """Ask Gemini to classify a message and produce a short response with fraud context."""
-    risk_info = get_user_risk_summary(user_id)
-    print(get_fraud_transactions_for_user(user_id))
+# flagged transaction ids included in a sampled context log line
+LOG_FLAGGED_IDS = 5
+
+PRIORITIES = ("LOW", "MEDIUM", "HIGH")
+# the least urgent priority a fallback answer gets for each fraud tier
+TIER_PRIORITY = {"Low": "LOW", "Medium": "MEDIUM", "High": "HIGH"}
+FALLBACK_CONFIDENCE = 0.5
 
-    df = get_recent_transactions_with_scores(user_id, n=10)
-    json_str = df.to_json(orient="records", indent=2)
+LOCAL_RESPONSES = {
+    "HIGH": "I'm connecting you with a specialist right away. Please don't share your card details with anyone in the meantime.",
+    "MEDIUM": "Thanks for reaching out. A support agent will follow up on this shortly.",
+    "LOW": "Thanks for your question! You can manage this from Settings in the app, or reply here if you need more help.",
+}
 
-    prompt = f"""
+
+def build_user_context(user_id: str) -> dict:
+    """
+    Collect the per-user part of the prompt: fraud summary, activity figures,
+    ranked transactions and the recent conversation.
+    """
+    with span("user_context"):
+        # one store for the whole context, so every part reads the same version
+        store = get_store()
+        risk_info = get_user_risk_summary(user_id)
+        flagged = get_fraud_transactions_for_user(user_id, store)
+        context = build_compact_context(user_id, risk_info, flagged, store=store)
+    with span("conversation_context"):
+        chats = get_chat_store()
+        turns = chats.history(user_id, limit=CHAT_WINDOW_TURNS)
+        context["conversation"] = build_conversation_context(turns, chats.summary(user_id) if turns else None)
+    sample_log(
+        "user_context", user_id=user_id, flagged=len(flagged),
+        flagged_txn_ids=flagged["txn_id"].head(LOG_FLAGGED_IDS).tolist(), context_tokens=context["tokens"],
+    )
+    return context
+
+
+def build_prompt(message: str, user_id: str, context: dict | None = None) -> str:
+    """Assemble the classification prompt from the user's fraud context and recent transactions."""
+    if context is None:
+        with span("build_prompt"):
+            context = build_user_context(user_id)
+    risk_info = context["risk_info"]
+    summary = context["summary"]
+    table = context["transactions"]
+    conversation = context["conversation"]
+
+    return f"""
     You are a Capital One customer service assistant.
     Below is the user's fraud analysis summary and message.
 
     FRAUD CONTEXT:
     {risk_info}
+    {summary}
 
-    RECENT TRANSACTIONS WITH FRAUD SCORES:
-    {json_str}
+    RECENT TRANSACTIONS WITH FRAUD SCORES ({FLAGS_LEGEND}):
+{table}
+
+    EARLIER IN THIS CONVERSATION (oldest first, [priority] message):
+{conversation}
 
     USER MESSAGE:
     "{message}"
 
-    Based on both the fraud context and message content, classify the issue as HIGH, MEDIUM, or LOW priority:
+    Based on the fraud context, the conversation so far and the message, classify the issue as HIGH, MEDIUM, or LOW priority:
     - HIGH: Fraud, suspicious activity, financial distress, or high-risk account.
     - MEDIUM: Payment issues, balance questions, routine service requests.
     - LOW: General information, settings, or low-risk topics.
 
     If the FRAUD CONTEXT indicates low risk, classify the context with less priority.
 
-    Respond with this JSON:
+    Respond with this JSON, keys in this order:
     {{
       "priority": "HIGH|MEDIUM|LOW",
+      "confidence": 0.9,
       "response": "short helpful message to the user",
-      "info": "information about the client that will help the support agent",
-      "confidence": 0.9
+      "info": "information about the client that will help the support agent"
     }}
     """
 
+
+class InvalidReply(ValueError):
+    """Raised when the model's reply is not a JSON object matching REPLY_SCHEMA."""
+
+
+def _json_object(text: str) -> dict:
+    """The reply as a JSON object: the whole text, or else the first complete object inside it."""
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # models without constrained output sometimes wrap the object in prose or a code fence
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    while start != -1:
+        try:
+            return decoder.raw_decode(text, start)[0]
+        except ValueError:
+            start = text.find("{", start + 1)
+    raise InvalidReply("no JSON object in reply")
+
+
+def parse_response(text: str) -> dict:
+    """Validate the model's reply against REPLY_SCHEMA; raises InvalidReply instead of guessing."""
+    with span("parse_response"):
+        reply = _json_object(text)
+        if not isinstance(reply, dict):
+            raise InvalidReply("reply is not a JSON object")
+        missing = [key for key in REPLY_SCHEMA["required"] if key not in reply]
+        if missing:
+            raise InvalidReply(f"reply is missing {', '.join(missing)}")
+        priority = reply["priority"].upper() if isinstance(reply["priority"], str) else None
+        if priority not in PRIORITIES:
+            raise InvalidReply(f"unknown priority {reply['priority']!r}")
+        confidence = reply["confidence"]
+        if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+            raise InvalidReply(f"confidence {confidence!r} is not a number")
+        if not all(isinstance(reply[key], str) for key in ("response", "info")):
+            raise InvalidReply("response and info must be strings")
+        return {
+            "priority": priority, "response": reply["response"], "info": reply["info"],
+            "confidence": min(max(float(confidence), 0.0), 1.0), "answered_by": "llm",
+        }
+
+
+def fallback_response(message: str, user_id: str, reason: str) -> dict:
+    """
+    Deterministic answer for when the model can't be used. The priority is the
+    more urgent of what the local tiers make of the message and what the
+    user's fraud tier calls for, so a provider outage never quietly turns a
+    fraud case into LOW. The local text model only counts when it is at least
+    LOCAL_CONFIDENCE_THRESHOLD sure, as in local_triage: an unsure guess must
+    not escalate routine chat.
+    """
+    risk = get_risk_aggregates().get(user_id)
+    tier = risk.tier if risk else "Low"
+    rule = classify_by_rules(message, tier)
+    if rule is not None:
+        from_message, source = rule[0], f"matched '{rule[2]}'"
+    else:
+        model = classify_by_model(message, risk.mean_score if risk else 0.0, risk.flagged_pct if risk else 0.0, wait=False)
+        if model is not None and model[1] >= LOCAL_CONFIDENCE_THRESHOLD:
+            from_message, source = model[0], "local text model"
+        else:
+            from_message, source = "LOW", "no local match"
+    priority = max(from_message, TIER_PRIORITY[tier], key=PRIORITIES.index)
+    return {
+        "priority": priority,
+        "response": LOCAL_RESPONSES[priority],
+        "info": f"Model unavailable ({reason}); fraud risk {tier}, {source}.",
+        "confidence": FALLBACK_CONFIDENCE,
+        "answered_by": "fallback",
+    }
+
+
+def llm_failed(e: Exception, message: str, user_id: str) -> dict:
+    """Log a model call that failed for good; returns the fallback response."""
+    if isinstance(e, CircuitOpen):
+        reason = "circuit open"
+    elif isinstance(e, TimeoutError):
+        reason = "deadline exceeded"
+    elif isinstance(e, InvalidReply):
+        reason = "invalid reply"
+    else:
+        reason = "model error"
+    logger.warning("LLM call failed, answering with the fallback: %r", e)
+    return fallback_response(message, user_id, reason)
+
+
+def finish(result: dict, user_id: str) -> dict:
+    """Record an analyze result in the metrics and the sampled log; returns it unchanged."""
+    record_result(result)
+    sample_log(
+        "analyze", user_id=user_id, priority=result.get("priority"),
+        answered_by=result.get("answered_by"), confidence=result.get("confidence"),
+    )
+    return result
+
+
+PRIORITY_FIELD = re.compile(r'"priority"\s*:\s*"(HIGH|MEDIUM|LOW)"', re.IGNORECASE)
+# a number followed by its delimiter, so "0." is not taken for the final value
+CONFIDENCE_FIELD = re.compile(r'"confidence"\s*:\s*([0-9]*\.?[0-9]+)\s*[,}\n]')
+
+
+def _partial_string(text: str, field: str) -> str | None:
+    """The decoded value of a JSON string field, as much of it as has arrived."""
+    match = re.search(rf'"{field}"\s*:\s*"', text)
+    if not match:
+        return None
+    start = end = match.end()
+    while end < len(text) and text[end] != '"':
+        if text[end] == "\\":
+            step = 6 if text[end + 1:end + 2] == "u" else 2
+            if end + step > len(text):
+                break  # escape sequence split across chunks
+            end += step
+        else:
+            end += 1
+    try:
+        return json.loads(f'"{text[start:end]}"')
+    except ValueError:
+        return None
+
+
+class StreamingReplyParser:
+    """
+    Picks fields out of the model's JSON reply while it is still streaming:
+    priority and confidence as soon as both are complete, then the response
+    and info strings as they grow. The finished text still goes through
+    parse_response for the authoritative, validated result.
+    """
+
+    TEXT_FIELDS = ("response", "info")
+
+    def __init__(self):
+        self.text = ""
+        self.routed = False
+        self._sent = {field: 0 for field in self.TEXT_FIELDS}
+
+    def feed(self, chunk: str) -> list[tuple[str, dict]]:
+        """Add a chunk; return the events it makes available, as (event, data) pairs."""
+        self.text += chunk
+        events = []
+        if not self.routed:
+            priority = PRIORITY_FIELD.search(self.text)
+            confidence = CONFIDENCE_FIELD.search(self.text)
+            # don't hold routing back if the model put the text before the confidence
+            if priority and (confidence or f'"{self.TEXT_FIELDS[0]}"' in self.text):
+                self.routed = True
+                events.append(("priority", {
+                    "priority": priority.group(1).upper(),
+                    "confidence": float(confidence.group(1)) if confidence else None,
+                }))
+        for field in self.TEXT_FIELDS:
+            value = _partial_string(self.text, field)
+            if value is not None and len(value) > self._sent[field]:
+                events.append((field, {"delta": value[self._sent[field]:]}))
+                self._sent[field] = len(value)
+        return events
+
+
+def local_triage(message: str, user_id: str) -> dict | None:
+    """
+    Classify with the local rules, then the local text model, and return a
+    full response if either is at least LOCAL_CONFIDENCE_THRESHOLD sure.
+    Returns None when the message should go to the LLM.
+    """
+    with span("local_triage"):
+        return _local_triage(message, user_id)
+
+
+def _local_triage(message: str, user_id: str) -> dict | None:
+    risk = get_risk_aggregates().get(user_id)
+    mean_score = risk.mean_score if risk else 0.0
+    flagged_pct = risk.flagged_pct if risk else 0.0
+    tier = risk.tier if risk else "Low"
+
+    rule = classify_by_rules(message, tier)
+    if rule is not None and rule[1] >= LOCAL_CONFIDENCE_THRESHOLD:
+        priority, confidence, matched = rule
+        answered_by, reason = "rules", f"matched '{matched}'"
+    else:
+        # while the worker is still warming up, don't hold the request for the model load
+        model = classify_by_model(message, mean_score, flagged_pct, wait=False)
+        if model is None or model[1] < LOCAL_CONFIDENCE_THRESHOLD:
+            return None
+        priority, confidence = model
+        answered_by, reason = "local_model", "local text model"
+
+    return {
+        "priority": priority,
+        "response": LOCAL_RESPONSES[priority],
+        "info": f"Fraud risk {tier} (avg score {round(mean_score, 3)}, {round(flagged_pct, 1)}% flagged); {reason}.",
+        "confidence": round(confidence, 2),
+        "answered_by": answered_by,
+    }
+
+
+def intent_match(message: str, user_id: str) -> dict | None:
+    """
+    Reuse the classification of a near-identical message the LLM already
+    classified for a user in the same fraud tier. The reply is the templated
+    one for that priority: the earlier reply may describe the other user's account.
+    """
+    with span("intent_lookup"):
+        risk = get_risk_aggregates().get(user_id)
+        tier = risk.tier if risk else "Low"
+        match = intent_index.lookup(message, tier)
+    if match is None:
+        return None
+    entry, similarity = match
+    return {
+        "priority": entry["priority"],
+        "response": LOCAL_RESPONSES[entry["priority"]],
+        "info": f"Fraud risk {tier}; same intent as an earlier message ({similarity:.0%} similar).",
+        "confidence": round(entry["confidence"] * similarity, 2),
+        "answered_by": "intent_cache",
+    }
+
+
+def remember_intent(message: str, user_id: str, result: dict) -> dict:
+    """Index a message the LLM classified, for intent_match; returns the result unchanged."""
+    if result.get("answered_by") == "llm":
+        risk = get_risk_aggregates().get(user_id)
+        intent_index.add(message, risk.tier if risk else "Low", result["priority"], result["confidence"])
+    return result
+
+
+def cache_key(message: str, user_id: str) -> tuple:
+    """
+    Response-cache key; includes the user's data and chat versions so new
+    activity invalidates it. The prompt carries the recent conversation, so
+    a reply is only reused while the history it was written against is
+    current: concurrent repeats still share one call, but a message sent
+    again after its own turn was stored is classified afresh. Blocking (a
+    primary-key read of the chat summary), so async callers run it in a thread.
+    """
+    return (
+        user_id, normalize_message(message),
+        get_risk_aggregates().version(user_id), get_store().version_of(user_id), get_chat_store().version(user_id),
+    )
+
+
+def is_cacheable(result: dict) -> bool:
+    # never pin a fallback answer; the next attempt may reach the model
+    return result.get("answered_by") != "fallback"
+
+
+def analyze_message_with_gemini(message: str, user_id: str) -> dict:
+    """Ask Gemini to classify a message and produce a short response with fraud context."""
+    start_trace()
+    local = local_triage(message, user_id)
+    if local is not None:
+        return finish(local, user_id)
+
+    with span("cache_lookup"):
+        key = cache_key(message, user_id)
+        cached = response_cache.get(key)
+    if cached is not None:
+        return finish(cached, user_id)
+    matched = intent_match(message, user_id)
+    if matched is not None:
+        response_cache.put(key, matched)
+        return finish(matched, user_id)
+
+    prompt = build_prompt(message, user_id)
+    try:
+        parsed = remember_intent(message, user_id, llm_queue.generate_blocking(prompt, parse_response))
+    except Exception as e:
+        return finish(llm_failed(e, message, user_id), user_id)
+    response_cache.put(key, parsed)
+    return finish(parsed, user_id)
+
+
+async def analyze_message_async(message: str, user_id: str) -> dict:
+    """
+    Non-blocking analyze_message_with_gemini: the pandas context lookups run
+    in a worker thread and the model call goes through the bounded LLM queue,
+    so the event loop keeps serving other conversations meanwhile. Repeats
+    are answered from the response cache, and identical requests already in
+    flight share a single model call. Clear-cut messages are answered by the
+    local triage tier, and paraphrases of already classified ones by the
+    intent index, without touching the LLM at all.
+    """
+    start_trace()
+    # rules, the risk refresh and the text model (loaded on first use) stay off the loop
+    local = await asyncio.to_thread(local_triage, message, user_id)
+    if local is not None:
+        return finish(local, user_id)
+    # the data versions in the key may refresh the store or the risk aggregates
+    key = await asyncio.to_thread(cache_key, message, user_id)
+    result = await response_cache.get_or_compute(key, lambda: _analyze_uncached(message, user_id), is_cacheable)
+    return finish(result, user_id)
+
+
+async def _analyze_uncached(message: str, user_id: str) -> dict:
+    # the intent index embeds the message and looks up the user's tier; both stay off the loop
+    matched = await asyncio.to_thread(intent_match, message, user_id)
+    if matched is not None:
+        return matched
+    prompt = await asyncio.to_thread(build_prompt, message, user_id)
     try:
-        result = model.generate_content(prompt)
-        text = result.text.strip()
-        match = re.search(r"\{.*\}", text, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
+        parsed = await llm_queue.generate(prompt, parse_response)
+        return await asyncio.to_thread(remember_intent, message, user_id, parsed)
+    except LLMQueueFull:
+        llm_errors.inc(reason="queue_full")
+        raise
     except Exception as e:
-        print("Gemini error:", e)
+        return llm_failed(e, message, user_id)
+
+
+async def analyze_message_stream(message: str, user_id: str):
+    """
+    Streaming analyze_message_async. Yields (event, data) pairs: "priority"
+    with priority and confidence as soon as the model has produced them, then
+    "response" and "info" text deltas, and finally "done" with the full result
+    (what /analyze would have returned). Local-triage, cached and intent-index
+    answers are complete at once and come out as the same sequence of events.
+    """
+    start_trace()
+    result = await asyncio.to_thread(local_triage, message, user_id)
+    if result is None:
+        key = await asyncio.to_thread(cache_key, message, user_id)
+        # a repeat, or the same message already in flight on /analyze or another stream
+        result = await response_cache.join(key)
+        if result is None:
+            with response_cache.lead(key, is_cacheable) as publish:
+                async for event in _stream_uncached(message, user_id, publish):
+                    yield event
+            return
+    for event in _whole_reply(result):
+        yield event
+    yield "done", finish(result, user_id)
+
 
-    return {"priority": "LOW", "response": "Default response.", "info": "Default response.", "confidence": 0.7}
+def _whole_reply(result: dict) -> list[tuple[str, dict]]:
+    return [
+        ("priority", {"priority": result["priority"], "confidence": result["confidence"]}),
+        ("response", {"delta": result["response"]}),
+        ("info", {"delta": result["info"]}),
+    ]
+
+
+async def _stream_uncached(message: str, user_id: str, publish):
+    result = await asyncio.to_thread(intent_match, message, user_id)
+    if result is not None:
+        for event in _whole_reply(result):
+            yield event
+    else:
+        prompt = await asyncio.to_thread(build_prompt, message, user_id)
+        parser = StreamingReplyParser()
+        try:
+            # the queue validates the finished reply, so a malformed one counts against the breaker
+            async for chunk in llm_queue.stream(prompt, parse_response):
+                for event in parser.feed(chunk):
+                    yield event
+            result = await asyncio.to_thread(remember_intent, message, user_id, parse_response(parser.text))
+        except Exception as e:
+            # headers are already sent, so even a full queue ends as a fallback answer
+            result = llm_failed(e, message, user_id)
+    publish(result)
+    yield "done", finish(result, user_id)
+
+
+async def analyze_batch(items: list[tuple[str, str]], concurrency: int = BATCH_CONCURRENCY):
+    """
+    Classify many (user_id, message) pairs, yielding (index, result) pairs in
+    completion order. A user's context is built the first time one of their
+    messages needs the model, once, and shared by the rest of their messages;
+    at most `concurrency` model calls from this batch are in flight at a time.
+    """
+    contexts: dict[str, asyncio.Future] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def user_context(user_id: str) -> dict:
+        if user_id not in contexts:
+            contexts[user_id] = asyncio.ensure_future(asyncio.to_thread(build_user_context, user_id))
+        # shielded: one cancelled message must not cancel the build the user's other messages wait on
+        return await asyncio.shield(contexts[user_id])
+
+    async def classify(user_id: str, message: str) -> dict:
+        matched = await asyncio.to_thread(intent_match, message, user_id)
+        if matched is not None:
+            return matched
+        prompt = build_prompt(message, user_id, await user_context(user_id))
+        async with semaphore:
+            try:
+                parsed = await llm_queue.generate(prompt, parse_response)
+                return await asyncio.to_thread(remember_intent, message, user_id, parsed)
+            except Exception as e:
+                return llm_failed(e, message, user_id)
+
+    async def run_one(index: int, user_id: str, message: str):
+        start_trace()
+        local = await asyncio.to_thread(local_triage, message, user_id)
+        if local is not None:
+            return index, finish(local, user_id)
+        key = await asyncio.to_thread(cache_key, message, user_id)
+        result = await response_cache.get_or_compute(key, lambda: classify(user_id, message), is_cacheable)
+        return index, finish(result, user_id)
+
+    tasks = [asyncio.create_task(run_one(i, uid, msg)) for i, (uid, msg) in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # client went away mid-stream: don't keep paying for the rest
+        for task in tasks:
+            task.cancel()
 
 # def analyze_message_with_gemini(message: str) -> dict:
 #     """Use Gemini to classify priority and generate a response."""
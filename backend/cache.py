@@ -0,0 +1,140 @@
+# backend/cache.py
+import asyncio
+import contextlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_MAX_ENTRIES = int(os.getenv("NOVAROUTE_CACHE_SIZE", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("NOVAROUTE_CACHE_TTL", "300"))
+
+
+class LeaderCancelled(Exception):
+    """Set on a shared computation whose leader was cancelled; its followers retry."""
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivial repeats share a key."""
+    return re.sub(r"\s+", " ", message.lower()).strip().rstrip("?!. ")
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache with a per-entry TTL for analyze results.
+
+    Keys are expected to carry a data-version stamp, so new activity for a
+    user makes their old entries unreachable and they simply age out.
+    Concurrent async lookups for the same missing key share one computation.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._inflight: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return a copy of the cached value, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(value)
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_compute(self, key, compute, cacheable=lambda value: True) -> dict:
+        """
+        Return the cached value for key, or await compute() to produce it.
+        If another task is already computing the same key, wait for its
+        result instead of starting a second computation. If that task is
+        cancelled (its client went away), a waiting follower takes over.
+        """
+        value = await self.join(key)
+        if value is not None:
+            return value
+        with self.lead(key, cacheable) as publish:
+            value = await compute()
+            publish(value)
+        return dict(value)
+
+    async def join(self, key) -> dict | None:
+        """
+        Return the cached value for key, or wait for the computation of it
+        already in flight. None means the caller should compute it, under lead().
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                return None
+            self.coalesced += 1
+            try:
+                return dict(await asyncio.shield(pending))
+            except LeaderCancelled:
+                continue
+
+    @contextlib.contextmanager
+    def lead(self, key, cacheable=lambda value: True):
+        """
+        Register the caller as the one computing key, for computations that
+        aren't a single awaitable (a streamed reply). Yields publish(value),
+        which caches the value and hands it to every waiting follower. Leaving
+        without publishing (cancelled, or the stream closed early) lets the
+        first follower to wake up take over; an exception is re-raised in them.
+        """
+        pending = self._inflight[key] = asyncio.get_running_loop().create_future()
+
+        def publish(value: dict):
+            if cacheable(value):
+                self.put(key, value)
+            pending.set_result(value)
+
+        try:
+            yield publish
+        except Exception as e:
+            if not pending.done():
+                pending.set_exception(e)
+                pending.exception()  # mark retrieved; followers re-raise it themselves
+            raise
+        finally:
+            if not pending.done():
+                # don't cancel the followers with it; the first to wake up becomes the leader
+                pending.set_exception(LeaderCancelled())
+                pending.exception()
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,120 @@
+# backend/chats.py
+"""
+Append-only chat history, owned by the backend.
+
+Every analyzed message is one row in SQLite (WAL mode, so readers never
+block the writer). Rows are indexed by (user_id, id): appending is a single
+insert, and reading a user's latest turns is a short index range scan
+however long the history grows. A per-user summary row holds running
+counts, so the prompt can mention older turns without reading them.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+CHAT_DB_PATH = os.getenv("NOVAROUTE_CHAT_DB", "data/chats.sqlite3")
+TURN_FIELDS = ("id", "ts", "message", "priority", "confidence", "response", "info", "answered_by")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    message TEXT NOT NULL,
+    priority TEXT,
+    confidence REAL,
+    response TEXT,
+    info TEXT,
+    answered_by TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_by_user ON turns (user_id, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    user_id TEXT PRIMARY KEY,
+    turns INTEGER NOT NULL,
+    high INTEGER NOT NULL,
+    medium INTEGER NOT NULL,
+    low INTEGER NOT NULL,
+    first_ts REAL NOT NULL,
+    last_id INTEGER NOT NULL
+);
+"""
+
+
+class ChatStore:
+    """Per-user chat turns in one SQLite file; safe to share between threads and worker processes."""
+
+    def __init__(self, path: str = CHAT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per thread; sqlite3 connections must not cross threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: a commit is one append to the log, fsynced at checkpoints
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def append(self, user_id: str, message: str, result: dict) -> dict:
+        """Record one analyzed message and its reply; returns the stored turn."""
+        ts = time.time()
+        priority = result.get("priority")
+        row = (
+            user_id, ts, message, priority, result.get("confidence"),
+            result.get("response"), result.get("info"), result.get("answered_by"),
+        )
+        db = self._connect()
+        with db:
+            turn_id = db.execute(
+                "INSERT INTO turns (user_id, ts, message, priority, confidence, response, info, answered_by)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row,
+            ).lastrowid
+            db.execute(
+                "INSERT INTO summaries VALUES (?, 1, ?, ?, ?, ?, ?) ON CONFLICT (user_id) DO UPDATE SET"
+                " turns = turns + 1, high = high + excluded.high, medium = medium + excluded.medium,"
+                " low = low + excluded.low, last_id = excluded.last_id",
+                (user_id, priority == "HIGH", priority == "MEDIUM", priority == "LOW", ts, turn_id),
+            )
+        return dict(zip(TURN_FIELDS, (turn_id, *row[1:])))
+
+    def history(self, user_id: str, before: int | None = None, limit: int = 50) -> list[dict]:
+        """The user's turns newest first, starting below turn id `before` (keyset pagination)."""
+        rows = self._connect().execute(
+            f"SELECT {', '.join(TURN_FIELDS)} FROM turns WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (user_id, before if before is not None else 2 ** 63 - 1, limit),
+        ).fetchall()
+        return [dict(zip(TURN_FIELDS, row)) for row in rows]
+
+    def summary(self, user_id: str) -> dict | None:
+        """Running totals over all of the user's turns: turns, high, medium, low, first_ts, last_id."""
+        row = self._connect().execute(
+            "SELECT turns, high, medium, low, first_ts, last_id FROM summaries WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return dict(zip(("turns", "high", "medium", "low", "first_ts", "last_id"), row)) if row else None
+
+    def version(self, user_id: str) -> int:
+        """Id of the user's latest turn (0 if none); changes with every append."""
+        summary = self.summary(user_id)
+        return summary["last_id"] if summary else 0
+
+
+_chat_store = None
+_chat_store_lock = threading.Lock()
+
+
+def get_chat_store() -> ChatStore:
+    """Return the process-wide chat store, opening the database on first use."""
+    global _chat_store
+    if _chat_store is None:
+        with _chat_store_lock:
+            if _chat_store is None:
+                _chat_store = ChatStore()
+    return _chat_store
@@ -0,0 +1,302 @@
+# backend/columnar.py
+"""
+On-disk columnar layout for the NovaRoute dataset.
+
+    data/transactions/base.parquet        sorted by (user_id, timestamp desc)
+    data/transactions/part-<seq>.parquet  append-only log of rows added since (see backend/ingest.py)
+    data/fraud_scores/base.parquet, part-<seq>.parquet
+    data/accounts.parquet
+
+Columns are typed (int8 flags, float64 amounts), timestamps are stored as
+int64 epoch microseconds (Parquet TIMESTAMP), and repetitive strings are
+dictionary-encoded and load as pandas categoricals. Row groups never split a
+user, so a user_id filter only decodes the row groups that hold that user.
+"""
+import os
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TXN_DIR = "data/transactions"
+SCORES_DIR = "data/fraud_scores"
+ACCOUNTS_PATH = "data/accounts.parquet"
+
+BASE_NAME = "base.parquet"
+PART_PREFIX = "part-"
+# parts written but not yet published by a multi-shard append (see backend/ingest.py)
+STAGED_SUFFIX = ".staged"
+META_COMPACTED_THROUGH = b"novaroute.compacted_through"
+META_LINEAGE = b"novaroute.lineage"
+# target rows per row group; a group is closed at the next user boundary
+ROW_GROUP_ROWS = 128_000
+
+_dict = pa.dictionary(pa.int32(), pa.string())
+
+TXN_SCHEMA = pa.schema([
+    ("txn_id", pa.string()),
+    ("user_id", _dict),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("amount", pa.float64()),
+    ("currency", _dict),
+    ("merchant", _dict),
+    ("merchant_category", _dict),
+    ("city", _dict),
+    ("country", _dict),
+    ("channel", _dict),
+    ("is_foreign", pa.int8()),
+    ("is_high_amount", pa.int8()),
+    ("velocity_24h", pa.int16()),
+    ("device_fingerprint", _dict),
+    ("ip_country", _dict),
+    ("merchant_risk_score", pa.float64()),
+    ("label_fraud", pa.int8()),
+    ("user_reported_issue", pa.bool_()),
+])
+
+SCORE_SCHEMA = pa.schema([
+    ("txn_id", pa.string()),
+    ("user_id", _dict),
+    ("fraud_score", pa.float64()),
+    ("fraud_label", pa.int8()),
+])
+
+ACCOUNT_SCHEMA = pa.schema([
+    ("user_id", pa.string()),
+    ("name", pa.string()),
+    ("account_type", _dict),
+    ("opened_at", pa.date32()),
+    ("account_balance", pa.float64()),
+    ("avg_monthly_spend", pa.float64()),
+    ("std_monthly_spend", pa.float64()),
+    ("card_status", _dict),
+    ("reported_priority", _dict),
+    ("true_risk_flag", pa.int8()),
+    ("chargeback_history", pa.int8()),
+    ("last_login_ip_country", _dict),
+    ("device_fingerprint", pa.string()),
+])
+
+
+def to_table(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """Coerce a DataFrame (ISO timestamp strings, plain strings, ...) to the typed schema."""
+    df = df[schema.names].copy()
+    for field in schema:
+        if pa.types.is_timestamp(field.type):
+            df[field.name] = pd.to_datetime(df[field.name], utc=True, format="ISO8601")
+        elif pa.types.is_date(field.type):
+            df[field.name] = pd.to_datetime(df[field.name]).dt.date
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _atomic_write(path: str, write):
+    # dot-prefixed temp names are ignored by Parquet dataset readers
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+@contextmanager
+def parquet_writer(path: str, schema: pa.Schema):
+    """ParquetWriter on a temp file that atomically replaces path once the block exits cleanly."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            yield writer
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def user_row_groups(user_ids: np.ndarray, target_rows: int = ROW_GROUP_ROWS) -> list[tuple[int, int]]:
+    """Split rows sorted by user_id into ~target_rows slices that never cut through a user."""
+    n = len(user_ids)
+    if n == 0:
+        return []
+    block_ends = np.append(np.flatnonzero(user_ids[1:] != user_ids[:-1]) + 1, n)
+    groups, start = [], 0
+    while start < n:
+        idx = np.searchsorted(block_ends, start + target_rows)
+        end = int(block_ends[idx]) if idx < len(block_ends) else n
+        groups.append((start, end))
+        start = end
+    return groups
+
+
+def write_base(
+    df: pd.DataFrame,
+    directory: str,
+    schema: pa.Schema,
+    compacted_through: int = 0,
+    lineage: str | None = None,
+    row_group_rows: int = ROW_GROUP_ROWS,
+) -> str:
+    """
+    Replace the dataset's base file with df, sorted by user and newest first,
+    one user per row group range. The footer records which log parts are
+    already folded in (compacted_through) and a lineage id that stays the
+    same across compactions but changes when the data is replaced outright.
+    """
+    sort_cols = ["user_id", "timestamp"] if "timestamp" in schema.names else ["user_id"]
+    df = df.sort_values(sort_cols, ascending=[True] + [False] * (len(sort_cols) - 1), kind="stable")
+    table = to_table(df, schema)
+    groups = user_row_groups(df["user_id"].to_numpy(dtype=str), row_group_rows)
+    with base_writer(directory, schema, compacted_through, lineage) as writer:
+        for start, end in groups:
+            writer.write_table(table.slice(start, end - start), row_group_size=end - start)
+        if not groups:
+            writer.write_table(table)
+    return os.path.join(directory, BASE_NAME)
+
+
+def base_writer(directory: str, schema: pa.Schema, compacted_through: int = 0, lineage: str | None = None):
+    """
+    Writer for a new base file, for callers that stream it: every table
+    written must already be sorted like write_base() sorts, and becomes its
+    own row group, so it must not split a user across two writes.
+    """
+    schema = schema.with_metadata({
+        **(schema.metadata or {}),
+        META_COMPACTED_THROUGH: str(compacted_through).encode(),
+        META_LINEAGE: (lineage or uuid.uuid4().hex).encode(),
+    })
+    return parquet_writer(os.path.join(directory, BASE_NAME), schema)
+
+
+def base_info(directory: str) -> tuple[str | None, int]:
+    """Return (lineage, compacted_through) from the base footer; (None, 0) if there is no base."""
+    try:
+        metadata = pq.read_schema(os.path.join(directory, BASE_NAME)).metadata or {}
+    except FileNotFoundError:
+        return None, 0
+    lineage = metadata.get(META_LINEAGE, b"").decode() or None
+    return lineage, int(metadata.get(META_COMPACTED_THROUGH, b"0"))
+
+
+def part_name(seq: int) -> str:
+    return f"{PART_PREFIX}{seq:012d}.parquet"
+
+
+def part_seq(name: str) -> int:
+    return int(name[len(PART_PREFIX):-len(".parquet")])
+
+
+def append_part(df: pd.DataFrame, directory: str, schema: pa.Schema, seq: int) -> str:
+    """Write df as immutable log part number seq; readers see all of it or none of it."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, part_name(seq))
+    table = to_table(df, schema)
+    _atomic_write(path, lambda tmp: pq.write_table(table, tmp, compression="zstd"))
+    return path
+
+
+def stage_part(df: pd.DataFrame, directory: str, schema: pa.Schema, seq: int) -> str:
+    """Write df as log part number seq under a dot-prefixed name readers ignore; publish_part() reveals it."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f".{part_name(seq)}{STAGED_SUFFIX}")
+    pq.write_table(to_table(df, schema), path, compression="zstd")
+    return path
+
+
+def publish_part(staged: str) -> str:
+    """Rename a staged part to its real name, atomically making all of it visible."""
+    path = os.path.join(os.path.dirname(staged), os.path.basename(staged)[1:-len(STAGED_SUFFIX)])
+    os.replace(staged, path)
+    return path
+
+
+def list_staged(directory: str) -> list[str]:
+    """Paths of staged parts that were never published."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, n) for n in names if n.startswith("." + PART_PREFIX) and n.endswith(STAGED_SUFFIX)]
+
+
+def list_parts(directory: str, after: int | None = None) -> list[str]:
+    """Log part names with sequence number > after (default: not yet compacted), in order."""
+    if after is None:
+        after = base_info(directory)[1]
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    parts = [n for n in names if n.startswith(PART_PREFIX) and n.endswith(".parquet")]
+    return sorted(n for n in parts if part_seq(n) > after)
+
+
+def read_tables(paths: list[str], schema: pa.Schema, columns: list[str] | None = None, filters=None) -> list[pa.Table]:
+    return [pq.read_table(p, columns=columns, filters=filters, schema=schema) for p in paths]
+
+
+def read_files(paths: list[str], schema: pa.Schema, columns: list[str] | None = None, filters=None) -> pd.DataFrame:
+    """Read and concatenate specific files of a dataset."""
+    return tables_to_pandas(read_tables(paths, schema, columns, filters), schema, columns)
+
+
+def tables_to_pandas(tables: list[pa.Table], schema: pa.Schema, columns: list[str] | None = None) -> pd.DataFrame:
+    """Concatenate tables into one DataFrame; an empty, typed frame if there are none."""
+    if not tables:
+        empty = schema.empty_table()
+        return (empty.select(columns) if columns else empty).to_pandas()
+    return pa.concat_tables(tables).to_pandas()
+
+
+def read_base(directory: str, schema: pa.Schema, columns: list[str] | None = None, filters=None):
+    """
+    Read the base file and return (table, lineage, compacted_through), taking
+    the footer metadata from the very file that was read so the caller knows
+    exactly which log parts it still has to add on top.
+    """
+    try:
+        f = open(os.path.join(directory, BASE_NAME), "rb")
+    except FileNotFoundError:
+        return None, None, 0
+    with f:
+        metadata = pq.read_schema(f).metadata or {}
+        f.seek(0)
+        table = pq.read_table(f, columns=columns, filters=filters, schema=schema)
+    lineage = metadata.get(META_LINEAGE, b"").decode() or None
+    return table, lineage, int(metadata.get(META_COMPACTED_THROUGH, b"0"))
+
+
+def read_dataset(directory: str, schema: pa.Schema, columns: list[str] | None = None, filters=None) -> pd.DataFrame:
+    """Read base + live log parts, only the requested columns, optionally filtered (e.g. [("user_id", "==", uid)])."""
+    for attempt in range(3):
+        base, lineage, compacted_through = read_base(directory, schema, columns, filters)
+        paths = [os.path.join(directory, n) for n in list_parts(directory, after=compacted_through)]
+        try:
+            parts = read_tables(paths, schema, columns, filters)
+        except FileNotFoundError:
+            # a compaction folded a part into a newer base between listing and
+            # reading it; start over from that base
+            if attempt == 2:
+                raise
+            continue
+        if base_info(directory) != (lineage, compacted_through) and attempt < 2:
+            # a compaction (or rewrite) landed after the base was read: the parts it
+            # folded are gone from the listing, so start over from the new base
+            continue
+        return tables_to_pandas(([base] if base is not None else []) + parts, schema, columns)
+
+
+def read_accounts(path: str = ACCOUNTS_PATH, columns: list[str] | None = None) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return read_files([], ACCOUNT_SCHEMA, columns)
+    return pd.read_parquet(path, columns=columns)
+
+
+def write_accounts(df: pd.DataFrame, path: str = ACCOUNTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = to_table(df, ACCOUNT_SCHEMA)
+    _atomic_write(path, lambda tmp: pq.write_table(table, tmp, compression="zstd"))
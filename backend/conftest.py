@@ -0,0 +1,51 @@
+# backend/conftest.py
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test from an empty directory, so the relative data/ paths point into it."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def make_scores():
+    """Fraud-score rows in SCORE_SCHEMA's columns: make_scores("user_001", [0.9, 0.1], start=0)."""
+    def make(user_id: str, scores: list[float], start: int = 0, threshold: float = 0.5) -> pd.DataFrame:
+        return pd.DataFrame({
+            "txn_id": [f"{user_id}-t{start + i}" for i in range(len(scores))],
+            "user_id": user_id,
+            "fraud_score": scores,
+            "fraud_label": [int(score >= threshold) for score in scores],
+        })
+    return make
+
+
+@pytest.fixture
+def make_transactions():
+    """n transactions in TXN_SCHEMA's columns, newest last: make_transactions("user_001", 3, start=0)."""
+    def make(user_id: str, n: int, start: int = 0, fraud: bool = False) -> pd.DataFrame:
+        seqs = range(start, start + n)
+        return pd.DataFrame({
+            "txn_id": [f"{user_id}-t{i}" for i in seqs],
+            "user_id": user_id,
+            "timestamp": [pd.Timestamp("2025-01-01", tz="UTC") + pd.Timedelta(hours=i) for i in seqs],
+            "amount": [10.0 + i for i in seqs],
+            "currency": "USD",
+            "merchant": "Corner Shop",
+            "merchant_category": "grocery",
+            "city": "Richmond",
+            "country": "US",
+            "channel": "card_present",
+            "is_foreign": 0,
+            "is_high_amount": 0,
+            "velocity_24h": 1,
+            "device_fingerprint": "dev-1",
+            "ip_country": "US",
+            "merchant_risk_score": 0.1,
+            "label_fraud": int(fraud),
+            "user_reported_issue": False,
+        })
+    return make
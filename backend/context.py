@@ -0,0 +1,185 @@
+# backend/context.py
+"""
+Compact, token-budgeted user context for the LLM prompt.
+
+Instead of full transaction rows as indented JSON, the prompt gets a line of
+precomputed activity figures plus a pipe-separated table of the most relevant
+transactions (flagged and anomalous first), filled until the token budget is
+spent. Raise NOVAROUTE_CONTEXT_TOKENS for richer context, lower it for faster
+and cheaper calls.
+"""
+import math
+import os
+import threading
+import time
+
+import pandas as pd
+
+from backend.columnar import read_accounts
+from backend.metrics import span
+from backend.store import get_store
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("NOVAROUTE_CONTEXT_TOKENS", "300"))
+# rough characters per token for short structured English; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+# the most recent transactions considered for the table, on top of all flagged ones
+CANDIDATE_ROWS = 50
+SUMMARY_WINDOW = pd.Timedelta(days=30)
+
+TABLE_HEADER = "when|amount|merchant|category|country[/ip]|channel|score|flags"
+FLAGS_LEGEND = "flags: F=flagged fraud, X=foreign, H=high for this user, -=none"
+# tokens kept back for the "+N more" line under the table
+OMITTED_NOTE_TOKENS = 8
+# prompt budget for earlier turns of the conversation, and how many are considered
+CHAT_CONTEXT_TOKENS = int(os.getenv("NOVAROUTE_CHAT_TOKENS", "120"))
+CHAT_WINDOW_TURNS = int(os.getenv("NOVAROUTE_CHAT_TURNS", "6"))
+# longer messages are cut to this many characters in the window
+TURN_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+_accounts = None
+_accounts_lock = threading.Lock()
+
+
+def get_account(user_id: str) -> dict | None:
+    """Account profile fields used in summaries, loaded once."""
+    global _accounts
+    if _accounts is None:
+        with _accounts_lock:
+            if _accounts is None:
+                df = read_accounts(columns=["user_id", "avg_monthly_spend", "chargeback_history"])
+                _accounts = df.set_index("user_id").to_dict("index")
+    return _accounts.get(user_id)
+
+
+def summarize_activity(window: pd.DataFrame, flagged_total: int, account: dict | None) -> str:
+    """One line of figures over the 30 days up to the user's latest transaction."""
+    if window.empty:
+        return "Activity: no transactions on file."
+    spend = window["amount"].sum()
+    parts = [f"{len(window)} txns", f"spend {spend:.0f}"]
+    if account and account.get("avg_monthly_spend"):
+        avg = account["avg_monthly_spend"]
+        parts[-1] += f" ({spend / avg:.1f}x usual {avg:.0f}/mo)"
+    parts.append(f"max {window['amount'].max():.0f}")
+    parts.append(f"foreign {100 * window['is_foreign'].mean():.0f}%")
+    mismatched = int((window["ip_country"].astype(str) != window["country"].astype(str)).sum())
+    if mismatched:
+        parts.append(f"ip/country mismatch {mismatched}")
+    parts.append(f"high-amount {int(window['is_high_amount'].sum())}")
+    parts.append(f"flagged {int(window['fraud_label'].sum())} (all-time {flagged_total})")
+    if account and account.get("chargeback_history"):
+        parts.append(f"chargebacks {account['chargeback_history']}")
+    return "Last 30d of activity: " + ", ".join(parts) + "."
+
+
+def rank_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Most relevant first: flagged, then by fraud score and anomaly flags, then newest."""
+    relevance = (
+        10 * df["fraud_label"].fillna(0)
+        + 4 * df["fraud_score"].fillna(0)
+        + df["is_foreign"].fillna(0)
+        + df["is_high_amount"].fillna(0)
+    )
+    ranked = df.assign(_relevance=relevance).sort_values(
+        ["_relevance", "timestamp"], ascending=False, na_position="last", kind="stable"
+    )
+    return ranked.drop(columns="_relevance")
+
+
+def _text(value, fmt: str = "{}") -> str:
+    return "?" if pd.isna(value) else fmt.format(value)
+
+
+def format_transaction(row) -> str:
+    when = row.timestamp.strftime("%m-%d %H:%M") if pd.notna(row.timestamp) else "?"
+    where = _text(row.country)
+    if pd.notna(row.ip_country) and row.ip_country != row.country:
+        where += f"/{row.ip_country}"
+    flags = "".join(
+        flag for flag, on in (("F", row.fraud_label), ("X", row.is_foreign), ("H", row.is_high_amount))
+        if pd.notna(on) and on == 1
+    )
+    return "|".join([
+        when, _text(row.amount, "{:.2f}"), _text(row.merchant), _text(row.merchant_category), where,
+        _text(row.channel), _text(row.fraud_score, "{:.2f}"), flags or "-",
+    ])
+
+
+def build_compact_context(
+    user_id: str, risk_info: str, flagged: pd.DataFrame, budget: int = CONTEXT_TOKEN_BUDGET, store=None
+) -> dict:
+    """
+    Return {"risk_info", "summary", "transactions", "tokens"}: the summary line
+    and as many ranked transactions as fit in budget tokens (an estimate),
+    listed newest first.
+    """
+    with span("recent_transactions"):
+        store = store or get_store()
+        recent = store.recent(user_id, CANDIDATE_ROWS)
+        if recent.empty:
+            window = recent
+        else:
+            window = store.since(user_id, recent["timestamp"].iloc[0] - SUMMARY_WINDOW)
+    with span("summarize_activity"):
+        summary = summarize_activity(window, len(flagged), get_account(user_id))
+
+    with span("rank_transactions"):
+        candidates = pd.concat([flagged, recent], ignore_index=True).drop_duplicates("txn_id")
+        used = sum(estimate_tokens(text) for text in (risk_info, summary, FLAGS_LEGEND, TABLE_HEADER))
+        used += OMITTED_NOTE_TOKENS
+        chosen = []
+        for row in rank_transactions(candidates).itertuples(index=False):
+            line = format_transaction(row)
+            cost = estimate_tokens(line) + 1  # + newline
+            if used + cost > budget:
+                break
+            chosen.append((row.timestamp, line))
+            used += cost
+
+    chosen.sort(key=lambda item: (pd.notna(item[0]), item[0] if pd.notna(item[0]) else 0), reverse=True)
+    lines = [TABLE_HEADER] + [line for _, line in chosen]
+    if len(chosen) < len(candidates):
+        lines.append(f"(+{len(candidates) - len(chosen)} lower-ranked not shown)")
+    return {
+        "risk_info": risk_info,
+        "summary": summary,
+        "transactions": "\n".join(lines) if chosen else (
+            "none on file" if candidates.empty else f"({len(candidates)} on file, none fit the context budget)"
+        ),
+        "tokens": used,
+    }
+
+
+def build_conversation_context(turns: list[dict], summary: dict | None, budget: int = CHAT_CONTEXT_TOKENS) -> str:
+    """
+    Earlier turns for the prompt, oldest first: the newest turns verbatim
+    (turns come newest first, as ChatStore.history returns them) while they
+    fit in budget tokens, and one line of counts for everything older.
+    """
+    if not turns:
+        return "none"
+    lines, used = [], 0
+    for turn in turns:
+        message = turn["message"] if len(turn["message"]) <= TURN_CHARS else turn["message"][:TURN_CHARS] + "..."
+        line = f"[{turn['priority'] or '?'}] {message}"
+        cost = estimate_tokens(line) + 1  # + newline
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+
+    shown = turns[:len(lines)]
+    earlier = summary["turns"] - len(shown) if summary else 0
+    if earlier > 0:
+        counts = ", ".join(
+            f"{priority} {summary[priority.lower()] - sum(t['priority'] == priority for t in shown)}"
+            for priority in ("HIGH", "MEDIUM", "LOW")
+        )
+        since = time.strftime("%Y-%m-%d", time.gmtime(summary["first_ts"]))
+        lines.append(f"(earlier: {earlier} messages since {since}; {counts})")
+    return "\n".join(reversed(lines))
@@ -0,0 +1,205 @@
+# backend/data_api.py
+"""
+Read queries behind the dashboard's data endpoints.
+
+Pages are keyset-paginated: a cursor names the last row served, and the next
+page starts right after it with a binary search, so deep pages cost the same
+as the first and stay stable while new rows arrive. Every query also has a
+version stamp that changes exactly when its answer can, for ETags.
+"""
+import base64
+import bisect
+import datetime
+import hashlib
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+
+from backend.columnar import ACCOUNTS_PATH, read_accounts
+from backend.risk import get_risk_aggregates
+from backend.store import ShardedStore, get_store, recency_key
+
+DEFAULT_PAGE_SIZE = 50
+# account fields in list pages; the full record comes from the single-account query
+ACCOUNT_SUMMARY_FIELDS = ["user_id", "name"]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(*key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"bad cursor {cursor!r}") from e
+
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest() + '"'
+
+
+def _json_value(value):
+    """Plain JSON scalars: ISO dates and timestamps, NaN/NaT as null, numpy scalars unwrapped."""
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (datetime.date, pd.Timestamp)):
+        return value.isoformat()
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _records(df: pd.DataFrame) -> dict:
+    """Column names once plus one list per row, instead of repeating every key in every row."""
+    rows = [[_json_value(v) for v in row] for row in df.itertuples(index=False, name=None)]
+    return {"columns": list(df.columns), "rows": rows}
+
+
+class AccountCache:
+    """Account records by user_id, re-read only when the accounts file changes."""
+
+    def __init__(self, path: str = ACCOUNTS_PATH):
+        self.path = path
+        self.stat = None
+        self._accounts: dict[str, dict] = {}
+        self._user_ids: list[str] = []
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        try:
+            st = os.stat(self.path)
+            stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stat = None
+        if stat != self.stat:
+            with self._lock:
+                if stat != self.stat:
+                    df = read_accounts(self.path)
+                    self._accounts = {
+                        acct["user_id"]: {k: _json_value(v) for k, v in acct.items()}
+                        for acct in df.to_dict(orient="records")
+                    }
+                    self._user_ids = sorted(self._accounts)
+                    self.stat = stat
+
+    def get(self, user_id: str) -> dict | None:
+        self.refresh()
+        return self._accounts.get(user_id)
+
+    def page(
+        self, after: str | None = None, limit: int = DEFAULT_PAGE_SIZE, prefix: str = "",
+    ) -> tuple[list[dict], str | None]:
+        """Account summaries ordered by user_id, starting after the given one, optionally only user_ids starting with prefix."""
+        self.refresh()
+        user_ids, accounts = self._user_ids, self._accounts
+        start = bisect.bisect_right(user_ids, after) if after is not None else 0
+        end = len(user_ids)
+        if prefix:
+            # the ids with a prefix are one sorted run: from the prefix up to its successor
+            start = max(start, bisect.bisect_left(user_ids, prefix))
+            end = bisect.bisect_left(user_ids, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        chosen = user_ids[start:min(start + limit, end)]
+        summaries = [{k: accounts[u].get(k) for k in ACCOUNT_SUMMARY_FIELDS} for u in chosen]
+        more = start + limit < end
+        return summaries, chosen[-1] if more and chosen else None
+
+
+account_cache = AccountCache()
+
+
+def accounts_page(cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE, prefix: str = "") -> dict:
+    after = decode_cursor(cursor)[0] if cursor else None
+    accounts, last = account_cache.page(after, limit, prefix)
+    return {"accounts": accounts, "next_cursor": encode_cursor(last) if last is not None else None}
+
+
+def accounts_version() -> tuple:
+    account_cache.refresh()
+    return account_cache.stat
+
+
+def transactions_page(
+    user_id: str,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    min_amount: float = 0.0,
+    only_foreign: bool = False,
+    only_flagged: bool = False,
+    store: ShardedStore | None = None,
+) -> dict:
+    """
+    One page of user_id's transactions, newest first, filtered server-side.
+    The cursor is the (timestamp, txn_id) of the last row of the previous page.
+    Pass the store the ETag was computed from, so both see the same version.
+    """
+    store = store or get_store()
+    after = None
+    if cursor:
+        try:
+            last_key, last_txn = decode_cursor(cursor)
+            after = (int(last_key), str(last_txn))
+        except (TypeError, ValueError) as e:
+            raise InvalidCursor(f"bad cursor {cursor!r}") from e
+
+    conditions = []
+    if min_amount > 0:
+        conditions.append(pc.field("amount") >= float(min_amount))
+    if only_foreign:
+        conditions.append(pc.field("is_foreign") == 1)
+    if only_flagged:
+        conditions.append(pc.field("fraud_label") == 1)
+    where = None
+    for condition in conditions:
+        where = condition if where is None else where & condition
+    page = store.page(user_id, after, limit + 1, where)
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page.iloc[:limit]
+        last = page.iloc[[-1]]
+        next_cursor = encode_cursor(int(recency_key(last)[0]), str(last["txn_id"].iloc[0]))
+    return {"user_id": user_id, **_records(page), "next_cursor": next_cursor}
+
+
+def fraud_status_counts(user_id: str, store: ShardedStore | None = None) -> dict:
+    """Counts of the user's transactions by label_fraud, for the analytics chart."""
+    labels = (store or get_store()).transactions(user_id)["label_fraud"]
+    return {
+        "Flagged": int((labels == 1).sum()),
+        "Not flagged": int((labels == 0).sum()),
+        "Unknown": int(labels.isna().sum()),
+    }
+
+
+def transactions_version(user_id: str, store: ShardedStore | None = None) -> tuple:
+    return (store or get_store()).version_of(user_id)
+
+
+def risk_tiers() -> dict:
+    """Users per fraud tier across the fleet; every shard is queried in parallel."""
+    aggregates = get_risk_aggregates()
+    tiers = aggregates.tier_counts()
+    return {"users": sum(tiers.values()), "tiers": tiers, "shards": len(aggregates.shards)}
+
+
+def risk_summary(user_id: str) -> dict | None:
+    risk = get_risk_aggregates().get(user_id)
+    if risk is None:
+        return None
+    return {
+        "user_id": user_id,
+        "tier": risk.tier,
+        "count": risk.count,
+        "mean_score": round(risk.mean_score, 4),
+        "max_score": round(risk.max_score, 4),
+        "flagged_count": risk.flagged_count,
+        "flagged_pct": round(risk.flagged_pct, 2),
+    }
@@ -0,0 +1,347 @@
+# backend/ingest.py
+"""
+Append-only ingestion log on top of the columnar datasets.
+
+Writers append whole batches as numbered part files under an exclusive
+file lock, so appends cost O(batch) and never race each other. Readers
+tail the log by sequence number. Compaction periodically folds the live
+parts back into the base file, recording the last folded sequence number
+in the base footer so readers never double count. When the data is
+sharded (backend/shards.py), every shard has its own log and lock, and
+ShardedLog splits each batch by user across them. append_batches() writes
+a batch that spans shards or datasets (transactions with their scores) so
+that it fails as a whole; see its docstring for what readers can observe.
+
+    python -m backend.ingest compact      # fold logs into the base files now
+"""
+import os
+import sys
+from collections.abc import Iterable
+from contextlib import ExitStack, contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+from backend.columnar import (
+    BASE_NAME, SCORE_SCHEMA, TXN_SCHEMA, append_part, base_info, base_writer, list_parts, list_staged,
+    part_seq, publish_part, read_base, read_dataset, read_files, read_tables, stage_part, tables_to_pandas,
+    write_base,
+)
+from backend.shards import all_shards, scatter, shard_indexes, split_by_shard
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# compact automatically once this many parts are waiting
+COMPACT_AFTER_PARTS = int(os.getenv("NOVAROUTE_COMPACT_AFTER_PARTS", "64"))
+LOCK_NAME = ".lock"
+
+
+@contextmanager
+def exclusive_lock(directory: str):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_NAME), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def dataset_version(directory: str) -> tuple[str | None, int]:
+    """(lineage, last sequence number): changes whenever rows are appended or the data is replaced."""
+    lineage, compacted_through = base_info(directory)
+    on_disk = [part_seq(n) for n in list_parts(directory, after=0)]
+    return lineage, max([compacted_through, *on_disk])
+
+
+class IngestLog:
+    """Locked, append-only writer for one dataset directory."""
+
+    def __init__(self, directory: str, schema: pa.Schema, compact_after: int = COMPACT_AFTER_PARTS):
+        self.directory = directory
+        self.schema = schema
+        self.compact_after = compact_after
+
+    def append(self, df: pd.DataFrame) -> int:
+        """Atomically append df as one batch and return its sequence number."""
+        with exclusive_lock(self.directory):
+            self._remove_staged()
+            seq = self._last_seq() + 1
+            append_part(df, self.directory, self.schema, seq)
+        self.maybe_compact()
+        return seq
+
+    def maybe_compact(self):
+        if self.compact_after and len(list_parts(self.directory)) >= self.compact_after:
+            self.compact()
+
+    def compact(self) -> int:
+        """Fold every live part into a new base file; returns how many parts were folded."""
+        with exclusive_lock(self.directory):
+            base, lineage, compacted_through = read_base(self.directory, self.schema)
+            names = list_parts(self.directory, after=compacted_through)
+            if not names:
+                return 0
+            parts = read_tables([os.path.join(self.directory, n) for n in names], self.schema)
+            df = tables_to_pandas(([base] if base is not None else []) + parts, self.schema)
+            through = part_seq(names[-1])
+            write_base(df, self.directory, self.schema, compacted_through=through, lineage=lineage)
+            self._remove_parts_through(through)
+        return len(names)
+
+    def rewrite(self, df: pd.DataFrame):
+        """Replace the whole dataset with df (a new lineage, so readers rebuild)."""
+        with exclusive_lock(self.directory):
+            through = self._last_seq()
+            write_base(df, self.directory, self.schema, compacted_through=through)
+            self._remove_parts_through(through)
+
+    def _last_seq(self) -> int:
+        return dataset_version(self.directory)[1]
+
+    def _remove_staged(self):
+        # only called under the lock: whoever staged these died before publishing them
+        for path in list_staged(self.directory):
+            os.remove(path)
+
+    def _remove_parts_through(self, through: int):
+        for name in list_parts(self.directory, after=0):
+            if part_seq(name) <= through:
+                os.remove(os.path.join(self.directory, name))
+
+
+def _written_at(paths: list[str]) -> float:
+    """Newest modification time among paths, skipping parts compacted away since they were read."""
+    times = []
+    for path in paths:
+        try:
+            times.append(os.stat(path).st_mtime)
+        except FileNotFoundError:
+            pass
+    return max(times, default=0.0)
+
+
+class LogTail:
+    """
+    Incremental reader for one dataset: read_all() once, then poll() returns
+    only the rows appended since. Compactions of parts already seen are
+    absorbed silently; poll() returns None when the caller must read_all()
+    again (the data was replaced, or folded parts were never seen).
+    written_at is when the newest file read so far was written (epoch seconds).
+    """
+
+    def __init__(self, directory: str, schema: pa.Schema, columns: list[str] | None = None):
+        self.directory = directory
+        self.schema = schema
+        self.columns = columns
+        self.lineage = None
+        self.last_seq = 0
+        self.written_at = 0.0
+        self._base_stat = None
+
+    def seek(self, lineage: str | None, last_seq: int):
+        """Continue after a position recorded elsewhere (e.g. a snapshot built by another process)."""
+        self.lineage = lineage
+        self.last_seq = last_seq
+        self._base_stat = None  # the next poll re-checks the base against this position
+
+    def read_all(self) -> pd.DataFrame:
+        while True:
+            self._base_stat = self._stat_base()
+            base, self.lineage, compacted_through = read_base(self.directory, self.schema, self.columns)
+            names = list_parts(self.directory, after=compacted_through)
+            try:
+                parts = read_tables([os.path.join(self.directory, n) for n in names], self.schema, self.columns)
+            except FileNotFoundError:
+                continue  # compacted underneath us; start from the new base
+            if base_info(self.directory) != (self.lineage, compacted_through):
+                # compacted after the base was read; the folded parts were never listed
+                continue
+            self.last_seq = part_seq(names[-1]) if names else compacted_through
+            base_written = self._base_stat[1] / 1e9 if self._base_stat is not None else 0.0
+            self.written_at = max(base_written, _written_at([os.path.join(self.directory, n) for n in names]))
+            return tables_to_pandas(([base] if base is not None else []) + parts, self.schema, self.columns)
+
+    def poll(self) -> pd.DataFrame | None:
+        stat = self._stat_base()
+        if stat != self._base_stat:
+            lineage, compacted_through = base_info(self.directory)
+            if lineage != self.lineage or compacted_through > self.last_seq:
+                return None
+            self._base_stat = stat
+        names = list_parts(self.directory, after=self.last_seq)
+        if names and part_seq(names[0]) != self.last_seq + 1:
+            # sequence numbers have no gaps: the missing parts were folded into a
+            # base we have not read since the check above
+            return None
+        if not names:
+            return read_files([], self.schema, self.columns)
+        paths = [os.path.join(self.directory, n) for n in names]
+        try:
+            rows = read_files(paths, self.schema, self.columns)
+        except FileNotFoundError:
+            return None
+        self.last_seq = part_seq(names[-1])
+        self.written_at = max(self.written_at, _written_at(paths))
+        return rows
+
+    def _stat_base(self):
+        try:
+            st = os.stat(os.path.join(self.directory, BASE_NAME))
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class ShardedLog:
+    """
+    One dataset across all shards. Appends and rewrites are split by user,
+    and each shard's rows go to that shard's own IngestLog. Fleet-wide reads
+    and compactions fan out over the shards in parallel.
+    """
+
+    def __init__(self, dataset: str, schema: pa.Schema):
+        self.dataset = dataset
+        self.schema = schema
+
+    @property
+    def logs(self) -> list[IngestLog]:
+        return [IngestLog(shard.directory(self.dataset), self.schema) for shard in all_shards()]
+
+    def append(self, df: pd.DataFrame) -> dict[int, int]:
+        """Append df, one part per shard it touches, as one batch; returns {shard: sequence number}."""
+        return append_batches([(self, df)])[0]
+
+    def compact(self) -> int:
+        return sum(scatter(IngestLog.compact, self.logs))
+
+    def rewrite(self, df: pd.DataFrame):
+        """Replace the whole dataset with df; every shard gets a new lineage, even if it is now empty."""
+        scatter(lambda job: job[0].rewrite(job[1]), zip(self.logs, split_by_shard(df)))
+
+    def rewrite_stream(self, tables: Iterable[pa.Table]):
+        """
+        rewrite() for data that does not fit in memory: tables are consumed
+        one at a time, already in base order, and each shard's rows of a
+        table are written as one row group of that shard's base.
+        """
+        logs = self.logs
+        with ExitStack() as locks:
+            for log in logs:
+                locks.enter_context(exclusive_lock(log.directory))
+            throughs = [log._last_seq() for log in logs]
+            with ExitStack() as files:
+                writers = [
+                    files.enter_context(base_writer(log.directory, log.schema, compacted_through=through))
+                    for log, through in zip(logs, throughs)
+                ]
+                for table in tables:
+                    if len(writers) == 1:
+                        parts = [table]
+                    else:
+                        shard = shard_indexes(table.column("user_id").to_pandas(), len(writers))
+                        parts = [table.filter(pa.array(shard == index)) for index in range(len(writers))]
+                    for writer, rows in zip(writers, parts):
+                        if len(rows):
+                            writer.write_table(rows, row_group_size=len(rows))
+            for log, through in zip(logs, throughs):
+                log._remove_parts_through(through)
+
+    def read(self, columns: list[str] | None = None, filters=None) -> pd.DataFrame:
+        """Every shard's rows (base + live log), read in parallel."""
+        frames = scatter(lambda log: read_dataset(log.directory, self.schema, columns, filters), self.logs)
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def append_batches(batches: Iterable[tuple[ShardedLog, pd.DataFrame]]) -> list[dict[int, int]]:
+    """
+    Append rows to several sharded datasets as one batch, e.g. transactions
+    together with their fraud scores (one DataFrame per dataset); returns
+    {shard: sequence number} for each dataset, in order.
+
+    Every shard directory the batch touches is locked, in one global order so
+    concurrent batches cannot deadlock, and each part is first written under
+    a staged name that readers ignore. Only once all of them are on disk are
+    they renamed into place, so a failure while writing (a row that does not
+    fit the schema, a full disk) appends nothing anywhere.
+
+    The renames are one os.replace per part, not one atomic step: a reader
+    polling during them can see part of the batch until its next poll, and a
+    process killed between them leaves the batch applied to some shards only.
+    Staged parts a dead writer never published are removed by the next append
+    to their directory.
+    """
+    batches = list(batches)
+    seqs: list[dict[int, int]] = [{} for _ in batches]
+    jobs = [
+        (seqs[position], index, shard_log, rows)
+        for position, (log, df) in enumerate(batches)
+        for index, (shard_log, rows) in enumerate(zip(log.logs, split_by_shard(df)))
+        if len(rows)
+    ]
+    with ExitStack() as locks:
+        for directory in sorted({shard_log.directory for _, _, shard_log, _ in jobs}):
+            locks.enter_context(exclusive_lock(directory))
+        staged = []
+        try:
+            for shard_seqs, index, shard_log, rows in jobs:
+                shard_log._remove_staged()
+                shard_seqs[index] = shard_log._last_seq() + 1
+                staged.append(stage_part(rows, shard_log.directory, shard_log.schema, shard_seqs[index]))
+        except BaseException:
+            for path in staged:
+                os.remove(path)
+            raise
+        for path in staged:
+            publish_part(path)
+    for _, _, shard_log, _ in jobs:
+        shard_log.maybe_compact()
+    return seqs
+
+
+transactions_log = ShardedLog("transactions", TXN_SCHEMA)
+scores_log = ShardedLog("fraud_scores", SCORE_SCHEMA)
+
+
+class InvalidRows(ValueError):
+    """Raised when ingested records do not fit their dataset's schema."""
+
+
+def append_records(transactions: list[dict], scores: list[dict]) -> dict:
+    """
+    Append JSON records (POST /ingest) to the transaction and fraud-score
+    datasets as one batch; returns how many rows went to each.
+    """
+    batches = []
+    for log, records in ((transactions_log, transactions), (scores_log, scores)):
+        if not records:
+            continue
+        df = pd.DataFrame.from_records(records)
+        missing = [name for name in log.schema.names if name not in df.columns]
+        if missing:
+            raise InvalidRows(f"{log.dataset} rows are missing {', '.join(missing)}")
+        batches.append((log, df))
+    try:
+        append_batches(batches)
+    except (ValueError, TypeError) as e:  # includes Arrow's conversion errors
+        raise InvalidRows(f"rows do not fit the schema: {e}") from e
+    return {"transactions": len(transactions), "scores": len(scores)}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["compact"]:
+        sys.exit("usage: python -m backend.ingest compact")
+    for log in (transactions_log, scores_log):
+        print(f"{log.dataset}: folded {log.compact()} part(s) across {len(log.logs)} shard(s)")
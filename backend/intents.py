@@ -0,0 +1,196 @@
+# backend/intents.py
+"""
+Near-duplicate intent cache.
+
+Support messages are mostly paraphrases of a few intents ("my card was
+stolen", "I don't recognise this charge"). Every message the LLM has
+classified is embedded with a hashing vectorizer over character n-grams, so
+there is nothing to fit and every worker produces the same vectors. The
+vector goes into an in-memory approximate nearest-neighbour index:
+random-hyperplane LSH, where several tables of short signatures select the
+candidates and an exact cosine over those picks the match. A new message
+whose nearest neighbour is similar enough, from a user in the same fraud
+tier, reuses that classification instead of calling the LLM.
+
+The index holds at most `max_entries` vectors. It evicts the least recently
+used one when full and is rebuilt periodically, which drops expired entries
+and stale bucket references.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.cache import normalize_message
+from backend.metrics import Counter
+
+INTENT_CACHE_SIZE = int(os.getenv("NOVAROUTE_INTENT_CACHE_SIZE", "4096"))
+# cosine similarity a past message needs for its classification to be reused
+INTENT_SIMILARITY = float(os.getenv("NOVAROUTE_INTENT_SIMILARITY", "0.9"))
+INTENT_TTL_SECONDS = float(os.getenv("NOVAROUTE_INTENT_TTL", "3600"))
+INTENT_REBUILD_SECONDS = float(os.getenv("NOVAROUTE_INTENT_REBUILD", "300"))
+# vector width; messages are short, so collisions in 1024 buckets are rare
+INTENT_FEATURES = 2 ** 10
+# LSH tables x bits per signature: at cosine 0.9 a neighbour shares a bucket
+# in at least one table ~94% of the time, at 0.95 ~99%
+LSH_TABLES = 8
+LSH_BITS = 8
+
+intent_lookups = Counter(
+    "novaroute_intent_cache_lookups_total", "Intent-cache lookups by outcome.", labels=("outcome",)
+)
+
+_vectorizer = None
+_vectorizer_lock = threading.Lock()
+
+
+def embed(message: str) -> np.ndarray:
+    """Unit-length float32 vector of the message's character 3- to 5-grams."""
+    global _vectorizer
+    if _vectorizer is None:
+        with _vectorizer_lock:
+            if _vectorizer is None:
+                from sklearn.feature_extraction.text import HashingVectorizer
+                _vectorizer = HashingVectorizer(
+                    analyzer="char_wb", ngram_range=(3, 5), n_features=INTENT_FEATURES, alternate_sign=False,
+                )
+    vector = _vectorizer.transform([normalize_message(message)]).toarray()[0].astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class IntentIndex:
+    """
+    LRU-bounded LSH index of classified messages, keyed by fraud tier.
+    Entries from another tier are never candidates: the tier is part of
+    every bucket key.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = INTENT_CACHE_SIZE,
+        threshold: float = INTENT_SIMILARITY,
+        ttl: float = INTENT_TTL_SECONDS,
+        rebuild_seconds: float = INTENT_REBUILD_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.rebuild_seconds = rebuild_seconds
+        # same seed everywhere, so signatures agree across workers and restarts
+        self._planes = np.random.default_rng(0).standard_normal((LSH_TABLES * LSH_BITS, INTENT_FEATURES)).astype(np.float32)
+        self._weights = 1 << np.arange(LSH_BITS)
+        self._vectors = np.zeros((max_entries, INTENT_FEATURES), dtype=np.float32)
+        self._signatures = np.zeros((max_entries, LSH_TABLES), dtype=np.int64)
+        self._entries: list[dict | None] = [None] * max_entries
+        # slot -> None, least recently used first
+        self._lru: OrderedDict = OrderedDict()
+        self._buckets: list[dict] = [{} for _ in range(LSH_TABLES)]
+        self._stale = 0
+        self._built_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+
+    def _signature(self, vector: np.ndarray) -> np.ndarray:
+        bits = (self._planes @ vector > 0).reshape(LSH_TABLES, LSH_BITS)
+        return bits @ self._weights
+
+    def lookup(self, message: str, tier: str) -> tuple[dict, float] | None:
+        """The closest classified message from the same tier and its similarity, if above the threshold."""
+        if not self.max_entries:
+            return None
+        vector = embed(message)
+        signature = self._signature(vector)
+        now = time.monotonic()
+        with self._lock:
+            candidates = {
+                slot for table, bucket in enumerate(self._buckets) for slot in bucket.get((tier, signature[table]), ())
+            }
+            # a slot may have been reused since it was bucketed; check what it holds now
+            candidates = [
+                slot for slot in candidates
+                if (entry := self._entries[slot]) is not None and entry["tier"] == tier and now - entry["added"] < self.ttl
+            ]
+            if candidates:
+                similarities = self._vectors[candidates] @ vector
+                best = int(similarities.argmax())
+                if similarities[best] >= self.threshold:
+                    slot = candidates[best]
+                    self._lru.move_to_end(slot)
+                    self.hits += 1
+                    intent_lookups.inc(outcome="hit")
+                    return dict(self._entries[slot]), float(similarities[best])
+            self.misses += 1
+        intent_lookups.inc(outcome="miss")
+        return None
+
+    def add(self, message: str, tier: str, priority: str, confidence: float):
+        """Index a classified message, evicting the least recently used one if full."""
+        if not self.max_entries:
+            return
+        vector = embed(message)
+        signature = self._signature(vector)
+        with self._lock:
+            if len(self._lru) < self.max_entries:
+                slot = len(self._lru)
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                # its bucket references go stale; lookups skip them and the next rebuild drops them
+                self._stale += 1
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._signatures[slot] = signature
+            self._entries[slot] = {
+                "message": message, "tier": tier, "priority": priority,
+                "confidence": confidence, "added": time.monotonic(),
+            }
+            self._lru[slot] = None
+            for table, bucket in enumerate(self._buckets):
+                bucket.setdefault((tier, signature[table]), []).append(slot)
+            if self._stale > self.max_entries // 2 or time.monotonic() - self._built_at > self.rebuild_seconds:
+                self._rebuild()
+
+    def _rebuild(self):
+        """Drop expired entries and rebuild every bucket from the live slots. Caller holds the lock."""
+        now = time.monotonic()
+        for slot in list(self._lru):
+            if now - self._entries[slot]["added"] >= self.ttl:
+                del self._lru[slot]
+                self._entries[slot] = None
+        # compact live slots to the front, in LRU order, so free slots are the tail
+        live = list(self._lru)
+        self._vectors[:len(live)] = self._vectors[live]
+        self._signatures[:len(live)] = self._signatures[live]
+        entries = [self._entries[slot] for slot in live]
+        self._entries = entries + [None] * (self.max_entries - len(live))
+        self._lru = OrderedDict.fromkeys(range(len(live)))
+        self._buckets = [{} for _ in range(LSH_TABLES)]
+        for slot, entry in enumerate(entries):
+            for table, bucket in enumerate(self._buckets):
+                bucket.setdefault((entry["tier"], self._signatures[slot, table]), []).append(slot)
+        self._stale = 0
+        self._built_at = now
+        self.rebuilds += 1
+
+    def rebuild(self):
+        with self._lock:
+            self._rebuild()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rebuilds": self.rebuilds,
+        }
+
+
+intent_index = IntentIndex()
@@ -0,0 +1,510 @@
+# backend/llm.py
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from backend.metrics import Counter, llm_errors, prompt_tokens, response_tokens, span
+from backend.resilience import CircuitBreaker, LatencyTracker, backoff_delay
+
+load_dotenv()
+
+# "gemini" (default), "stub" for a local fake model that needs no network, or
+# "http" for a model served at NOVAROUTE_LLM_URL (e.g. scripts/mock_llm_server.py)
+LLM_BACKEND = os.getenv("NOVAROUTE_LLM", "gemini")
+GEMINI_MODEL = os.getenv("NOVAROUTE_GEMINI_MODEL", "gemini-2.5-flash")
+LLM_URL = os.getenv("NOVAROUTE_LLM_URL", "http://127.0.0.1:8900/generate")
+LLM_TIMEOUT = float(os.getenv("NOVAROUTE_LLM_TIMEOUT", "30"))
+# how many model calls may run at once, and how many may wait behind them
+LLM_MAX_CONCURRENCY = int(os.getenv("NOVAROUTE_LLM_CONCURRENCY", "64"))
+LLM_MAX_QUEUE = int(os.getenv("NOVAROUTE_LLM_QUEUE", "1000"))
+# total seconds one request may spend on the model, retries included
+LLM_DEADLINE = float(os.getenv("NOVAROUTE_LLM_DEADLINE", "10"))
+# extra attempts after a failed or invalid reply, and the first backoff ceiling in seconds
+LLM_RETRIES = int(os.getenv("NOVAROUTE_LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("NOVAROUTE_LLM_BACKOFF", "0.2"))
+# a call still running past this quantile of recent latencies gets a duplicate; 0 disables hedging
+LLM_HEDGE_QUANTILE = float(os.getenv("NOVAROUTE_LLM_HEDGE_QUANTILE", "0.95"))
+# mean simulated latency of the stub model, in seconds
+STUB_LATENCY = float(os.getenv("NOVAROUTE_STUB_LATENCY", "0.5"))
+# faults the stub injects, as shares of calls: raised errors, truncated JSON,
+# and calls that take STUB_SLOW_FACTOR times longer than usual
+STUB_ERROR_RATE = float(os.getenv("NOVAROUTE_STUB_ERROR_RATE", "0"))
+STUB_MALFORMED_RATE = float(os.getenv("NOVAROUTE_STUB_MALFORMED_RATE", "0"))
+STUB_SLOW_RATE = float(os.getenv("NOVAROUTE_STUB_SLOW_RATE", "0"))
+STUB_SLOW_FACTOR = float(os.getenv("NOVAROUTE_STUB_SLOW_FACTOR", "20"))
+# share of the stub's latency spent before the first streamed chunk
+STUB_FIRST_CHUNK = 0.3
+STREAM_CHUNK_CHARS = 24
+
+# the reply every model is held to: Gemini enforces it while decoding, and
+# the analyzer validates every reply against it before using it
+REPLY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "priority": {"type": "string", "enum": ["HIGH", "MEDIUM", "LOW"]},
+        "confidence": {"type": "number"},
+        "response": {"type": "string"},
+        "info": {"type": "string"},
+    },
+    "required": ["priority", "confidence", "response", "info"],
+}
+
+retries = Counter("novaroute_llm_retries_total", "LLM calls retried after a failed or invalid reply.")
+hedges = Counter("novaroute_llm_hedges_total", "Duplicate LLM calls started for slow requests.")
+
+
+class TextResult:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubError(RuntimeError):
+    """A failure injected by the stub model."""
+
+
+class StubModel:
+    """
+    Offline stand-in for genai.GenerativeModel. Sleeps for a jittered
+    latency like a remote call would, then answers with a keyword-based
+    classification in the same JSON shape the prompt asks Gemini for.
+    With stream=True the text arrives in chunks spread over that latency.
+
+    For fault drills it can fail a share of calls: raise StubError, return
+    JSON cut off halfway, or take slow_factor times its usual latency.
+    """
+
+    HIGH_WORDS = ("fraud", "stole", "suspicious", "unauthorized", "didn't make", "hacked", "lost my card")
+    MEDIUM_WORDS = ("payment", "balance", "due", "charge", "refund", "late fee")
+
+    def __init__(
+        self,
+        latency: float = STUB_LATENCY,
+        error_rate: float = STUB_ERROR_RATE,
+        malformed_rate: float = STUB_MALFORMED_RATE,
+        slow_rate: float = STUB_SLOW_RATE,
+        slow_factor: float = STUB_SLOW_FACTOR,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        latency = random.uniform(0.5, 1.5) * self.latency
+        if random.random() < self.slow_rate:
+            latency *= self.slow_factor
+        text = self.reply(prompt)
+        if random.random() < self.malformed_rate:
+            text = text[: len(text) // 2]
+        fail = random.random() < self.error_rate
+        if stream:
+            return self._stream(text, latency, fail)
+        time.sleep(latency)
+        if fail:
+            raise StubError("injected stub failure")
+        return TextResult(text)
+
+    @staticmethod
+    def _stream(text: str, latency: float, fail: bool = False):
+        pieces = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+        time.sleep(latency * STUB_FIRST_CHUNK)
+        if fail:
+            raise StubError("injected stub failure")
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(latency * (1 - STUB_FIRST_CHUNK) / (len(pieces) - 1))
+            yield TextResult(piece)
+
+    @classmethod
+    def reply(cls, prompt: str) -> str:
+        """The JSON text the stub answers prompt with."""
+        # only look at the user's message, not the instructions around it
+        message = prompt.split("USER MESSAGE:", 1)[-1].split("Based on", 1)[0].lower()
+        if any(w in message for w in cls.HIGH_WORDS) or "User fraud risk: High" in prompt:
+            priority = "HIGH"
+        elif any(w in message for w in cls.MEDIUM_WORDS):
+            priority = "MEDIUM"
+        else:
+            priority = "LOW"
+        return json.dumps({
+            "priority": priority,
+            "confidence": 0.8,
+            "response": f"[stub] Thanks for reaching out, we've marked this as {priority.lower()} priority.",
+            "info": "[stub] Generated locally without calling Gemini.",
+        })
+
+
+class HTTPModel:
+    """
+    Model behind a plain HTTP endpoint: POST {"prompt": ...} and get back
+    {"text": ...}, or with "stream": true the bare text as a chunked body.
+    Non-2xx replies raise, like a failed Gemini call would. The reply schema
+    is sent along as "schema" for servers that can constrain their output.
+    """
+
+    def __init__(self, url: str = LLM_URL, timeout: float = LLM_TIMEOUT, pool_size: int = 64):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        response = self._session.post(
+            self.url, json={"prompt": prompt, "stream": stream, "schema": REPLY_SCHEMA},
+            timeout=self.timeout, stream=stream,
+        )
+        response.raise_for_status()
+        if stream:
+            response.encoding = response.encoding or "utf-8"
+            return (TextResult(piece) for piece in response.iter_content(chunk_size=None, decode_unicode=True))
+        return TextResult(response.json()["text"])
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Return the configured model, creating it on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if LLM_BACKEND == "stub":
+                    _model = StubModel()
+                elif LLM_BACKEND == "http":
+                    _model = HTTPModel(pool_size=LLM_MAX_CONCURRENCY)
+                else:
+                    import google.generativeai as genai
+                    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                    # constrained decoding: the reply is always JSON of this shape
+                    _model = genai.GenerativeModel(GEMINI_MODEL, generation_config={
+                        "response_mime_type": "application/json", "response_schema": REPLY_SCHEMA,
+                    })
+    return _model
+
+
+class Permits:
+    """
+    Counting semaphore shared by event-loop tasks and plain threads, handed
+    out in FIFO order across both: the async paths and generate_blocking
+    draw on the same model slots. A released permit goes straight to the
+    oldest waiter.
+    """
+
+    class _Waiter:
+        def __init__(self, wake):
+            self.wake = wake
+            self.granted = False
+
+    def __init__(self, size: int):
+        self.size = size
+        self.free = size
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _take(self, wake):
+        """None if a permit was free and taken, else the queued waiter."""
+        with self._lock:
+            if self.free and not self._waiters:
+                self.free -= 1
+                return None
+            waiter = self._Waiter(wake)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _give_up(self, waiter) -> bool:
+        """Leave the queue; True if the permit was granted meanwhile and is now the caller's."""
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+            return waiter.granted
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            if not future.done():
+                future.set_result(None)
+
+        waiter = self._take(lambda: loop.call_soon_threadsafe(grant))
+        if waiter is None:
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            if self._give_up(waiter):
+                self.release()
+            raise
+
+    def acquire_blocking(self, timeout: float) -> bool:
+        event = threading.Event()
+        waiter = self._take(event.set)
+        if waiter is None or event.wait(timeout):
+            return True
+        return self._give_up(waiter)
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self.free += 1
+
+
+class LLMQueueFull(Exception):
+    """Raised when more requests are waiting for the model than the queue allows."""
+
+
+class LLMQueue:
+    """
+    Runs blocking generate_content calls on a dedicated thread pool so the
+    event loop stays free. At most max_concurrency calls run at once; up to
+    max_queue more wait in FIFO order, and anything beyond that is rejected
+    with LLMQueueFull instead of piling up without bound.
+
+    Every request has a deadline. Failed or rejected replies are retried
+    with jittered backoff, and a call still running past the hedging
+    quantile of recent latencies gets a duplicate; the first good reply
+    wins. A circuit breaker fails requests fast with CircuitOpen while the
+    provider keeps failing.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        deadline: float = LLM_DEADLINE,
+        retries: int = LLM_RETRIES,
+        backoff: float = LLM_BACKOFF,
+        hedge_quantile: float = LLM_HEDGE_QUANTILE,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_quantile = hedge_quantile
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._permits = Permits(max_concurrency)
+
+    @property
+    def waiting(self) -> int:
+        return self._permits.waiting
+
+    @property
+    def running(self) -> int:
+        return self._permits.size - self._permits.free
+
+    def is_full(self) -> bool:
+        return self.waiting >= self.max_queue
+
+    async def _acquire(self):
+        if self.is_full():
+            raise LLMQueueFull(f"{self.waiting} LLM requests already queued")
+        await self._permits.acquire()
+
+    def _acquire_blocking(self, timeout: float):
+        if self.is_full():
+            raise LLMQueueFull(f"{self.waiting} LLM requests already queued")
+        if not self._permits.acquire_blocking(timeout):
+            raise TimeoutError("no LLM slot freed up before the deadline")
+
+    def _submit(self, fn, *args):
+        """Run fn on the model pool under a permit already taken; the permit is held until fn really returns."""
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._permits.release()
+            raise
+        future.add_done_callback(lambda _: self._permits.release())
+        return future
+
+    async def generate(self, prompt: str, parse=None):
+        """
+        Return the model's text for prompt, or parse(text) if given, without
+        blocking the event loop. A ValueError from parse rejects the reply
+        like a failed call. Raises CircuitOpen, LLMQueueFull, TimeoutError
+        past the deadline, or the last attempt's error.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        for attempt in itertools.count():
+            self.breaker.before_call()
+            try:
+                text = await asyncio.wait_for(self._hedged(loop, prompt), deadline - loop.time())
+                result = parse(text) if parse else text
+            except LLMQueueFull:
+                raise
+            except Exception as e:
+                delay = self._retry_delay(attempt, deadline - loop.time(), e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def generate_blocking(self, prompt: str, parse=None):
+        """
+        generate() for callers without an event loop: same slots, queue limit,
+        deadline, retries and breaker, no hedging.
+        """
+        deadline = time.monotonic() + self.deadline
+        for attempt in itertools.count():
+            self.breaker.before_call()
+            try:
+                with span("llm_wait"):
+                    self._acquire_blocking(max(deadline - time.monotonic(), 0))
+                with span("llm"):
+                    # on timeout the call keeps its slot until it actually finishes
+                    future = self._submit(generate_text, prompt)
+                    text = future.result(timeout=max(deadline - time.monotonic(), 0))
+                result = parse(text) if parse else text
+            except LLMQueueFull:
+                raise
+            except Exception as e:
+                delay = self._retry_delay(attempt, deadline - time.monotonic(), e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _retry_delay(self, attempt: int, remaining: float, error: Exception) -> float | None:
+        """Record a failed attempt; the backoff before the next one, or None to give up."""
+        self._record_failure(error)
+        delay = backoff_delay(attempt, self.backoff)
+        if attempt >= self.retries or delay >= remaining or self.breaker.state != "closed":
+            return None
+        retries.inc()
+        return delay
+
+    def _record_failure(self, error: Exception):
+        llm_errors.inc(reason=type(error).__name__)
+        self.breaker.record_failure()
+
+    async def _hedged(self, loop, prompt: str) -> str:
+        """One call, plus a duplicate if it outlives the hedging quantile and a slot is free."""
+        with span("llm"):
+            calls = {asyncio.ensure_future(self._call(loop, prompt))}
+            try:
+                hedge_after = self.latency.quantile(self.hedge_quantile) if self.hedge_quantile else None
+                if hedge_after is not None:
+                    done, _ = await asyncio.wait(calls, timeout=hedge_after)
+                    # never queue a hedge behind other requests' first attempts
+                    if not done and self._permits.free:
+                        hedges.inc()
+                        calls.add(asyncio.ensure_future(self._call(loop, prompt)))
+                while True:
+                    done, calls = await asyncio.wait(calls, return_when=asyncio.FIRST_COMPLETED)
+                    ok = [call for call in done if call.exception() is None]
+                    if ok:
+                        return ok[0].result()
+                    if not calls:
+                        raise done.pop().exception()
+            finally:
+                for call in calls:
+                    call.cancel()
+
+    async def _call(self, loop, prompt: str) -> str:
+        with span("llm_wait"):
+            await self._acquire()
+        start = time.perf_counter()
+        # the slot is held until the model call really ends, even if the hedge
+        # that started it has already been answered or cancelled
+        future = self._submit(generate_text, prompt)
+        text = await asyncio.wrap_future(future, loop=loop)
+        self.latency.observe(time.perf_counter() - start)
+        return text
+
+    async def stream(self, prompt: str, parse=None):
+        """
+        Yield the model's text in chunks as they are generated, under the same
+        limits, deadline and breaker as generate(). Never retried or hedged:
+        chunks already passed on can't be taken back. If parse is given, the
+        whole text is checked with it at the end, and a ValueError counts as a
+        failed call before it is raised.
+        """
+        loop = asyncio.get_running_loop()
+        self.breaker.before_call()
+        deadline = loop.time() + self.deadline
+        with span("llm_wait"):
+            await self._acquire()
+        chunks = asyncio.Queue()
+
+        def produce():
+            try:
+                for piece in _stream_text(prompt):
+                    loop.call_soon_threadsafe(chunks.put_nowait, piece)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+            loop.call_soon_threadsafe(chunks.put_nowait, None)
+
+        # the slot is held until the model call really ends, even if the
+        # consumer stops reading early
+        self._submit(produce)
+        with span("llm"):
+            received = []
+            try:
+                while (item := await asyncio.wait_for(chunks.get(), deadline - loop.time())) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+                    received.append(item)
+                    yield item
+                if parse:
+                    parse("".join(received))
+            except Exception as e:
+                self._record_failure(e)
+                raise
+            self.breaker.record_success()
+
+
+def _tokens(text: str) -> int:
+    # imported here so the stub model (scripts/mock_llm_server.py) stays free of the data stack
+    from backend.context import estimate_tokens
+    return estimate_tokens(text)
+
+
+def generate_text(prompt: str) -> str:
+    """One blocking model call, counted in the token metrics."""
+    prompt_tokens.inc(_tokens(prompt))
+    text = get_model().generate_content(prompt).text
+    response_tokens.inc(_tokens(text))
+    return text
+
+
+def _stream_text(prompt: str):
+    prompt_tokens.inc(_tokens(prompt))
+    received = []
+    try:
+        for chunk in get_model().generate_content(prompt, stream=True):
+            received.append(chunk.text)
+            yield chunk.text
+    finally:
+        response_tokens.inc(_tokens("".join(received)))
+
+
+llm_queue = LLMQueue()
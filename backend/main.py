@@ -1,17 +1,295 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from backend.analyzer import analyze_message_with_gemini
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from backend.cache import response_cache
+from backend.chats import get_chat_store
+from backend.llm import LLMQueueFull, llm_queue
+from backend import metrics
+from backend.routing import (
+    SIMULATED_HANDLE_TIME, AgentAtCapacity, get_routing_queue, route_conversation, simulate_agents,
+)
+from backend.warmup import warmup
+
+# backend.analyzer and backend.data_api pull in pandas and pyarrow; they are
+# imported by the warm-up thread (or the first request that needs them), so
+# the worker accepts connections without waiting for them
+
+MAX_BATCH_SIZE = 1000
+MAX_INGEST_ROWS = 10_000
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
 
 class MessageRequest(BaseModel):
     user_id: str
     message: str
 
-app = FastAPI()
+class BatchRequest(BaseModel):
+    messages: list[MessageRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class IngestRequest(BaseModel):
+    transactions: list[dict] = Field(default_factory=list, max_length=MAX_INGEST_ROWS)
+    scores: list[dict] = Field(default_factory=list, max_length=MAX_INGEST_ROWS)
+
+class AgentRequest(BaseModel):
+    capacity: int = Field(..., ge=1)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.start()
+    simulation = asyncio.create_task(simulate_agents(SIMULATED_HANDLE_TIME)) if SIMULATED_HANDLE_TIME > 0 else None
+    yield
+    if simulation:
+        simulation.cancel()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # streamed responses are timed to their headers; their stages show up in the stage histogram
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.http_seconds.observe(
+        time.perf_counter() - start,
+        method=request.method, route=route.path if route else "unmatched", status=response.status_code,
+    )
+    return response
+
+async def save_turn(user_id: str, message: str, result: dict):
+    # a short SQLite write, but still off the event loop
+    await asyncio.to_thread(get_chat_store().append, user_id, message, result)
+
+async def route_turn(user_id: str, message: str, result: dict) -> dict:
+    # the fraud-tier lookup may refresh risk aggregates from disk
+    return await asyncio.to_thread(route_conversation, user_id, message, result)
 
 @app.post("/analyze")
 async def analyze_message(data: MessageRequest):
-    result = analyze_message_with_gemini(data.message, data.user_id)
-    return {"user_id": data.user_id, **result}
+    from backend.analyzer import analyze_message_async
+    try:
+        result = await analyze_message_async(data.message, data.user_id)
+    except LLMQueueFull:
+        # shed load instead of letting the wait queue grow without bound
+        raise HTTPException(status_code=503, detail="Too many conversations in flight, please retry.")
+    await save_turn(data.user_id, data.message, result)
+    return {"user_id": data.user_id, **result, "routing": await route_turn(data.user_id, data.message, result)}
+
+
+@app.post("/analyze/stream")
+async def analyze_message_streaming(data: MessageRequest):
+    """
+    Server-Sent Events: "priority" (priority, confidence) as soon as it is
+    known, then "response" and "info" events carrying text deltas, then
+    "done" with the same body /analyze returns.
+    """
+    from backend.analyzer import analyze_message_stream
+    if llm_queue.is_full():
+        raise HTTPException(status_code=503, detail="Too many conversations in flight, please retry.")
+
+    async def events():
+        async for event, payload in analyze_message_stream(data.message, data.user_id):
+            if event == "done":
+                await save_turn(data.user_id, data.message, payload)
+                payload = {"user_id": data.user_id, **payload, "routing": await route_turn(data.user_id, data.message, payload)}
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/analyze/batch")
+async def analyze_message_batch(data: BatchRequest):
+    """Stream one NDJSON line per message, in completion order, tagged with its index in the request."""
+    from backend.analyzer import analyze_batch
+    items = [(m.user_id, m.message) for m in data.messages]
+
+    async def results():
+        async for index, result in analyze_batch(items):
+            user_id, message = items[index]
+            await save_turn(user_id, message, result)
+            routing = await route_turn(user_id, message, result)
+            yield json.dumps({"index": index, "user_id": user_id, **result, "routing": routing}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.get("/routing/stats")
+def routing_stats():
+    return get_routing_queue().stats()
+
+
+@app.put("/agents/{agent_id}")
+def register_agent(agent_id: str, data: AgentRequest):
+    agent = get_routing_queue().add_agent(agent_id, data.capacity)
+    return {"agent_id": agent.agent_id, "capacity": agent.capacity, "active": agent.active}
+
+
+@app.post("/agents/{agent_id}/claim")
+def claim_conversation(agent_id: str):
+    """Hand the agent the most urgent waiting conversation; 204 when the queue is empty."""
+    try:
+        conversation = get_routing_queue().claim(agent_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown agent {agent_id}.")
+    except AgentAtCapacity as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if conversation is None:
+        return Response(status_code=204)
+    return conversation.to_dict()
+
+
+@app.post("/conversations/{conversation_id}/complete")
+def complete_conversation(conversation_id: str):
+    try:
+        conversation = get_routing_queue().complete(conversation_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No claimed conversation {conversation_id}.")
+    return conversation.to_dict()
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison of etag against an If-None-Match list: W/ and quotes are ignored, "*" matches anything."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.removeprefix("W/").strip('"') == etag.strip('"'):
+            return True
+    return False
+
+
+def conditional_json(request: Request, etag: str, build) -> Response:
+    """304 if the client already holds this version, else build() as JSON tagged with etag."""
+    from backend.data_api import InvalidCursor
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    try:
+        return JSONResponse(build(), headers=headers)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/accounts")
+def list_accounts(
+    request: Request, cursor: str | None = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    prefix: str = "",
+):
+    """Account summaries (user_id, name) ordered by user_id, one page at a time; prefix narrows them to matching user_ids."""
+    from backend import data_api
+    etag = data_api.make_etag("accounts", data_api.accounts_version(), cursor, limit, prefix)
+    return conditional_json(request, etag, lambda: data_api.accounts_page(cursor, limit, prefix))
+
+
+@app.get("/accounts/{user_id}")
+def get_account(request: Request, user_id: str):
+    from backend import data_api
+    etag = data_api.make_etag("account", data_api.accounts_version(), user_id)
+    account = data_api.account_cache.get(user_id)
+    if account is None:
+        raise HTTPException(status_code=404, detail=f"Unknown user {user_id}.")
+    return conditional_json(request, etag, lambda: account)
+
+
+@app.get("/accounts/{user_id}/transactions")
+def list_transactions(
+    request: Request,
+    user_id: str,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    min_amount: float = Query(0.0, ge=0),
+    only_foreign: bool = False,
+    only_flagged: bool = False,
+):
+    """The user's transactions newest first; pass next_cursor back as cursor for the following page."""
+    from backend import data_api
+    query = (cursor, limit, min_amount, only_foreign, only_flagged)
+    # one store for both, so the ETag describes exactly the version the body is read from
+    store = data_api.get_store()
+    etag = data_api.make_etag("transactions", user_id, data_api.transactions_version(user_id, store), *query)
+    return conditional_json(request, etag, lambda: data_api.transactions_page(user_id, *query, store=store))
+
+
+@app.get("/accounts/{user_id}/fraud-status")
+def fraud_status(request: Request, user_id: str):
+    from backend import data_api
+    store = data_api.get_store()
+    etag = data_api.make_etag("fraud-status", user_id, data_api.transactions_version(user_id, store))
+    return conditional_json(request, etag, lambda: data_api.fraud_status_counts(user_id, store))
+
+
+@app.get("/accounts/{user_id}/risk")
+def risk(request: Request, user_id: str):
+    from backend import data_api
+    summary = data_api.risk_summary(user_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No fraud scores for {user_id}.")
+    etag = data_api.make_etag("risk", summary)
+    return conditional_json(request, etag, lambda: summary)
+
+
+@app.post("/ingest")
+async def ingest_rows(data: IngestRequest):
+    """
+    Append transaction rows and fraud-score rows as one batch. The data
+    endpoints return them within NOVAROUTE_SNAPSHOT_POLL seconds.
+    """
+    from backend.ingest import InvalidRows, append_records
+    try:
+        return await asyncio.to_thread(append_records, data.transactions, data.scores)
+    except InvalidRows as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/risk/tiers")
+def risk_tiers():
+    from backend import data_api
+    return data_api.risk_tiers()
+
+
+@app.get("/chats/{user_id}")
+async def chat_history(request: Request, user_id: str, before: int | None = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """The user's chat turns newest first; pass next_before back as before for older ones."""
+    from backend.data_api import make_etag
+    chats = get_chat_store()
+    # both SQLite reads run off the event loop
+    etag = make_etag("chats", user_id, await asyncio.to_thread(chats.version, user_id), before, limit)
+
+    def page():
+        turns = chats.history(user_id, before, limit)
+        return {"turns": turns, "next_before": turns[-1]["id"] if len(turns) == limit else None}
+
+    return await asyncio.to_thread(conditional_json, request, etag, page)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    from backend.intents import intent_index
+    return response_cache.stats() | {"intents": intent_index.stats()}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving; says nothing about the data."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def readiness():
+    """200 once the data and store are loaded, 503 with per-step progress until then."""
+    report = warmup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
 
 
 @app.get("/")
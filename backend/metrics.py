@@ -0,0 +1,218 @@
+# backend/metrics.py
+"""
+In-process metrics and structured logs, exported at /metrics in the
+Prometheus text format.
+
+    with span("build_prompt"):
+        ...
+
+times a stage into the novaroute_stage_seconds histogram, and the stages of
+one request are collected so sample_log() can show where its time went. Each
+uvicorn worker keeps its own counts; Prometheus scrapes them separately.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# share of requests whose structured log line is written
+LOG_SAMPLE_RATE = float(os.getenv("NOVAROUTE_LOG_SAMPLE", "0.01"))
+# seconds; from a cache hit to a slow model call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+logger = logging.getLogger("novaroute")
+if not logger.handlers:
+    # one JSON object per line on stderr, next to uvicorn's own logs
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.getenv("NOVAROUTE_LOG_LEVEL", "INFO"))
+    logger.propagate = False
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        # an unlabeled counter is exported as 0 before its first increment
+        self._values: dict[tuple, float] = {} if self.labels else {(): 0}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_label_text(self.labels, key)} {_number(value)}"
+
+
+class Gauge:
+    """A value that can go up and down, per label combination."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple, float] = {} if self.labels else {(): 0}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    samples = Counter.samples
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in items:
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                total += count
+                le = f'le="{bound if bound == "+Inf" else _number(bound)}"'
+                yield f"{self.name}_bucket{_label_text(self.labels, key, le)} {total}"
+            yield f"{self.name}_sum{_label_text(self.labels, key)} {counts[-1]!r}"
+            yield f"{self.name}_count{_label_text(self.labels, key)} {total}"
+
+
+REGISTRY: list = []
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = Histogram("novaroute_stage_seconds", "Time spent in each analyze and data stage.", ("stage",))
+http_seconds = Histogram(
+    "novaroute_http_request_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+prompt_tokens = Counter("novaroute_prompt_tokens_total", "Estimated tokens sent to the LLM.")
+response_tokens = Counter("novaroute_response_tokens_total", "Estimated tokens received from the LLM.")
+llm_errors = Counter("novaroute_llm_errors_total", "Failed or unparseable LLM calls.", ("reason",))
+fallbacks = Counter("novaroute_fallback_responses_total", "Requests answered with the default response.")
+priorities = Counter(
+    "novaroute_priority_total", "Analyze results by priority and the tier that answered.", ("priority", "answered_by")
+)
+
+
+class Trace:
+    """The stages one request went through, and whether its log lines are written."""
+
+    def __init__(self, sampled: bool):
+        self.sampled = sampled
+        self.stages: list[tuple[str, float]] = []
+
+
+_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("novaroute_trace", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the block into novaroute_stage_seconds and the current request's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace.stages.append((stage, round(elapsed * 1000, 3)))
+
+
+def start_trace() -> Trace:
+    """Collect this context's spans from here on; one sampling decision covers all its log lines."""
+    trace = Trace(random.random() < LOG_SAMPLE_RATE)
+    _trace.set(trace)
+    return trace
+
+
+def sample_log(event: str, **fields):
+    """Write one JSON log line if the current request is sampled (LOG_SAMPLE_RATE), with its stages so far."""
+    trace = _trace.get()
+    sampled = trace.sampled if trace is not None else random.random() < LOG_SAMPLE_RATE
+    if not sampled or not logger.isEnabledFor(logging.INFO):
+        return
+    if trace is not None and trace.stages:
+        fields["stages_ms"] = trace.stages
+    logger.info(json.dumps({"event": event, **fields}, default=str))
+
+
+def record_result(result: dict):
+    """Count an analyze result by priority, and as a fallback when it is one."""
+    answered_by = result.get("answered_by", "unknown")
+    priorities.inc(priority=result.get("priority", "UNKNOWN"), answered_by=answered_by)
+    if answered_by == "fallback":
+        fallbacks.inc()
@@ -0,0 +1,98 @@
+# backend/resilience.py
+"""
+Building blocks that keep a slow or failing LLM provider from dragging the
+service down with it: a circuit breaker that fails fast while the provider
+is degraded, a latency tracker that tells when a call is slow enough to
+hedge, and jittered exponential backoff for retries.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from backend.metrics import Counter, Gauge, logger
+
+# consecutive failed calls that open the breaker, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("NOVAROUTE_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("NOVAROUTE_BREAKER_COOLDOWN", "30"))
+# successful latencies remembered for the hedging threshold, and how many are needed first
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+breaker_state = Gauge("novaroute_llm_breaker_open", "1 while the LLM circuit breaker is open or probing.")
+breaker_trips = Counter("novaroute_llm_breaker_trips_total", "Times the LLM circuit breaker opened.")
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a provider the breaker considers degraded."""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through and consecutive failures are counted. After
+    `failures` in a row it opens and every call fails fast with CircuitOpen
+    for `cooldown` seconds. Then one probe call is let through (half-open):
+    success closes the breaker, failure opens it for another cooldown.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go through now."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # this caller is the probe; another gets through if it never reports back
+                self.state = "half_open"
+                self.opened_at = time.monotonic()
+                return
+            raise CircuitOpen(f"LLM circuit {self.state.replace('_', '-')}")
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != "closed":
+                logger.warning("LLM circuit breaker closed")
+            self.state = "closed"
+            breaker_state.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive_failures >= self.failures):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                breaker_trips.inc()
+                breaker_state.set(1)
+                logger.warning("LLM circuit breaker opened after %d failures", self.consecutive_failures)
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for the hedging threshold."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = LATENCY_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """The q-quantile of the window, or None until min_samples have been seen."""
+        samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def backoff_delay(attempt: int, base: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, base * 2**attempt]."""
+    return random.uniform(0, base * 2 ** attempt)
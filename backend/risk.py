@@ -0,0 +1,193 @@
+# backend/risk.py
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from backend.columnar import SCORE_SCHEMA, SCORES_DIR
+from backend.ingest import LogTail
+from backend.metrics import logger, span
+from backend.shards import all_shards, scatter, shard_of
+from backend.store import SNAPSHOT_POLL_SECONDS
+
+
+@dataclass(frozen=True)
+class UserRisk:
+    """
+    Fraud-score aggregates for one user. Immutable: an update replaces the
+    whole record, so a reader never sees one half-applied.
+    """
+    count: int = 0
+    score_sum: float = 0.0
+    flagged_count: int = 0
+    max_score: float = 0.0
+    # when the newest score file counted here was written; scores carry no time of their own
+    last_updated: float = 0.0
+
+    @property
+    def mean_score(self) -> float:
+        return self.score_sum / self.count if self.count else 0.0
+
+    @property
+    def flagged_pct(self) -> float:
+        return 100.0 * self.flagged_count / self.count if self.count else 0.0
+
+    @property
+    def tier(self) -> str:
+        mean_score = round(self.mean_score, 3)
+        return "High" if mean_score > 0.75 else "Medium" if mean_score > 0.4 else "Low"
+
+
+class RiskAggregates:
+    """
+    Per-user risk table built from the fraud_scores dataset in one pass, then
+    kept up to date by tailing its ingestion log: batches appended since the
+    last refresh are read (three columns only) and folded in per user, so
+    lookups never rescan the score history. If the dataset is replaced, the
+    table is rebuilt from scratch and swapped in whole.
+
+    The log is checked at most every SNAPSHOT_POLL_SECONDS, like the store,
+    since one request looks the same user up several times.
+    """
+
+    COLUMNS = ["user_id", "fraud_score", "fraud_label"]
+
+    def __init__(self, directory: str = SCORES_DIR):
+        self.directory = directory
+        self.users: dict[str, UserRisk] = {}
+        self._tail = LogTail(directory, SCORE_SCHEMA, self.COLUMNS)
+        # _lock guards the table (short); _refresh_lock lets one caller read the log at a time
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._checked_at = 0.0
+        # bumped on every full rebuild, so (generation, count) never repeats
+        self.generation = 0
+        with self._refresh_lock:
+            self._rebuild()
+
+    def get(self, user_id: str) -> UserRisk | None:
+        self.refresh()
+        with self._lock:
+            return self.users.get(user_id)
+
+    def version(self, user_id: str) -> tuple:
+        """Stamp that changes whenever the user's scores change."""
+        self.refresh()
+        with self._lock:
+            risk = self.users.get(user_id)
+            return (self.generation, risk.count if risk else 0)
+
+    def refresh(self, force: bool = False):
+        """Pick up score batches appended since the last check, at most every SNAPSHOT_POLL_SECONDS unless forced."""
+        if not force and time.monotonic() - self._checked_at < SNAPSHOT_POLL_SECONDS:
+            return
+        # one caller reads the log; the others keep using the current table meanwhile
+        if not self._refresh_lock.acquire(blocking=force):
+            return
+        try:
+            new_rows = self._tail.poll()
+            if new_rows is None:
+                with span("risk_rebuild"):
+                    self._rebuild()
+            elif len(new_rows):
+                self._apply(new_rows)
+            self._checked_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def _apply(self, rows: pd.DataFrame):
+        grouped = _aggregate(rows)
+        written_at = self._tail.written_at
+        with self._lock:
+            for user_id, row in zip(grouped.index, grouped.itertuples(index=False)):
+                old = self.users.get(user_id) or UserRisk()
+                self.users[user_id] = UserRisk(
+                    old.count + int(row.count),
+                    old.score_sum + float(row.score_sum),
+                    old.flagged_count + int(row.flagged_count),
+                    max(old.max_score, float(row.max_score)),
+                    written_at,
+                )
+
+    def _rebuild(self):
+        df = self._tail.read_all()
+        users = {}
+        if df.empty:
+            logger.warning("No fraud scores found in %s, running without risk context.", self.directory)
+        else:
+            grouped = _aggregate(df)
+            written_at = self._tail.written_at
+            for user_id, row in zip(grouped.index, grouped.itertuples(index=False)):
+                users[user_id] = UserRisk(
+                    int(row.count), float(row.score_sum), int(row.flagged_count), float(row.max_score), written_at
+                )
+        with self._lock:
+            self.users = users
+            self.generation += 1
+        self._checked_at = time.monotonic()
+
+    def tier_counts(self) -> dict[str, int]:
+        """Users per fraud tier."""
+        self.refresh()
+        with self._lock:
+            users = list(self.users.values())
+        counts = {"High": 0, "Medium": 0, "Low": 0}
+        for risk in users:
+            counts[risk.tier] += 1
+        return counts
+
+
+def _aggregate(rows: pd.DataFrame) -> pd.DataFrame:
+    """count, score_sum, flagged_count and max_score per user_id."""
+    return rows.groupby("user_id", observed=True).agg(
+        count=("fraud_score", "size"),
+        score_sum=("fraud_score", "sum"),
+        flagged_count=("fraud_label", "sum"),
+        max_score=("fraud_score", "max"),
+    )
+
+
+class ShardedRiskAggregates:
+    """
+    One RiskAggregates per shard behind the same interface. A user's lookup
+    reads only their shard's table. Building, refreshing and fleet-wide
+    queries fan out across the shards in parallel.
+    """
+
+    def __init__(self):
+        self.shards = scatter(lambda shard: RiskAggregates(shard.scores_dir), all_shards())
+
+    def for_user(self, user_id: str) -> RiskAggregates:
+        return self.shards[shard_of(user_id, len(self.shards))]
+
+    def get(self, user_id: str) -> UserRisk | None:
+        return self.for_user(user_id).get(user_id)
+
+    def version(self, user_id: str) -> tuple:
+        return self.for_user(user_id).version(user_id)
+
+    def refresh(self, force: bool = False):
+        scatter(lambda shard: shard.refresh(force), self.shards)
+
+    def tier_counts(self) -> dict[str, int]:
+        """Users per fraud tier across every shard."""
+        counts = {"High": 0, "Medium": 0, "Low": 0}
+        for shard_counts in scatter(RiskAggregates.tier_counts, self.shards):
+            for tier, n in shard_counts.items():
+                counts[tier] += n
+        return counts
+
+
+_aggregates = None
+_aggregates_lock = threading.Lock()
+
+
+def get_risk_aggregates() -> ShardedRiskAggregates:
+    """Return the process-wide risk tables, building every shard's on first use."""
+    global _aggregates
+    if _aggregates is None:
+        with _aggregates_lock:
+            if _aggregates is None:
+                _aggregates = ShardedRiskAggregates()
+    return _aggregates
@@ -0,0 +1,362 @@
+# backend/routing.py
+"""
+Human-agent routing for analyzed conversations.
+
+The queue lives in one SQLite file (WAL mode, like the chat history), so
+every uvicorn worker enqueues into and claims from the same queue. Waiting
+conversations are indexed by enqueue time plus a head start for their
+priority and the user's fraud tier. Because the key is fixed at enqueue
+time, aging costs nothing: a LOW conversation simply sorts ahead of any HIGH
+one that arrives more than LOW's offset after it, so nothing starves, and
+enqueue and claim are an index insert and an index range scan, O(log n).
+
+Only conversations that need a human are queued: MEDIUM and HIGH priority
+by default (NOVAROUTE_ROUTE_MIN_PRIORITY). LOW ones are answered by the
+assistant alone. Agents pull work up to their capacity (claim), then
+complete it. The queue is bounded; past ROUTE_MAX_DEPTH new conversations are rejected instead of
+queueing without limit.
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+ROUTING_DB_PATH = os.getenv("NOVAROUTE_ROUTING_DB", "data/routing.sqlite3")
+ROUTE_MAX_DEPTH = int(os.getenv("NOVAROUTE_ROUTE_QUEUE", "10000"))
+# least urgent priority that is handed to a human agent
+ROUTE_MIN_PRIORITY = os.getenv("NOVAROUTE_ROUTE_MIN_PRIORITY", "MEDIUM").upper()
+AGENT_COUNT = int(os.getenv("NOVAROUTE_AGENT_COUNT", "5"))
+AGENT_CAPACITY = int(os.getenv("NOVAROUTE_AGENT_CAPACITY", "3"))
+# simulated agents claim and complete work on their own (mean handle time in seconds; 0 = off)
+SIMULATED_HANDLE_TIME = float(os.getenv("NOVAROUTE_SIMULATE_AGENTS", "0"))
+
+PRIORITIES = ("LOW", "MEDIUM", "HIGH")
+if ROUTE_MIN_PRIORITY not in PRIORITIES:
+    raise ValueError(f"NOVAROUTE_ROUTE_MIN_PRIORITY must be one of {', '.join(PRIORITIES)}, not {ROUTE_MIN_PRIORITY!r}")
+# seconds of head start each priority/tier gets over a LOW conversation from a Low-tier user
+PRIORITY_OFFSETS = {"HIGH": 0.0, "MEDIUM": 120.0, "LOW": 600.0}
+TIER_OFFSETS = {"High": -60.0, "Medium": -20.0, "Low": 0.0}
+# claimed conversations whose wait time is kept for percentiles
+WAIT_SAMPLES = 10_000
+COUNTS = ("enqueued", "claimed", "completed", "rejected")
+CONVERSATION_FIELDS = (
+    "id", "user_id", "message", "priority", "tier", "confidence", "enqueued_at", "claimed_at", "agent_id",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sort_key REAL NOT NULL,
+    user_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    tier TEXT NOT NULL,
+    confidence REAL,
+    enqueued_at REAL NOT NULL,
+    claimed_at REAL,
+    agent_id TEXT
+);
+CREATE INDEX IF NOT EXISTS waiting_by_key ON conversations (sort_key, id) WHERE claimed_at IS NULL;
+CREATE TABLE IF NOT EXISTS agents (
+    agent_id TEXT PRIMARY KEY,
+    capacity INTEGER NOT NULL,
+    active INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS claim_waits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    wait REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counts (
+    name TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+"""
+
+
+class RoutingQueueFull(Exception):
+    """Raised when the routing queue is at its depth limit."""
+
+
+class AgentAtCapacity(Exception):
+    """Raised when an agent tries to claim more conversations than it may hold."""
+
+
+@dataclass
+class Conversation:
+    conversation_id: str
+    user_id: str
+    message: str
+    priority: str
+    tier: str
+    confidence: float
+    enqueued_at: float
+    claimed_at: float | None = None
+    agent_id: str | None = None
+
+    @classmethod
+    def from_row(cls, row) -> "Conversation":
+        return cls(f"c{row[0]:08d}", *row[1:])
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class Agent:
+    agent_id: str
+    capacity: int
+    active: int = 0
+    completed: int = 0
+
+
+def _row_id(conversation_id: str) -> int:
+    if not (conversation_id.startswith("c") and conversation_id[1:].isdigit()):
+        raise KeyError(conversation_id)
+    return int(conversation_id[1:])
+
+
+class RoutingQueue:
+    """
+    Bounded priority queue of conversations plus the pool of agents working
+    it, in one SQLite file; safe to share between threads and worker processes.
+    Every change is one write transaction, so two workers can't claim the
+    same conversation or push an agent past its capacity.
+    """
+
+    def __init__(self, path: str = ROUTING_DB_PATH, max_depth: int = ROUTE_MAX_DEPTH, clock=time.time):
+        self.path = path
+        self.max_depth = max_depth
+        self.clock = clock
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per thread; sqlite3 connections must not cross threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _write(self) -> sqlite3.Connection:
+        """Start a write transaction (use the connection as a context manager to commit it)."""
+        db = self._connect()
+        # take the write lock up front: reads in the transaction decide what is written
+        db.execute("BEGIN IMMEDIATE")
+        return db
+
+    @staticmethod
+    def _count(db: sqlite3.Connection, name: str, delta: int = 1):
+        db.execute(
+            "INSERT INTO counts VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET n = n + excluded.n", (name, delta)
+        )
+
+    @staticmethod
+    def _counts(db: sqlite3.Connection) -> dict[str, int]:
+        return dict(db.execute("SELECT name, n FROM counts").fetchall())
+
+    def __len__(self) -> int:
+        return self._counts(self._connect()).get("waiting", 0)
+
+    @property
+    def agents(self) -> dict[str, Agent]:
+        """The registered agents as they are now."""
+        rows = self._connect().execute("SELECT agent_id, capacity, active, completed FROM agents").fetchall()
+        return {row[0]: Agent(*row) for row in rows}
+
+    def enqueue(self, user_id: str, message: str, priority: str, tier: str = "Low", confidence: float = 0.0) -> Conversation:
+        """Queue a conversation for a human; raises RoutingQueueFull at the depth limit."""
+        now = self.clock()
+        key = now + PRIORITY_OFFSETS.get(priority, PRIORITY_OFFSETS["LOW"]) + TIER_OFFSETS.get(tier, 0.0)
+        with self._write() as db:
+            waiting = self._counts(db).get("waiting", 0)
+            if waiting >= self.max_depth:
+                self._count(db, "rejected")
+            else:
+                row_id = db.execute(
+                    "INSERT INTO conversations (sort_key, user_id, message, priority, tier, confidence, enqueued_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", (key, user_id, message, priority, tier, confidence, now),
+                ).lastrowid
+                self._count(db, "waiting")
+                self._count(db, "enqueued")
+        if waiting >= self.max_depth:
+            raise RoutingQueueFull(f"{waiting} conversations already waiting")
+        return Conversation(f"c{row_id:08d}", user_id, message, priority, tier, confidence, now)
+
+    def add_agent(self, agent_id: str, capacity: int = AGENT_CAPACITY) -> Agent:
+        """Register an agent, or change an existing agent's capacity."""
+        with self._write() as db:
+            db.execute(
+                "INSERT INTO agents (agent_id, capacity) VALUES (?, ?)"
+                " ON CONFLICT (agent_id) DO UPDATE SET capacity = excluded.capacity", (agent_id, capacity),
+            )
+            row = db.execute(
+                "SELECT agent_id, capacity, active, completed FROM agents WHERE agent_id = ?", (agent_id,)
+            ).fetchone()
+        return Agent(*row)
+
+    def claim(self, agent_id: str) -> Conversation | None:
+        """Give agent_id the most urgent waiting conversation, or None if nothing is waiting."""
+        with self._write() as db:
+            agent = db.execute("SELECT capacity, active FROM agents WHERE agent_id = ?", (agent_id,)).fetchone()
+            if agent is None:
+                raise KeyError(agent_id)
+            capacity, active = agent
+            if active >= capacity:
+                raise AgentAtCapacity(f"{agent_id} already holds {active} of {capacity} conversations")
+            row = db.execute(
+                f"SELECT {', '.join(CONVERSATION_FIELDS)} FROM conversations"
+                " WHERE claimed_at IS NULL ORDER BY sort_key, id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conversation = Conversation.from_row(row)
+            conversation.claimed_at = self.clock()
+            conversation.agent_id = agent_id
+            db.execute(
+                "UPDATE conversations SET claimed_at = ?, agent_id = ? WHERE id = ?",
+                (conversation.claimed_at, agent_id, row[0]),
+            )
+            db.execute("UPDATE agents SET active = active + 1 WHERE agent_id = ?", (agent_id,))
+            wait_id = db.execute(
+                "INSERT INTO claim_waits (wait) VALUES (?)", (conversation.claimed_at - conversation.enqueued_at,)
+            ).lastrowid
+            db.execute("DELETE FROM claim_waits WHERE id <= ?", (wait_id - WAIT_SAMPLES,))
+            self._count(db, "waiting", -1)
+            self._count(db, "claimed")
+        return conversation
+
+    def complete(self, conversation_id: str) -> Conversation:
+        """Mark a claimed conversation done and free its agent's slot; KeyError if it is not active."""
+        row_id = _row_id(conversation_id)
+        with self._write() as db:
+            row = db.execute(
+                f"SELECT {', '.join(CONVERSATION_FIELDS)} FROM conversations WHERE id = ? AND claimed_at IS NOT NULL",
+                (row_id,),
+            ).fetchone()
+            if row is None:
+                raise KeyError(conversation_id)
+            conversation = Conversation.from_row(row)
+            db.execute("DELETE FROM conversations WHERE id = ?", (row_id,))
+            db.execute(
+                "UPDATE agents SET active = active - 1, completed = completed + 1 WHERE agent_id = ?",
+                (conversation.agent_id,),
+            )
+            self._count(db, "completed")
+        return conversation
+
+    def stats(self) -> dict:
+        db = self._connect()
+        # one read transaction, so every number comes from the same moment
+        with db:
+            db.execute("BEGIN")
+            now = self.clock()
+            waiting = db.execute(
+                "SELECT priority, COUNT(*), MIN(enqueued_at) FROM conversations WHERE claimed_at IS NULL GROUP BY priority"
+            ).fetchall()
+            waits = sorted(wait for wait, in db.execute("SELECT wait FROM claim_waits"))
+            capacity, active, agent_count = db.execute(
+                "SELECT COALESCE(SUM(capacity), 0), COALESCE(SUM(active), 0), COUNT(*) FROM agents"
+            ).fetchone()
+            counts = self._counts(db)
+        return {
+            "depth": counts.get("waiting", 0),
+            "max_depth": self.max_depth,
+            "depth_by_priority": {priority: n for priority, n, _ in waiting},
+            "oldest_wait_s": {priority: round(now - first, 2) for priority, _, first in waiting},
+            "claimed_wait_s": {
+                name: round(waits[min(int(q * len(waits)), len(waits) - 1)], 2) if waits else None
+                for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+            },
+            "agents": {
+                "count": agent_count,
+                "capacity": capacity,
+                "active": active,
+                "utilization": round(active / capacity, 3) if capacity else None,
+            },
+            **{name: counts.get(name, 0) for name in COUNTS},
+        }
+
+
+def needs_agent(priority: str) -> bool:
+    """True if a conversation of this priority goes to a human rather than staying with the assistant."""
+    return PRIORITIES.index(priority if priority in PRIORITIES else "LOW") >= PRIORITIES.index(ROUTE_MIN_PRIORITY)
+
+
+def route_conversation(user_id: str, message: str, result: dict) -> dict:
+    """
+    Queue an analyzed conversation for the agents if it needs one; the
+    "routing" field of the analyze response. Blocking (it may refresh the
+    risk aggregates), so async callers run it in a thread.
+    """
+    priority = result.get("priority", "LOW")
+    if not needs_agent(priority):
+        return {"status": "self_service"}
+    from backend.risk import get_risk_aggregates  # pandas; kept off the app's import path
+    risk = get_risk_aggregates().get(user_id)
+    queue = get_routing_queue()
+    try:
+        conversation = queue.enqueue(user_id, message, priority, risk.tier if risk else "Low", result.get("confidence", 0.0))
+    except RoutingQueueFull:
+        return {"status": "rejected", "reason": "routing queue full"}
+    return {"status": "queued", "conversation_id": conversation.conversation_id, "queue_depth": len(queue)}
+
+
+async def simulate_agents(mean_handle_time: float, poll_interval: float = 0.2):
+    """
+    Let every registered agent claim work up to capacity and finish each
+    conversation after a random time. Safe to run in several workers at once:
+    the queue enforces capacity, and a lost race only ends an agent's turn.
+    """
+    # the queue is SQLite: every call is a short write, kept off the loop
+    queue = await asyncio.to_thread(get_routing_queue)
+    # the loop only keeps weak references to tasks; these must not be collected mid-sleep
+    handling = set()
+
+    async def handle(conversation: Conversation):
+        await asyncio.sleep(random.expovariate(1 / mean_handle_time))
+        try:
+            await asyncio.to_thread(queue.complete, conversation.conversation_id)
+        except KeyError:
+            pass  # already completed through the API
+
+    while True:
+        agents = await asyncio.to_thread(lambda: queue.agents)
+        for agent in agents.values():
+            for _ in range(agent.capacity - agent.active):
+                try:
+                    conversation = await asyncio.to_thread(queue.claim, agent.agent_id)
+                except (AgentAtCapacity, KeyError):
+                    break  # filled up by a claim through the API (or another worker) meanwhile
+                if conversation is None:
+                    break
+                task = asyncio.create_task(handle(conversation))
+                handling.add(task)
+                task.add_done_callback(handling.discard)
+        await asyncio.sleep(poll_interval)
+
+
+_routing_queue = None
+_routing_queue_lock = threading.Lock()
+
+
+def get_routing_queue() -> RoutingQueue:
+    """Return the process-wide routing queue, opening the database and registering the default agents on first use."""
+    global _routing_queue
+    if _routing_queue is None:
+        with _routing_queue_lock:
+            if _routing_queue is None:
+                queue = RoutingQueue()
+                for i in range(AGENT_COUNT):
+                    queue.add_agent(f"agent_{i + 1:02d}")
+                _routing_queue = queue
+    return _routing_queue
@@ -0,0 +1,185 @@
+# backend/scoring.py
+"""
+Batch fraud scoring for transactions.
+
+FraudScorer turns transaction columns into a numeric feature matrix (fully
+vectorized, no per-row Python) and scores it with an IsolationForest,
+returning fraud_score in [0, 1] and a 0/1 fraud_label. Large inputs are
+split into chunks and scored across a process pool.
+
+score_new_transactions() only scores transactions that have no score yet:
+it remembers how far into each shard's transactions log it has scored, so
+a nightly run costs time proportional to what arrived since the last one.
+
+    python -m backend.scoring train     # fit on all transactions, save the model
+    python -m backend.scoring score     # score everything not yet scored
+"""
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+from backend.columnar import SCORE_SCHEMA, TXN_SCHEMA, read_dataset
+from backend.ingest import LogTail, scores_log, transactions_log
+from backend.shards import all_shards, scatter
+
+MODEL_PATH = "models/fraud_iforest.joblib"
+STATE_PATH = "models/scoring_state.json"
+CONTAMINATION = float(os.getenv("NOVAROUTE_FRAUD_CONTAMINATION", "0.03"))
+# rows per scoring task; inputs no bigger than this are scored in-process
+CHUNK_ROWS = int(os.getenv("NOVAROUTE_SCORING_CHUNK_ROWS", "250000"))
+
+CHANNELS = ["POS", "online", "atm"]
+CATEGORIES = ["groceries", "electronics", "travel", "dining", "atm", "others"]
+FEATURE_INPUTS = [
+    "amount", "timestamp", "channel", "merchant_category", "country", "ip_country",
+    "is_foreign", "is_high_amount", "velocity_24h", "merchant_risk_score",
+]
+
+
+def extract_features(txns: pd.DataFrame) -> np.ndarray:
+    """Vectorized feature matrix (float32, one row per transaction) from the transactions schema."""
+    hour = pd.to_datetime(txns["timestamp"], utc=True).dt.hour.fillna(0).to_numpy(dtype=np.float32)
+    channel = txns["channel"].astype(str).to_numpy()
+    category = txns["merchant_category"].astype(str).to_numpy()
+    columns = [
+        np.log1p(txns["amount"].to_numpy(dtype=np.float32)),
+        txns["is_foreign"].to_numpy(dtype=np.float32),
+        txns["is_high_amount"].to_numpy(dtype=np.float32),
+        txns["velocity_24h"].to_numpy(dtype=np.float32),
+        txns["merchant_risk_score"].to_numpy(dtype=np.float32),
+        (txns["ip_country"].astype(str).to_numpy() != txns["country"].astype(str).to_numpy()).astype(np.float32),
+        np.sin(2 * np.pi * hour / 24),
+        np.cos(2 * np.pi * hour / 24),
+        *[(channel == c).astype(np.float32) for c in CHANNELS],
+        *[(category == c).astype(np.float32) for c in CATEGORIES],
+    ]
+    return np.column_stack(columns)
+
+
+class FraudScorer:
+    """IsolationForest over extract_features(), with scores rescaled to [0, 1] on the training range."""
+
+    def __init__(self, n_estimators: int = 200, contamination: float = CONTAMINATION, random_state: int = 42):
+        self.model = IsolationForest(
+            n_estimators=n_estimators, contamination=contamination, random_state=random_state, n_jobs=-1
+        )
+        self.score_range = (0.0, 1.0)
+
+    def fit(self, txns: pd.DataFrame) -> "FraudScorer":
+        X = extract_features(txns)
+        self.model.fit(X)
+        raw = -self.model.score_samples(X)
+        self.score_range = (float(raw.min()), float(raw.max()))
+        return self
+
+    def score(self, txns: pd.DataFrame) -> pd.DataFrame:
+        """Return fraud_score and fraud_label for each row of txns (same index)."""
+        X = extract_features(txns)
+        raw = -self.model.score_samples(X)
+        lo, hi = self.score_range
+        fraud_score = np.clip((raw - lo) / (hi - lo or 1.0), 0.0, 1.0)
+        # decision_function is score_samples shifted by the contamination threshold
+        fraud_label = (self.model.decision_function(X) < 0).astype(np.int8)
+        return pd.DataFrame({"fraud_score": fraud_score, "fraud_label": fraud_label}, index=txns.index)
+
+    def save(self, path: str = MODEL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path: str = MODEL_PATH) -> "FraudScorer":
+        return joblib.load(path)
+
+
+def train(model_path: str = MODEL_PATH) -> FraudScorer:
+    """Fit a scorer on every stored transaction and save it."""
+    scorer = FraudScorer().fit(transactions_log.read(columns=FEATURE_INPUTS))
+    scorer.save(model_path)
+    return scorer
+
+
+_worker_scorer = None
+
+
+def _init_worker(model_path: str):
+    global _worker_scorer
+    _worker_scorer = FraudScorer.load(model_path)
+
+
+def _score_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    return _worker_scorer.score(chunk)
+
+
+def score_transactions(
+    txns: pd.DataFrame, model_path: str = MODEL_PATH, chunk_rows: int = CHUNK_ROWS, workers: int | None = None
+) -> pd.DataFrame:
+    """Score txns, fanning chunks of chunk_rows out to a process pool; returns rows in the scores schema."""
+    inputs = txns[FEATURE_INPUTS]
+    if len(txns) <= chunk_rows:
+        scored = FraudScorer.load(model_path).score(inputs)
+    else:
+        chunks = [inputs.iloc[i:i + chunk_rows] for i in range(0, len(inputs), chunk_rows)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+            scored = pd.concat(pool.map(_score_chunk, chunks))
+    return pd.concat([txns[["txn_id", "user_id"]], scored], axis=1)
+
+
+def score_new_transactions(model_path: str = MODEL_PATH, state_path: str = STATE_PATH) -> int:
+    """Score every transaction that has no fraud score yet and append the results; returns how many."""
+    if not os.path.exists(model_path):
+        train(model_path)
+
+    shards = all_shards()
+    positions = []
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        # one [lineage, last_seq] per shard; older state files hold a single position
+        positions = state.get("shards") or [[state.get("lineage"), state.get("last_seq", 0)]]
+    if len(positions) != len(shards):
+        positions = []  # resharded since: every shard starts over
+    tails = [LogTail(shard.txn_dir, TXN_SCHEMA) for shard in shards]
+
+    def unscored(index: int) -> pd.DataFrame:
+        tail, new = tails[index], None
+        if positions:
+            tail.seek(*positions[index])
+            new = tail.poll()
+        if new is None:
+            # first run, or the transactions were replaced: consider all of them
+            new = tail.read_all()
+        if len(new):
+            # skip rows that already carry a score (e.g. injected with one); the
+            # user_id filter means only those users' row groups are read
+            users = new["user_id"].astype(str).unique().tolist()
+            scored = read_dataset(
+                shards[index].scores_dir, SCORE_SCHEMA, columns=["txn_id"], filters=[("user_id", "in", users)]
+            )
+            new = new[~new["txn_id"].isin(scored["txn_id"])]
+        return new
+
+    new = pd.concat(scatter(unscored, range(len(shards))), ignore_index=True)
+    if len(new):
+        scores_log.append(score_transactions(new, model_path))
+
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path, "w") as f:
+        json.dump({"shards": [[tail.lineage, tail.last_seq] for tail in tails]}, f)
+    return len(new)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "train":
+        train()
+        print(f"Wrote {MODEL_PATH}")
+    elif command == "score":
+        print(f"Scored {score_new_transactions()} new transaction(s)")
+    else:
+        sys.exit("usage: python -m backend.scoring train|score")
@@ -0,0 +1,133 @@
+# backend/shards.py
+"""
+Hash-by-user partitioning of the transaction and fraud-score datasets.
+
+With one shard (the default) the data stays where backend/columnar.py puts
+it. With N shards, every user's rows live in exactly one of
+
+    data/shards/<N>/<k>/transactions/      base.parquet + ingestion log
+    data/shards/<N>/<k>/fraud_scores/
+    data/shards/<N>/<k>/snapshots/         that shard's memory-mapped store
+
+chosen by crc32(user_id) % N, and data/shards/LAYOUT records N. Each shard
+has its own files, log, lock and snapshot, so shards are read, appended,
+compacted and published independently. Single-user queries go to exactly one
+shard and fleet-wide ones fan out with scatter(). Accounts, one small row
+per user, stay in one file.
+
+    python -m scripts.reshard --shards 8   # move the data to 8 shards (1 to go back)
+"""
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from backend.columnar import SCORES_DIR, TXN_DIR
+
+SHARD_ROOT = "data/shards"
+LAYOUT_PATH = os.path.join(SHARD_ROOT, "LAYOUT")
+# threads for fleet-wide queries; shards do their I/O and Arrow work outside the GIL
+SCATTER_THREADS = int(os.getenv("NOVAROUTE_SCATTER_THREADS", "8"))
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    count: int
+
+    @property
+    def root(self) -> str:
+        # the count is part of the path, so a reshard never writes over the live layout
+        return os.path.join(SHARD_ROOT, str(self.count), f"{self.index:03d}")
+
+    def directory(self, dataset: str) -> str:
+        """Where this shard keeps dataset ("transactions" or "fraud_scores")."""
+        if self.count == 1:
+            return {"transactions": TXN_DIR, "fraud_scores": SCORES_DIR}[dataset]
+        return os.path.join(self.root, dataset)
+
+    @property
+    def txn_dir(self) -> str:
+        return self.directory("transactions")
+
+    @property
+    def scores_dir(self) -> str:
+        return self.directory("fraud_scores")
+
+
+_count = None
+
+
+def shard_count() -> int:
+    """Number of shards in the on-disk layout; 1 if the data was never sharded."""
+    global _count
+    if _count is None:
+        try:
+            with open(LAYOUT_PATH) as f:
+                _count = int(json.load(f)["shards"])
+        except FileNotFoundError:
+            _count = 1
+    return _count
+
+
+def write_layout(count: int):
+    """Record the shard count (after the data has been moved; see scripts/reshard.py)."""
+    global _count
+    os.makedirs(SHARD_ROOT, exist_ok=True)
+    tmp = f"{LAYOUT_PATH}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"shards": count}, f)
+    os.replace(tmp, LAYOUT_PATH)
+    _count = count
+
+
+def all_shards(count: int | None = None) -> list[Shard]:
+    count = count or shard_count()
+    return [Shard(index, count) for index in range(count)]
+
+
+def shard_of(user_id: str, count: int | None = None) -> int:
+    """The shard holding user_id: stable across processes, platforms and restarts."""
+    count = count or shard_count()
+    return zlib.crc32(str(user_id).encode()) % count if count > 1 else 0
+
+
+def shard_indexes(user_ids, count: int | None = None) -> np.ndarray:
+    """shard_of for a whole column; hashes each distinct user once."""
+    count = count or shard_count()
+    if count == 1:
+        return np.zeros(len(user_ids), dtype=np.int32)
+    user_ids = pd.Series(user_ids).astype("category")
+    per_user = np.array([shard_of(u, count) for u in user_ids.cat.categories], dtype=np.int32)
+    return per_user[user_ids.cat.codes.to_numpy()]
+
+
+def split_by_shard(df: pd.DataFrame, count: int | None = None) -> list[pd.DataFrame]:
+    """df's rows for each shard, in shard order (empty frames included), row order kept."""
+    count = count or shard_count()
+    if count == 1:
+        return [df]
+    shard = shard_indexes(df["user_id"], count)
+    return [df[shard == index] for index in range(count)]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def scatter(fn, items) -> list:
+    """fn over items (typically shards) in parallel, results in order. Don't nest calls."""
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(SCATTER_THREADS, thread_name_prefix="scatter")
+    return list(_pool.map(fn, items))
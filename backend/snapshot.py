@@ -0,0 +1,113 @@
+# backend/snapshot.py
+"""
+Versioned, memory-mapped snapshots shared by every worker process.
+
+A snapshot is a directory of uncompressed Arrow IPC files plus a JSON
+manifest. Readers memory-map the files, so N uvicorn workers share one copy
+of the data in the page cache instead of each holding its own, and
+attaching costs milliseconds instead of a full parse.
+
+    data/snapshots/v000007/<name>.arrow, manifest.json
+    data/snapshots/CURRENT                 name of the published version
+
+Publishing writes a new version directory and then atomically replaces
+CURRENT. Readers that still hold the previous version keep their mappings,
+and the files stay valid until the last reader drops them.
+"""
+import json
+import os
+import shutil
+import uuid
+
+import pyarrow as pa
+
+from backend.ingest import exclusive_lock
+
+SNAPSHOT_DIR = os.getenv("NOVAROUTE_SNAPSHOT_DIR", "data/snapshots")
+CURRENT_NAME = "CURRENT"
+MANIFEST_NAME = "manifest.json"
+# versions kept on disk besides the current one, for readers still attached to them
+KEEP_PREVIOUS = 1
+
+
+def current_version(directory: str = SNAPSHOT_DIR) -> str | None:
+    try:
+        with open(os.path.join(directory, CURRENT_NAME)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(version: str, directory: str = SNAPSHOT_DIR) -> dict:
+    with open(os.path.join(directory, version, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def _versions(directory: str) -> list[str]:
+    try:
+        return sorted(n for n in os.listdir(directory) if n.startswith("v") and n[1:].isdigit())
+    except FileNotFoundError:
+        return []
+
+
+def publish(tables: dict[str, pa.Table], manifest: dict, directory: str = SNAPSHOT_DIR) -> str:
+    """Write tables as a new snapshot version and make it current; returns the version name."""
+    with exclusive_lock(directory):
+        return _publish_locked(tables, manifest, directory)
+
+
+def publish_if_stale(build, is_fresh, directory: str = SNAPSHOT_DIR) -> str:
+    """
+    Return the current version if is_fresh(manifest) accepts it; otherwise
+    build() -> (tables, manifest) and publish that. Only one process builds:
+    the others wait on the lock and then find the fresh version.
+    """
+    version = current_version(directory)
+    if version is not None and is_fresh(read_manifest(version, directory)):
+        return version
+    with exclusive_lock(directory):
+        version = current_version(directory)
+        if version is not None and is_fresh(read_manifest(version, directory)):
+            return version
+        tables, manifest = build()
+        return _publish_locked(tables, manifest, directory)
+
+
+def _publish_locked(tables: dict[str, pa.Table], manifest: dict, directory: str) -> str:
+    # each table is one record batch, so readers get contiguous, zero-copy columns
+    existing = _versions(directory)
+    version = f"v{int(existing[-1][1:]) + 1 if existing else 1:06d}"
+    tmp = os.path.join(directory, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp)
+    try:
+        for name, table in tables.items():
+            table = table.combine_chunks()
+            with pa.OSFile(os.path.join(tmp, f"{name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table, max_chunksize=max(len(table), 1))
+        with open(os.path.join(tmp, MANIFEST_NAME), "w") as f:
+            json.dump({**manifest, "version": version, "tables": sorted(tables)}, f)
+        os.rename(tmp, os.path.join(directory, version))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(directory, f".{CURRENT_NAME}-{uuid.uuid4().hex}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(directory, CURRENT_NAME))
+
+    for old in _versions(directory)[:-(KEEP_PREVIOUS + 1)]:
+        # mapped files survive unlinking on POSIX; elsewhere a reader may still hold them
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+
+def open_tables(version: str, directory: str = SNAPSHOT_DIR) -> tuple[dict[str, pa.Table], dict]:
+    """Memory-map every table of a snapshot version; returns (tables, manifest)."""
+    manifest = read_manifest(version, directory)
+    tables = {}
+    for name in manifest["tables"]:
+        source = pa.memory_map(os.path.join(directory, version, f"{name}.arrow"), "r")
+        tables[name] = pa.ipc.open_file(source).read_all()
+    return tables, manifest
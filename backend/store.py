@@ -0,0 +1,465 @@
+# backend/store.py
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from backend.columnar import SCORE_SCHEMA, SCORES_DIR, TXN_DIR, TXN_SCHEMA, base_info, read_dataset
+from backend.ingest import LogTail
+from backend.metrics import span
+from backend.shards import Shard, all_shards, scatter, shard_of
+from backend.snapshot import SNAPSHOT_DIR, current_version, open_tables, publish, publish_if_stale, read_manifest
+
+SCORE_COLS = ["fraud_score", "fraud_label"]
+# how often a worker picks up appended batches and newly published snapshots
+SNAPSHOT_POLL_SECONDS = float(os.getenv("NOVAROUTE_SNAPSHOT_POLL", "0.5"))
+# rows of re-merged users held in memory before a new base snapshot is published
+OVERLAY_MAX_ROWS = int(os.getenv("NOVAROUTE_OVERLAY_MAX_ROWS", "50000"))
+# per-row -timestamp (ns) kept next to the rows for since()
+NEG_TS = "_neg_ts"
+USERS_SCHEMA = pa.schema([
+    ("user_id", pa.string()),
+    ("start", pa.int64()),
+    ("end", pa.int64()),
+    ("flagged_start", pa.int64()),
+    ("flagged_end", pa.int64()),
+])
+
+
+def block_bounds(user_ids: np.ndarray) -> dict:
+    """Map each user_id to the (start, end) slice of its contiguous block."""
+    if len(user_ids) == 0:
+        return {}
+    starts = np.flatnonzero(user_ids[1:] != user_ids[:-1]) + 1
+    starts = np.concatenate(([0], starts))
+    ends = np.concatenate((starts[1:], [len(user_ids)]))
+    return {user_ids[s]: (int(s), int(e)) for s, e in zip(starts, ends)}
+
+
+def recency_key(df: pd.DataFrame) -> np.ndarray:
+    """Timestamps as int64 nanoseconds, missing ones as the smallest value (so -key cannot overflow)."""
+    ts = pd.to_datetime(df["timestamp"], utc=True).to_numpy(dtype="datetime64[ns]")
+    return np.where(np.isnat(ts), np.iinfo(np.int64).min + 1, ts.view(np.int64))
+
+
+def sort_by_user_recency(df: pd.DataFrame) -> pd.DataFrame:
+    """Sort rows by user_id, newest first within a user, missing timestamps last, ties by txn_id."""
+    order = np.lexsort((df["txn_id"].to_numpy(dtype=str), -recency_key(df), df["user_id"].to_numpy(dtype=str)))
+    return df.iloc[order].reset_index(drop=True)
+
+
+class TransactionStore:
+    """
+    An immutable view of transactions pre-joined with fraud scores.
+
+    The base is a set of Arrow tables sorted by (user_id, timestamp desc):
+    every user's rows form one contiguous block, so "top-N recent" and
+    "flagged for user" are a dict lookup plus a slice, and only the slice is
+    converted to pandas. Rows appended since the base was built live in a
+    per-user overlay that shadows those users' blocks.
+
+    Built in memory with build()/load(), or attached zero-copy to a published
+    snapshot with open(), which is how the API workers share one copy.
+    with_appended() returns a new store and never changes this one, so a
+    caller holding a store always sees one consistent version of both files.
+    """
+
+    txn_columns = TXN_SCHEMA.names
+
+    def __init__(self, tables: dict[str, pa.Table], version: str | None = None, overlay=None, user_versions=None):
+        self.version = version
+        self._tables = tables
+        self._rows = tables["rows"].drop_columns([NEG_TS])
+        self._flagged = tables["flagged"]
+        neg_ts = tables["rows"].column(NEG_TS)
+        self._neg_ts = neg_ts.chunk(0).to_numpy() if neg_ts.num_chunks == 1 else neg_ts.to_numpy()
+        users = tables["users"]
+        self._bounds, self._flagged_bounds = {}, {}
+        for user_id, start, end, f_start, f_end in zip(*(users.column(c).to_pylist() for c in users.column_names)):
+            self._bounds[user_id] = (start, end)
+            self._flagged_bounds[user_id] = (f_start, f_end)
+        # user_id -> (rows, -timestamps, flagged) for users with appended rows
+        self._overlay: dict[str, tuple[pd.DataFrame, np.ndarray, pd.DataFrame]] = overlay or {}
+        self._user_versions: dict[str, int] = user_versions or {}
+        self.overlay_rows = sum(len(rows) for rows, _, _ in self._overlay.values())
+
+    @classmethod
+    def build(cls, txns: pd.DataFrame, scores: pd.DataFrame) -> "TransactionStore":
+        """Join, sort and index the datasets in memory."""
+        scores = scores.drop_duplicates("txn_id", keep="last")
+        joined = txns.merge(scores[["txn_id", *SCORE_COLS]], on="txn_id", how="left")
+        joined["fraud_score"] = joined["fraud_score"].fillna(0.0)
+        joined["fraud_label"] = joined["fraud_label"].fillna(0).astype(int)
+        rows = sort_by_user_recency(joined)
+
+        # score rows without a transaction (e.g. injected scores only) still
+        # count as flagged activity, listed after the user's real transactions
+        flagged_scores = scores[scores["fraud_label"] == 1]
+        orphans = flagged_scores
+        if not flagged_scores.empty:
+            # Arrow's hash lookup; Series.isin converts the whole value set to Python objects
+            known = pc.is_in(pa.array(flagged_scores["txn_id"], pa.string()), value_set=pa.array(txns["txn_id"], pa.string()))
+            orphans = flagged_scores[~known.to_numpy(zero_copy_only=False)]
+        flagged = rows[rows["fraud_label"] == 1]
+        if not orphans.empty:
+            flagged = pd.concat([flagged, orphans], ignore_index=True)
+        flagged = sort_by_user_recency(flagged)
+
+        # per-user block bounds in both tables, so attaching never scans the rows
+        bounds = block_bounds(rows["user_id"].to_numpy(dtype=str))
+        flagged_bounds = block_bounds(flagged["user_id"].to_numpy(dtype=str))
+        user_ids = sorted(bounds.keys() | flagged_bounds.keys())
+        users = pa.table({
+            "user_id": pa.array(user_ids, pa.string()),
+            "start": [bounds.get(u, (0, 0))[0] for u in user_ids],
+            "end": [bounds.get(u, (0, 0))[1] for u in user_ids],
+            "flagged_start": [flagged_bounds.get(u, (0, 0))[0] for u in user_ids],
+            "flagged_end": [flagged_bounds.get(u, (0, 0))[1] for u in user_ids],
+        }, schema=USERS_SCHEMA)
+
+        rows_table = _to_arrow(rows).append_column(NEG_TS, pa.array(-recency_key(rows), pa.int64()))
+        return cls({"rows": rows_table, "flagged": _to_arrow(flagged), "users": users})
+
+    @classmethod
+    def load(cls, txn_dir: str = TXN_DIR, scores_dir: str = SCORES_DIR) -> "TransactionStore":
+        """Read both columnar datasets once and build the store."""
+        txns = read_dataset(txn_dir, TXN_SCHEMA)
+        scores = read_dataset(scores_dir, SCORE_SCHEMA)
+        return cls.build(txns, scores)
+
+    @classmethod
+    def open(cls, version: str, directory: str = SNAPSHOT_DIR) -> "TransactionStore":
+        """Attach to a published snapshot; the columns stay memory-mapped, shared with other processes."""
+        tables, _ = open_tables(version, directory)
+        return cls(tables, version)
+
+    def tables(self) -> dict[str, pa.Table]:
+        """The base tables open() expects, for publishing."""
+        return dict(self._tables)
+
+    def __len__(self) -> int:
+        replaced = sum(end - start for start, end in (self._bounds.get(u, (0, 0)) for u in self._overlay))
+        return self._rows.num_rows + self.overlay_rows - replaced
+
+    def version_of(self, user_id: str) -> tuple:
+        """Stamp that changes whenever the user's transactions or scores change."""
+        return (self.version, self._user_versions.get(user_id, 0))
+
+    def transactions(self, user_id: str) -> pd.DataFrame:
+        """All of user_id's transactions with fraud scores, newest first (ties by txn_id)."""
+        return self._user_frames(user_id)[0]
+
+    def recent(self, user_id: str, n: int = 5) -> pd.DataFrame:
+        """Return the n most recent transactions for user_id with fraud scores, newest first."""
+        entry = self._overlay.get(user_id)
+        if entry is not None:
+            return entry[0].iloc[:n].reset_index(drop=True)
+        start, end = self._bounds.get(user_id, (0, 0))
+        return _frame(self._rows, start, max(min(n, end - start), 0))
+
+    def since(self, user_id: str, cutoff: pd.Timestamp) -> pd.DataFrame:
+        """Return user_id's transactions at or after cutoff, newest first."""
+        entry = self._overlay.get(user_id)
+        if entry is not None:
+            rows, neg_ts, _ = entry
+            return rows.iloc[:np.searchsorted(neg_ts, -pd.Timestamp(cutoff).value, side="right")].reset_index(drop=True)
+        start, end = self._bounds.get(user_id, (0, 0))
+        # the block is newest first, i.e. ascending in -timestamp
+        n = np.searchsorted(self._neg_ts[start:end], -pd.Timestamp(cutoff).value, side="right")
+        return _frame(self._rows, start, int(n))
+
+    def flagged(self, user_id: str) -> pd.DataFrame:
+        """Return all rows with fraud_label == 1 for user_id, newest first."""
+        entry = self._overlay.get(user_id)
+        if entry is not None:
+            return entry[2]
+        start, end = self._flagged_bounds.get(user_id, (0, 0))
+        return _frame(self._flagged, start, end - start)
+
+    def page(self, user_id: str, after: tuple[int, str] | None = None, limit: int = 50, where=None) -> pd.DataFrame:
+        """
+        Up to limit of user_id's transactions, newest first, starting right
+        after the (recency_key, txn_id) position `after` and matching the
+        Arrow filter expression `where`. Only the returned rows become pandas.
+        """
+        entry = self._overlay.get(user_id)
+        if entry is not None:
+            rows, neg_ts, _ = entry
+            start = _start_after(neg_ts, lambda lo, hi: rows["txn_id"].to_numpy(dtype=str)[lo:hi], after)
+            table = pa.Table.from_pandas(rows.iloc[start:], preserve_index=False)
+        else:
+            begin, end = self._bounds.get(user_id, (0, 0))
+            txn_ids = self._rows.column("txn_id")
+            start = begin + _start_after(
+                self._neg_ts[begin:end],
+                lambda lo, hi: txn_ids.slice(begin + lo, hi - lo).to_numpy(zero_copy_only=False).astype(str),
+                after,
+            )
+            table = self._rows.slice(start, end - start)
+        if where is not None:
+            table = table.filter(where)
+        return table.slice(0, limit).to_pandas(use_threads=False)
+
+    def with_appended(self, txns: pd.DataFrame, scores: pd.DataFrame) -> "TransactionStore":
+        """A new store with appended rows folded in; only the users they touch are re-merged."""
+        overlay = dict(self._overlay)
+        user_versions = dict(self._user_versions)
+        new_txns = dict(tuple(txns.groupby(txns["user_id"].astype(str), sort=False))) if len(txns) else {}
+        new_scores = dict(tuple(scores.groupby(scores["user_id"].astype(str), sort=False))) if len(scores) else {}
+        for user_id in new_txns.keys() | new_scores.keys():
+            rows, _, flagged = self._user_frames(user_id)
+            overlay[user_id] = _merge_user(rows, flagged, new_txns.get(user_id), new_scores.get(user_id))
+            user_versions[user_id] = user_versions.get(user_id, 0) + 1
+        return TransactionStore(self._tables, self.version, overlay, user_versions)
+
+    def _user_frames(self, user_id: str) -> tuple[pd.DataFrame, np.ndarray, pd.DataFrame]:
+        entry = self._overlay.get(user_id)
+        if entry is not None:
+            return entry
+        start, end = self._bounds.get(user_id, (0, 0))
+        f_start, f_end = self._flagged_bounds.get(user_id, (0, 0))
+        return _frame(self._rows, start, end - start), self._neg_ts[start:end], _frame(self._flagged, f_start, f_end - f_start)
+
+
+def _merge_user(rows: pd.DataFrame, flagged: pd.DataFrame, new_txns, new_scores) -> tuple:
+    """One user's (rows, -timestamps, flagged) after appending txns and scores, as build() would join them."""
+    # flagged score rows still waiting for their transaction
+    orphans = flagged[~flagged["txn_id"].isin(rows["txn_id"])]
+    if new_txns is not None:
+        rows = pd.concat([rows, new_txns.assign(fraud_score=0.0, fraud_label=0)], ignore_index=True)
+
+    # later scores win, as in build()
+    scores = [orphans[["txn_id", "user_id", *SCORE_COLS]]] + ([new_scores] if new_scores is not None else [])
+    scores = pd.concat(scores, ignore_index=True).drop_duplicates("txn_id", keep="last")
+    matched = scores["txn_id"].isin(rows["txn_id"])
+    if matched.any():
+        by_txn = scores[matched].set_index("txn_id")
+        rows = rows.assign(**{col: rows["txn_id"].map(by_txn[col]).fillna(rows[col]) for col in SCORE_COLS})
+        rows["fraud_label"] = rows["fraud_label"].astype(int)
+
+    orphans = scores[~matched & (scores["fraud_label"] == 1)]
+    flagged = pd.concat([rows[rows["fraud_label"] == 1], orphans], ignore_index=True)
+    rows = sort_by_user_recency(rows)
+    return rows, -recency_key(rows), sort_by_user_recency(flagged)
+
+
+def _start_after(neg_ts: np.ndarray, txn_ids, after: tuple[int, str] | None) -> int:
+    """
+    Offset of the first row after `after` in a block ordered by (-recency_key, txn_id);
+    txn_ids(lo, hi) returns the block's txn_ids in [lo, hi), only read for the tied rows.
+    """
+    if after is None:
+        return 0
+    key, txn_id = after
+    # skip the rows with a newer timestamp, then the ones with the same timestamp
+    # and a txn_id at or before the cursor's
+    lo = int(np.searchsorted(neg_ts, -key, side="left"))
+    hi = int(np.searchsorted(neg_ts, -key, side="right"))
+    return lo + int(np.searchsorted(txn_ids(lo, hi), txn_id, side="right"))
+
+
+def _frame(table: pa.Table, start: int, length: int) -> pd.DataFrame:
+    # slices are a user's rows at most; a thread pool costs more than it saves
+    return table.slice(start, length).to_pandas(use_threads=False)
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Arrow table for a snapshot. Strings are stored plain (64-bit offsets): a
+    dictionary column would convert its whole dictionary on every slice.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = [
+        pa.field(f.name, pa.large_string())
+        if pa.types.is_dictionary(f.type) or pa.types.is_string(f.type) else f
+        for f in table.schema
+    ]
+    return table.cast(pa.schema(fields))
+
+
+def _build_snapshot(shard: Shard) -> tuple[dict[str, pa.Table], dict]:
+    """Read both of a shard's datasets and build a base, recording exactly which log position each was read up to."""
+    tails = _tails(shard)
+    with span("snapshot_read"):
+        txns, scores = (tail.read_all() for tail in tails.values())
+    source = {name: [tail.lineage, tail.last_seq] for name, tail in tails.items()}
+    with span("snapshot_join"):
+        tables = TransactionStore.build(txns, scores).tables()
+    return tables, {"source": source}
+
+
+def _tails(shard: Shard) -> dict[str, LogTail]:
+    return {"transactions": LogTail(shard.txn_dir, TXN_SCHEMA), "fraud_scores": LogTail(shard.scores_dir, SCORE_SCHEMA)}
+
+
+def _can_resume(manifest: dict, shard: Shard) -> bool:
+    """True if the shard's logs still hold every batch appended after this snapshot was built."""
+    for name in ("transactions", "fraud_scores"):
+        lineage, last_seq = manifest.get("source", {}).get(name, (None, -1))
+        current_lineage, compacted_through = base_info(shard.directory(name))
+        if lineage != current_lineage or last_seq < compacted_through:
+            return False
+    return True
+
+
+def snapshot_dir(shard: Shard) -> str:
+    return SNAPSHOT_DIR if shard.count == 1 else os.path.join(shard.root, "snapshots")
+
+
+class StoreManager:
+    """
+    Keeps this process's store of one shard current without full reloads.
+
+    It attaches to the published base snapshot, then tails both ingestion
+    logs. Every refresh folds the newly appended batches into a new store and
+    swaps it in atomically. Once the overlay grows past OVERLAY_MAX_ROWS, or
+    the logs were compacted past what it has seen, one process publishes a
+    new base and every process re-attaches to it.
+    """
+
+    def __init__(self, shard: Shard, overlay_max_rows: int = OVERLAY_MAX_ROWS):
+        self.shard = shard
+        self.directory = snapshot_dir(shard)
+        self.overlay_max_rows = overlay_max_rows
+        self.store: TransactionStore | None = None
+        self._tails = _tails(shard)
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def get(self) -> TransactionStore:
+        """The current store, refreshed at most every SNAPSHOT_POLL_SECONDS."""
+        if self.store is not None and time.monotonic() - self._checked_at < SNAPSHOT_POLL_SECONDS:
+            return self.store
+        # one caller refreshes; the others keep using the current store meanwhile
+        if self._lock.acquire(blocking=self.store is None):
+            try:
+                if self.store is None or time.monotonic() - self._checked_at >= SNAPSHOT_POLL_SECONDS:
+                    with span("store_refresh"):
+                        self._refresh()
+                    self._checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+        return self.store
+
+    def _build(self):
+        return _build_snapshot(self.shard)
+
+    def _resumable(self, manifest: dict) -> bool:
+        return _can_resume(manifest, self.shard)
+
+    def _refresh(self):
+        if self.store is None:
+            self._attach(publish_if_stale(self._build, self._resumable, self.directory))
+        else:
+            published = current_version(self.directory)
+            if published is not None and published > self.store.version:
+                self._attach(published)
+
+        new = [tail.poll() for tail in self._tails.values()]
+        if any(rows is None for rows in new):
+            # the data was replaced, or compacted past batches we never read
+            self._attach(publish_if_stale(self._build, self._resumable, self.directory))
+            new = [tail.poll() for tail in self._tails.values()]
+        txns, scores = new
+        if len(txns) or len(scores):
+            self.store = self.store.with_appended(txns, scores)
+
+        if self.store.overlay_rows > self.overlay_max_rows:
+            mine = self.store.version
+            self._attach(publish_if_stale(
+                self._build, lambda manifest: manifest["version"] > mine and self._resumable(manifest), self.directory
+            ))
+            self._refresh()
+
+    def _attach(self, version: str):
+        if self.store is not None and self.store.version == version:
+            return
+        self.store = TransactionStore.open(version, self.directory)
+        manifest = read_manifest(version, self.directory)
+        for name, tail in self._tails.items():
+            tail.seek(*manifest["source"][name])
+
+
+class ShardedStore:
+    """
+    The TransactionStore interface over every shard: each query goes to the
+    shard that holds its user. A shard's store is taken on first use and
+    then kept, so one ShardedStore reads one consistent version of every
+    shard it touches, and shards it never touches are never loaded.
+    """
+
+    txn_columns = TransactionStore.txn_columns
+
+    def __init__(self, managers: list[StoreManager]):
+        self._managers = managers
+        self._stores: dict[int, TransactionStore] = {}
+
+    def shard(self, index: int) -> TransactionStore:
+        store = self._stores.get(index)
+        if store is None:
+            store = self._stores[index] = self._managers[index].get()
+        return store
+
+    def for_user(self, user_id: str) -> TransactionStore:
+        return self.shard(shard_of(user_id, len(self._managers)))
+
+    def __len__(self) -> int:
+        return sum(scatter(lambda index: len(self.shard(index)), range(len(self._managers))))
+
+    def version_of(self, user_id: str) -> tuple:
+        return self.for_user(user_id).version_of(user_id)
+
+    def transactions(self, user_id: str) -> pd.DataFrame:
+        return self.for_user(user_id).transactions(user_id)
+
+    def recent(self, user_id: str, n: int = 5) -> pd.DataFrame:
+        return self.for_user(user_id).recent(user_id, n)
+
+    def since(self, user_id: str, cutoff: pd.Timestamp) -> pd.DataFrame:
+        return self.for_user(user_id).since(user_id, cutoff)
+
+    def flagged(self, user_id: str) -> pd.DataFrame:
+        return self.for_user(user_id).flagged(user_id)
+
+    def page(self, user_id: str, after: tuple[int, str] | None = None, limit: int = 50, where=None) -> pd.DataFrame:
+        return self.for_user(user_id).page(user_id, after, limit, where)
+
+
+_managers = None
+_managers_lock = threading.Lock()
+
+
+def _get_managers() -> list[StoreManager]:
+    global _managers
+    if _managers is None:
+        with _managers_lock:
+            if _managers is None:
+                _managers = [StoreManager(shard) for shard in all_shards()]
+    return _managers
+
+
+def get_store() -> ShardedStore:
+    """
+    Return a view of the process-wide store: each shard's current snapshot
+    plus every batch appended since, at most SNAPSHOT_POLL_SECONDS old. Hold
+    on to the returned store for the whole request to read one consistent
+    version.
+    """
+    return ShardedStore(_get_managers())
+
+
+def load_shards():
+    """Attach (or build) every shard's store, in parallel."""
+    scatter(StoreManager.get, _get_managers())
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["publish"]:
+        sys.exit("usage: python -m backend.store publish")
+    for shard in all_shards():
+        print(f"shard {shard.index}: published snapshot {publish(*_build_snapshot(shard), snapshot_dir(shard))}")
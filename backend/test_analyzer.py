@@ -0,0 +1,164 @@
+# backend/test_analyzer.py
+import asyncio
+
+import pytest
+
+from backend import analyzer
+from backend.analyzer import InvalidReply, StreamingReplyParser, parse_response
+from backend.cache import ResponseCache
+
+REPLY = '{"priority": "MEDIUM", "confidence": 0.8, "response": "Looking into it.", "info": "Low risk."}'
+VALID = '{"priority": "high", "confidence": 1.5, "response": "We are on it.", "info": "High risk."}'
+
+
+def test_parse_response_validates_and_normalizes():
+    assert parse_response(VALID) == {
+        "priority": "HIGH", "response": "We are on it.", "info": "High risk.", "confidence": 1.0, "answered_by": "llm",
+    }
+
+
+def test_parse_response_finds_the_object_inside_prose():
+    assert parse_response(f"Sure! ```json\n{VALID}\n``` Hope that helps {{")["priority"] == "HIGH"
+
+
+@pytest.mark.parametrize("text, error", [
+    ("", "no JSON object"),
+    ('{"priority": "HIGH", "confidence": 0.9, "response": "cut off', "no JSON object"),
+    ("[1, 2]", "not a JSON object"),
+    ('{"priority": "HIGH", "confidence": 0.9}', "missing response, info"),
+    ('{"priority": "URGENT", "confidence": 0.9, "response": "", "info": ""}', "unknown priority"),
+    ('{"priority": 3, "confidence": 0.9, "response": "", "info": ""}', "unknown priority"),
+    ('{"priority": "LOW", "confidence": "high", "response": "", "info": ""}', "not a number"),
+    ('{"priority": "LOW", "confidence": true, "response": "", "info": ""}', "not a number"),
+    ('{"priority": "LOW", "confidence": 0.5, "response": null, "info": ""}', "must be strings"),
+])
+def test_parse_response_rejects_instead_of_guessing(text, error):
+    with pytest.raises(InvalidReply, match=error):
+        parse_response(text)
+
+
+def test_streaming_parser_emits_priority_then_text_deltas():
+    parser = StreamingReplyParser()
+    chunks = ['{"priority": "HIGH", "conf', 'idence": 0.9, "response": "We\\u00e9', ' are on it", "info": "x\\"y"}']
+    events = [event for chunk in chunks for event in parser.feed(chunk)]
+    assert events == [
+        ("priority", {"priority": "HIGH", "confidence": 0.9}),
+        ("response", {"delta": "Weé"}),
+        ("response", {"delta": " are on it"}),
+        ("info", {"delta": 'x"y'}),
+    ]
+    assert parse_response(parser.text)["response"] == "Weé are on it"
+
+
+def test_streaming_parser_routes_when_the_text_comes_before_the_confidence():
+    parser = StreamingReplyParser()
+    assert parser.feed('{"priority": "low", "response": "Hi"')[0] == ("priority", {"priority": "LOW", "confidence": None})
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    """analyze_message_stream with no local answers, a fresh cache and a scripted model: stream(message)."""
+    monkeypatch.setattr(analyzer, "response_cache", ResponseCache())
+    monkeypatch.setattr(analyzer, "local_triage", lambda message, user_id: None)
+    monkeypatch.setattr(analyzer, "intent_match", lambda message, user_id: None)
+    monkeypatch.setattr(analyzer, "cache_key", lambda message, user_id: (user_id, message))
+    monkeypatch.setattr(analyzer, "build_prompt", lambda message, user_id: message)
+    monkeypatch.setattr(analyzer, "remember_intent", lambda message, user_id, result: result)
+    calls = []
+
+    async def model_stream(prompt, parse=None):
+        calls.append(prompt)
+        for i in range(0, len(REPLY), 16):
+            await asyncio.sleep(0.005)
+            yield REPLY[i:i + 16]
+
+    monkeypatch.setattr(analyzer.llm_queue, "stream", model_stream)
+
+    async def run(message):
+        return [event async for event in analyzer.analyze_message_stream(message, "user_001")]
+    run.calls = calls
+    return run
+
+
+def test_concurrent_identical_streams_share_one_model_call(stream):
+    async def main():
+        return await asyncio.gather(stream("why the fee"), stream("why the fee"))
+
+    first, second = asyncio.run(main())
+    assert len(stream.calls) == 1
+    assert first[-1] == second[-1]
+    assert first[-1][1]["answered_by"] == "llm"
+    # the follower gets the whole reply as the same sequence of events
+    assert [event for event, _ in second] == ["priority", "response", "info", "done"]
+    assert analyzer.response_cache.get(("user_001", "why the fee"))["priority"] == "MEDIUM"
+
+
+def test_intent_hits_on_the_stream_are_cached(stream, monkeypatch):
+    hit = {"priority": "LOW", "response": "r", "info": "i", "confidence": 0.8, "answered_by": "intent_cache"}
+    monkeypatch.setattr(analyzer, "intent_match", lambda message, user_id: hit)
+    events = asyncio.run(stream("reset my pin"))
+    assert events[-1][1]["answered_by"] == "intent_cache"
+    assert stream.calls == []
+    assert analyzer.response_cache.get(("user_001", "reset my pin")) == hit
+
+
+def test_a_closed_stream_hands_the_key_over(stream):
+    async def main():
+        abandoned = analyzer.analyze_message_stream("why the fee", "user_001")
+        await abandoned.__anext__()
+        await abandoned.aclose()
+        return await stream("why the fee")
+
+    events = asyncio.run(main())
+    assert events[-1][1]["answered_by"] == "llm"
+    assert len(stream.calls) == 2
+    assert analyzer.response_cache._inflight == {}
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """analyze_batch with a fresh cache, counted context builds and a model that tracks its concurrency."""
+    monkeypatch.setattr(analyzer, "response_cache", ResponseCache())
+    monkeypatch.setattr(analyzer, "local_triage", lambda message, user_id: None)
+    monkeypatch.setattr(analyzer, "intent_match", lambda message, user_id: None)
+    monkeypatch.setattr(analyzer, "cache_key", lambda message, user_id: (user_id, message))
+    monkeypatch.setattr(analyzer, "remember_intent", lambda message, user_id, result: result)
+    monkeypatch.setattr(analyzer, "build_prompt", lambda message, user_id, context: message)
+    builds = []
+    monkeypatch.setattr(analyzer, "build_user_context", lambda user_id: builds.append(user_id) or {})
+    state = {"running": 0, "peak": 0}
+
+    async def generate(prompt, parse):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.01)
+        state["running"] -= 1
+        return {**parse(REPLY), "answered_by": "llm"}
+
+    monkeypatch.setattr(analyzer.llm_queue, "generate", generate)
+
+    async def run(items, concurrency=8):
+        return [pair async for pair in analyzer.analyze_batch(items, concurrency)]
+    run.builds, run.state = builds, state
+    return run
+
+
+def test_batch_builds_each_users_context_once(batch):
+    items = [("user_001", f"message {i}") for i in range(5)] + [("user_002", "hello")]
+    results = asyncio.run(batch(items))
+    assert sorted(index for index, _ in results) == list(range(6))
+    assert all(result["priority"] == "MEDIUM" for _, result in results)
+    assert sorted(batch.builds) == ["user_001", "user_002"]
+
+
+def test_batch_caps_model_calls_in_flight(batch):
+    asyncio.run(batch([("user_001", f"message {i}") for i in range(10)], concurrency=3))
+    assert batch.state["peak"] == 3
+
+
+def test_batch_answers_locally_without_a_context(batch, monkeypatch):
+    local = {"priority": "HIGH", "confidence": 0.95, "response": "r", "info": "i", "answered_by": "triage"}
+    monkeypatch.setattr(analyzer, "local_triage", lambda message, user_id: local if "stolen" in message else None)
+    results = dict(asyncio.run(batch([("user_001", "my card was stolen"), ("user_002", "hello")])))
+    assert results[0]["answered_by"] == "triage"
+    assert batch.builds == ["user_002"]
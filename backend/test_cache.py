@@ -0,0 +1,138 @@
+# backend/test_cache.py
+import asyncio
+
+import pytest
+
+from backend import cache
+from backend.cache import ResponseCache, normalize_message
+
+
+def test_normalize_message_folds_trivial_differences():
+    assert normalize_message("  Why was I   CHARGED twice?! ") == normalize_message("why was i charged twice")
+
+
+def test_entries_expire_and_evict_oldest(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    responses = ResponseCache(max_entries=2, ttl=10)
+    responses.put("a", {"v": 1})
+    responses.put("b", {"v": 2})
+    assert responses.get("a") == {"v": 1}  # a is now the most recently used
+    responses.put("c", {"v": 3})
+    assert responses.get("b") is None
+    assert responses.evictions == 1
+    now[0] += 11
+    assert responses.get("a") is None
+
+
+def test_get_returns_a_copy():
+    responses = ResponseCache()
+    responses.put("k", {"v": 1})
+    responses.get("k")["v"] = 2
+    assert responses.get("k") == {"v": 1}
+
+
+def test_concurrent_misses_share_one_computation():
+    responses = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"v": len(calls)}
+
+    async def main():
+        return await asyncio.gather(*(responses.get_or_compute("k", compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"v": 1}] * 5
+    assert len(calls) == 1
+    assert responses.coalesced == 4
+    assert responses.get("k") == {"v": 1}
+
+
+def test_uncacheable_results_are_shared_but_not_stored():
+    responses = ResponseCache()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return {"answered_by": "fallback"}
+
+    async def main():
+        return await asyncio.gather(*(responses.get_or_compute("k", compute, lambda v: False) for _ in range(2)))
+
+    assert asyncio.run(main()) == [{"answered_by": "fallback"}] * 2
+    assert responses.get("k") is None
+
+
+def test_a_failed_computation_fails_its_followers():
+    responses = ResponseCache()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model down")
+
+    async def main():
+        return await asyncio.gather(*(responses.get_or_compute("k", compute) for _ in range(3)), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(main())] == [RuntimeError] * 3
+    assert responses._inflight == {}
+
+
+def test_a_follower_takes_over_from_a_cancelled_leader():
+    responses = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"v": len(calls)}
+
+    async def main():
+        leader = asyncio.ensure_future(responses.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(responses.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    # the follower got LeaderCancelled, not the leader's CancelledError, and computed it itself
+    assert asyncio.run(main()) == {"v": 2}
+    assert len(calls) == 2
+
+
+def test_lead_publishes_to_joiners():
+    responses = ResponseCache()
+
+    async def main():
+        async def stream_leader():
+            with responses.lead("k") as publish:
+                await asyncio.sleep(0.01)
+                publish({"v": 1})
+
+        leader = asyncio.ensure_future(stream_leader())
+        await asyncio.sleep(0)
+        joined = await responses.join("k")
+        await leader
+        return joined
+
+    assert asyncio.run(main()) == {"v": 1}
+    assert responses.get("k") == {"v": 1}
+
+
+def test_leaving_lead_without_publishing_hands_over():
+    responses = ResponseCache()
+
+    async def main():
+        async def abandoned():
+            with responses.lead("k"):
+                await asyncio.sleep(0.01)
+
+        leader = asyncio.ensure_future(abandoned())
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(responses.get_or_compute("k", lambda: asyncio.sleep(0, result={"v": 2})))
+        await leader
+        return await follower
+
+    assert asyncio.run(main()) == {"v": 2}
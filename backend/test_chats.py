@@ -0,0 +1,48 @@
+# backend/test_chats.py
+import threading
+
+import pytest
+
+from backend.chats import ChatStore
+
+
+@pytest.fixture
+def chats(tmp_path):
+    return ChatStore(str(tmp_path / "chats.sqlite3"))
+
+
+def reply(priority: str) -> dict:
+    return {"priority": priority, "confidence": 0.9, "response": "ok", "info": "", "answered_by": "llm"}
+
+
+def test_history_is_newest_first_and_pages_by_id(chats):
+    turns = [chats.append("user_001", f"message {i}", reply("LOW")) for i in range(5)]
+    chats.append("user_002", "someone else", reply("HIGH"))
+    page = chats.history("user_001", limit=2)
+    assert [t["message"] for t in page] == ["message 4", "message 3"]
+    page = chats.history("user_001", before=page[-1]["id"], limit=10)
+    assert [t["message"] for t in page] == ["message 2", "message 1", "message 0"]
+    assert page[-1] == turns[0]
+
+
+def test_summary_counts_every_turn(chats):
+    for priority in ("HIGH", "LOW", "LOW", "MEDIUM"):
+        last = chats.append("user_001", "hi", reply(priority))
+    summary = chats.summary("user_001")
+    assert (summary["turns"], summary["high"], summary["medium"], summary["low"]) == (4, 1, 1, 2)
+    assert summary["last_id"] == last["id"] == chats.version("user_001")
+    assert chats.summary("user_404") is None
+    assert chats.version("user_404") == 0
+
+
+def test_threads_and_instances_share_the_file(chats):
+    def write():
+        for _ in range(20):
+            chats.append("user_001", "hi", reply("LOW"))
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ChatStore(chats.path).summary("user_001")["turns"] == 80
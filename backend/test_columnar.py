@@ -0,0 +1,56 @@
+# backend/test_columnar.py
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from backend.columnar import (
+    BASE_NAME, SCORE_SCHEMA, TXN_SCHEMA, append_part, base_info, list_parts, read_dataset, to_table,
+    user_row_groups, write_base,
+)
+
+
+def test_iso_strings_are_coerced_to_the_schema(make_transactions):
+    df = make_transactions("user_001", 2)
+    df["timestamp"] = ["2025-01-01T00:00:00Z", "2025-01-01T01:30:00+00:00"]
+    table = to_table(df, TXN_SCHEMA)
+    assert table.schema == TXN_SCHEMA
+    assert table.column("timestamp").to_pylist()[1] == pd.Timestamp("2025-01-01 01:30", tz="UTC")
+
+
+def test_row_groups_never_split_a_user():
+    user_ids = np.array(["a"] * 3 + ["b"] * 4 + ["c"] * 2)
+    assert user_row_groups(user_ids, target_rows=4) == [(0, 7), (7, 9)]
+    assert user_row_groups(user_ids, target_rows=100) == [(0, 9)]
+    assert user_row_groups(np.array([], dtype=str)) == []
+
+
+def test_base_is_sorted_by_user_then_newest_first(tmp_path, make_transactions):
+    directory = str(tmp_path / "transactions")
+    df = pd.concat([make_transactions("user_002", 2), make_transactions("user_001", 3)])
+    write_base(df, directory, TXN_SCHEMA, row_group_rows=2)
+    base = pq.ParquetFile(os.path.join(directory, BASE_NAME))
+    assert base.metadata.num_row_groups == 2
+    rows = read_dataset(directory, TXN_SCHEMA)
+    assert list(rows["txn_id"]) == ["user_001-t2", "user_001-t1", "user_001-t0", "user_002-t1", "user_002-t0"]
+
+
+def test_parts_after_the_base_are_read_with_it(tmp_path, make_scores):
+    directory = str(tmp_path / "fraud_scores")
+    write_base(make_scores("user_001", [0.1]), directory, SCORE_SCHEMA, compacted_through=1, lineage="abc")
+    append_part(make_scores("user_001", [0.2], start=1), directory, SCORE_SCHEMA, 1)
+    append_part(make_scores("user_001", [0.3], start=2), directory, SCORE_SCHEMA, 2)
+    assert base_info(directory) == ("abc", 1)
+    # part 1 is already folded into the base
+    assert list_parts(directory) == ["part-000000000002.parquet"]
+    assert sorted(read_dataset(directory, SCORE_SCHEMA)["txn_id"]) == ["user_001-t0", "user_001-t2"]
+    filtered = read_dataset(directory, SCORE_SCHEMA, columns=["txn_id"], filters=[("fraud_score", ">", 0.2)])
+    assert list(filtered.columns) == ["txn_id"] and list(filtered["txn_id"]) == ["user_001-t2"]
+
+
+def test_a_missing_dataset_reads_as_an_empty_typed_frame(tmp_path):
+    df = read_dataset(str(tmp_path / "nothing"), SCORE_SCHEMA)
+    assert df.empty
+    assert list(df.columns) == SCORE_SCHEMA.names
+    assert base_info(str(tmp_path / "nothing")) == (None, 0)
@@ -0,0 +1,76 @@
+# backend/test_context.py
+import pandas as pd
+import pytest
+
+from backend import context
+from backend.context import (
+    TABLE_HEADER, TURN_CHARS, build_compact_context, build_conversation_context, estimate_tokens, rank_transactions,
+)
+from backend.store import TransactionStore
+
+
+@pytest.fixture
+def store(make_transactions, make_scores, monkeypatch):
+    monkeypatch.setattr(context, "_accounts", {"user_001": {"avg_monthly_spend": 100.0, "chargeback_history": 2}})
+    txns = make_transactions("user_001", 20)
+    return TransactionStore.build(txns, make_scores("user_001", [0.9], start=3))
+
+
+def test_flagged_rows_rank_first(store):
+    ranked = rank_transactions(store.transactions("user_001"))
+    assert ranked["txn_id"].iloc[0] == "user_001-t3"
+    assert ranked["txn_id"].iloc[1] == "user_001-t19"
+
+
+def test_context_stays_within_the_budget(store):
+    flagged = store.flagged("user_001")
+    result = build_compact_context("user_001", "Tier: High", flagged, budget=120, store=store)
+    lines = result["transactions"].splitlines()
+    assert lines[0] == TABLE_HEADER
+    assert lines[-1].startswith("(+") and lines[-1].endswith("lower-ranked not shown)")
+    assert result["tokens"] <= 120
+    # the flagged row made the cut even though it is old, and rows are listed newest first
+    shown = lines[1:-1]
+    assert any(line.endswith("|F") for line in shown)
+    assert shown[0].startswith("01-01 19:00")
+    assert "chargebacks 2" in result["summary"]
+    assert "flagged 1 (all-time 1)" in result["summary"]
+
+
+def test_a_bigger_budget_shows_more_rows(store):
+    flagged = store.flagged("user_001")
+    small = build_compact_context("user_001", "", flagged, budget=120, store=store)
+    large = build_compact_context("user_001", "", flagged, budget=1000, store=store)
+    assert len(large["transactions"].splitlines()) > len(small["transactions"].splitlines())
+    assert "not shown" not in large["transactions"]
+
+
+def test_unknown_user_has_no_transactions(store):
+    result = build_compact_context("user_404", "", pd.DataFrame(columns=store.txn_columns), store=store)
+    assert result["transactions"] == "none on file"
+    assert result["summary"] == "Activity: no transactions on file."
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcde") == 2
+
+
+def turn(message: str, priority: str = "LOW") -> dict:
+    return {"message": message, "priority": priority}
+
+
+def test_conversation_window_is_oldest_first_within_the_budget():
+    turns = [turn(f"message {i}", "HIGH" if i == 9 else "LOW") for i in reversed(range(10))]
+    summary = {"turns": 10, "high": 1, "medium": 0, "low": 9, "first_ts": 0}
+    # five tokens a line: three fit
+    window = build_conversation_context(turns, summary, budget=15)
+    lines = window.splitlines()
+    assert lines[0] == "(earlier: 7 messages since 1970-01-01; HIGH 0, MEDIUM 0, LOW 7)"
+    assert lines[1:] == ["[LOW] message 7", "[LOW] message 8", "[HIGH] message 9"]
+
+
+def test_long_turns_are_truncated_and_no_turns_is_none():
+    window = build_conversation_context([turn("x" * 1000)], {"turns": 1, "high": 0, "medium": 0, "low": 1, "first_ts": 0})
+    assert window == "[LOW] " + "x" * TURN_CHARS + "..."
+    assert build_conversation_context([], None) == "none"
@@ -0,0 +1,149 @@
+# backend/test_data_api.py
+import datetime
+
+import pandas as pd
+import pytest
+
+from backend import data_api
+from backend.columnar import write_accounts
+from backend.data_api import AccountCache, InvalidCursor, decode_cursor, encode_cursor, transactions_page
+from backend.store import TransactionStore
+
+
+def accounts_frame(user_ids: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "user_id": user_ids,
+        "name": [f"Name {u}" for u in user_ids],
+        "account_type": "checking",
+        "opened_at": datetime.date(2020, 1, 1),
+        "account_balance": 100.0,
+        "avg_monthly_spend": 50.0,
+        "std_monthly_spend": 5.0,
+        "card_status": "active",
+        "reported_priority": "normal",
+        "true_risk_flag": 0,
+        "chargeback_history": 0,
+        "last_login_ip_country": "US",
+        "device_fingerprint": "dev-1",
+    })
+
+
+@pytest.fixture
+def accounts(tmp_path):
+    path = str(tmp_path / "accounts.parquet")
+    write_accounts(accounts_frame(["user_001", "user_002", "user_010", "user_011", "user_020"]), path)
+    return AccountCache(path)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(1735689600000000000, "user_001-t3")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == [1735689600000000000, "user_001-t3"]
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24"])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_account_pages_follow_the_cursor(accounts):
+    first, last = accounts.page(limit=2)
+    assert [a["user_id"] for a in first] == ["user_001", "user_002"]
+    assert first[0] == {"user_id": "user_001", "name": "Name user_001"}
+    second, last = accounts.page(last, limit=2)
+    assert [a["user_id"] for a in second] == ["user_010", "user_011"]
+    third, last = accounts.page(last, limit=2)
+    assert [a["user_id"] for a in third] == ["user_020"]
+    assert last is None
+
+
+def test_account_prefix_is_one_sorted_run(accounts):
+    page, last = accounts.page(prefix="user_01", limit=1)
+    assert [a["user_id"] for a in page] == ["user_010"]
+    page, last = accounts.page(last, prefix="user_01", limit=1)
+    assert [a["user_id"] for a in page] == ["user_011"]
+    assert last is None
+    assert accounts.page(prefix="user_03") == ([], None)
+
+
+def test_accounts_are_reread_when_the_file_changes(accounts):
+    assert accounts.get("user_003") is None
+    write_accounts(accounts_frame(["user_003"]), accounts.path)
+    assert accounts.get("user_003")["name"] == "Name user_003"
+    assert accounts.get("user_001") is None
+
+
+@pytest.fixture
+def store(make_transactions, make_scores):
+    txns = pd.concat([make_transactions("user_001", 7), make_transactions("user_002", 2)], ignore_index=True)
+    # two rows share a timestamp, so the cursor's txn_id has to break the tie
+    txns.loc[txns["txn_id"] == "user_001-t4", "timestamp"] = txns.loc[txns["txn_id"] == "user_001-t5", "timestamp"].iloc[0]
+    txns.loc[txns["txn_id"] == "user_001-t2", "amount"] = 500.0
+    return TransactionStore.build(txns, make_scores("user_001", [0.9, 0.1, 0.9]))
+
+
+def walk(store, user_id: str, limit: int, **filters) -> list[list[str]]:
+    pages, cursor = [], None
+    while True:
+        page = transactions_page(user_id, cursor, limit, store=store, **filters)
+        pages.append([row[page["columns"].index("txn_id")] for row in page["rows"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_transaction_pages_are_newest_first_without_gaps(store):
+    assert walk(store, "user_001", 3) == [
+        ["user_001-t6", "user_001-t4", "user_001-t5"],
+        ["user_001-t3", "user_001-t2", "user_001-t1"],
+        ["user_001-t0"],
+    ]
+
+
+def test_transaction_filters_apply_before_the_limit(store):
+    assert walk(store, "user_001", 1, only_flagged=True) == [["user_001-t2"], ["user_001-t0"]]
+    assert walk(store, "user_001", 5, min_amount=100) == [["user_001-t2"]]
+    assert walk(store, "user_003", 5) == [[]]
+
+
+def test_transaction_page_rejects_a_malformed_cursor(store):
+    with pytest.raises(InvalidCursor):
+        transactions_page("user_001", encode_cursor("only-one-field"), store=store)
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+    ("", False),
+])
+def test_etag_matches(header, matches):
+    from backend.main import etag_matches
+    assert etag_matches('"abc"', header) is matches
+
+
+def test_unchanged_accounts_answer_304(accounts, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    monkeypatch.setattr(data_api, "account_cache", accounts)
+    client = TestClient(app)
+
+    first = client.get("/accounts", params={"limit": 2})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert client.get("/accounts", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 304
+    # another page, another prefix or a changed file is a different answer
+    assert client.get("/accounts", params={"limit": 3}, headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/accounts", params={"limit": 2, "prefix": "user_01"}, headers={"If-None-Match": etag}).status_code == 200
+    write_accounts(accounts_frame(["user_001", "user_002"]), accounts.path)
+    assert client.get("/accounts", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_bad_cursor_is_a_400(accounts, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    monkeypatch.setattr(data_api, "account_cache", accounts)
+    assert TestClient(app).get("/accounts", params={"cursor": "not base64!"}).status_code == 400
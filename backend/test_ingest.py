@@ -0,0 +1,130 @@
+# backend/test_ingest.py
+import os
+
+import pandas as pd
+import pytest
+
+from backend import shards
+from backend.columnar import SCORE_SCHEMA, TXN_SCHEMA, base_info, list_parts, list_staged, read_dataset, stage_part
+from backend.ingest import IngestLog, LogTail, ShardedLog, append_batches, dataset_version
+
+
+@pytest.fixture
+def log(tmp_path):
+    return IngestLog(str(tmp_path / "fraud_scores"), SCORE_SCHEMA, compact_after=0)
+
+
+def txn_ids(df) -> list[str]:
+    return sorted(df["txn_id"])
+
+
+def test_appends_are_numbered_parts(log, make_scores):
+    assert log.append(make_scores("user_001", [0.1])) == 1
+    assert log.append(make_scores("user_001", [0.2], start=1)) == 2
+    assert list_parts(log.directory) == ["part-000000000001.parquet", "part-000000000002.parquet"]
+    assert txn_ids(read_dataset(log.directory, SCORE_SCHEMA)) == ["user_001-t0", "user_001-t1"]
+
+
+def test_compaction_keeps_lineage_and_sequence(log, make_scores):
+    log.rewrite(make_scores("user_001", [0.1]))
+    lineage, _ = base_info(log.directory)
+    for i in range(3):
+        log.append(make_scores("user_002", [0.5], start=i))
+
+    assert log.compact() == 3
+    assert base_info(log.directory) == (lineage, 3)
+    assert list_parts(log.directory, after=0) == []
+    assert len(read_dataset(log.directory, SCORE_SCHEMA)) == 4
+    # numbering continues after the folded parts
+    assert log.append(make_scores("user_002", [0.5], start=3)) == 4
+    assert dataset_version(log.directory) == (lineage, 4)
+
+
+def test_rewrite_starts_a_new_lineage(log, make_scores):
+    log.rewrite(make_scores("user_001", [0.1]))
+    log.append(make_scores("user_001", [0.2], start=1))
+    lineage, _ = base_info(log.directory)
+    log.rewrite(make_scores("user_002", [0.3]))
+    assert base_info(log.directory)[0] != lineage
+    assert txn_ids(read_dataset(log.directory, SCORE_SCHEMA)) == ["user_002-t0"]
+
+
+def test_auto_compaction(tmp_path, make_scores):
+    log = IngestLog(str(tmp_path / "scores"), SCORE_SCHEMA, compact_after=2)
+    log.append(make_scores("user_001", [0.1]))
+    log.append(make_scores("user_001", [0.2], start=1))
+    assert list_parts(log.directory, after=0) == []
+    assert base_info(log.directory)[1] == 2
+
+
+def test_tail_polls_only_new_rows(log, make_scores):
+    log.rewrite(make_scores("user_001", [0.1]))
+    tail = LogTail(log.directory, SCORE_SCHEMA)
+    assert txn_ids(tail.read_all()) == ["user_001-t0"]
+    assert tail.poll().empty
+    log.append(make_scores("user_001", [0.2], start=1))
+    assert txn_ids(tail.poll()) == ["user_001-t1"]
+    assert tail.last_seq == 1
+    assert tail.written_at == os.stat(os.path.join(log.directory, list_parts(log.directory)[-1])).st_mtime
+
+
+def test_tail_absorbs_compaction_of_parts_it_has_seen(log, make_scores):
+    log.rewrite(make_scores("user_001", [0.0]))
+    log.append(make_scores("user_001", [0.1]))
+    tail = LogTail(log.directory, SCORE_SCHEMA)
+    tail.read_all()
+    log.compact()
+    log.append(make_scores("user_001", [0.2], start=1))
+    assert txn_ids(tail.poll()) == ["user_001-t1"]
+
+
+def test_tail_asks_for_a_reread_when_unseen_parts_were_folded(log, make_scores):
+    log.append(make_scores("user_001", [0.1]))
+    tail = LogTail(log.directory, SCORE_SCHEMA)
+    tail.read_all()
+    log.append(make_scores("user_001", [0.2], start=1))
+    log.compact()
+    assert tail.poll() is None
+    assert txn_ids(tail.read_all()) == ["user_001-t0", "user_001-t1"]
+
+
+def test_tail_asks_for_a_reread_after_a_rewrite(log, make_scores):
+    log.rewrite(make_scores("user_001", [0.1]))
+    tail = LogTail(log.directory, SCORE_SCHEMA)
+    tail.read_all()
+    log.rewrite(make_scores("user_002", [0.2]))
+    assert tail.poll() is None
+
+
+def test_a_dead_writers_staged_part_is_removed_not_published(log, make_scores):
+    stage_part(make_scores("user_001", [0.9]), log.directory, SCORE_SCHEMA, 1)
+    assert read_dataset(log.directory, SCORE_SCHEMA).empty
+    log.append(make_scores("user_002", [0.1]))
+    assert list_staged(log.directory) == []
+    assert txn_ids(read_dataset(log.directory, SCORE_SCHEMA)) == ["user_002-t0"]
+
+
+@pytest.fixture
+def two_shards(workdir, monkeypatch):
+    monkeypatch.setattr(shards, "_count", 2)
+    return ShardedLog("fraud_scores", SCORE_SCHEMA)
+
+
+def test_batches_are_split_by_user_shard(two_shards, make_scores):
+    rows = pd.concat([make_scores(f"user_{i:03d}", [0.1]) for i in range(8)])
+    seqs = two_shards.append(rows)
+    assert sorted(seqs) == [0, 1]
+    for shard_log in two_shards.logs:
+        users = set(read_dataset(shard_log.directory, SCORE_SCHEMA)["user_id"])
+        assert {shards.shard_of(user, 2) for user in users} == {shard_log.directory.endswith("001/fraud_scores")}
+    assert txn_ids(two_shards.read()) == txn_ids(rows)
+
+
+def test_a_failed_batch_appends_nothing_anywhere(two_shards, make_scores, make_transactions):
+    transactions = ShardedLog("transactions", TXN_SCHEMA)
+    good = pd.concat([make_transactions(f"user_{i:03d}", 1) for i in range(8)])
+    bad = make_scores("user_001", [0.1]).assign(fraud_score="not a number")
+    with pytest.raises((ValueError, TypeError)):
+        append_batches([(transactions, good), (two_shards, bad)])
+    assert transactions.read().empty
+    assert all(list_staged(log.directory) == [] for log in transactions.logs + two_shards.logs)
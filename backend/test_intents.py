@@ -0,0 +1,50 @@
+# backend/test_intents.py
+from backend.intents import IntentIndex, embed
+
+
+def test_embeddings_are_unit_length_and_normalized():
+    assert abs(float(embed("Where is my card?") @ embed("Where is my card?")) - 1) < 1e-5
+    assert abs(float(embed("Where is my card?") @ embed("  where IS my card  ")) - 1) < 1e-5
+
+
+def test_near_duplicates_hit_and_other_messages_miss():
+    index = IntentIndex(max_entries=16)
+    index.add("I lost my card, please block it", "Low", "HIGH", 0.9)
+    hit = index.lookup("i lost my card please block it!", "Low")
+    assert hit is not None
+    entry, similarity = hit
+    assert entry["priority"] == "HIGH" and similarity >= index.threshold
+    assert index.lookup("what is the interest rate on savings", "Low") is None
+    assert (index.hits, index.misses) == (1, 1)
+
+
+def test_entries_never_cross_tiers():
+    index = IntentIndex(max_entries=16)
+    index.add("I lost my card, please block it", "Low", "MEDIUM", 0.9)
+    assert index.lookup("I lost my card, please block it", "High") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    index = IntentIndex(max_entries=2)
+    index.add("I lost my card, please block it", "Low", "HIGH", 0.9)
+    index.add("what is the interest rate on savings", "Low", "LOW", 0.9)
+    assert index.lookup("I lost my card, please block it", "Low") is not None
+    index.add("how do I change my address", "Low", "LOW", 0.9)
+    assert index.evictions == 1
+    assert index.lookup("what is the interest rate on savings", "Low") is None
+    assert index.lookup("I lost my card, please block it", "Low") is not None
+    assert index.lookup("how do I change my address", "Low") is not None
+
+
+def test_expired_entries_miss_and_are_dropped_on_rebuild():
+    index = IntentIndex(max_entries=4, ttl=0)
+    index.add("I lost my card, please block it", "Low", "HIGH", 0.9)
+    assert index.lookup("I lost my card, please block it", "Low") is None
+    index.rebuild()
+    assert index.stats()["entries"] == 0
+
+
+def test_a_zero_size_index_is_disabled():
+    index = IntentIndex(max_entries=0)
+    index.add("I lost my card, please block it", "Low", "HIGH", 0.9)
+    assert index.lookup("I lost my card, please block it", "Low") is None
@@ -0,0 +1,168 @@
+# backend/test_llm.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend import llm
+from backend.llm import LLMQueue, LLMQueueFull, Permits
+from backend.resilience import CircuitOpen
+
+REPLY = '{"priority": "HIGH", "confidence": 0.9, "response": "r", "info": "i"}'
+
+
+class FakeModel:
+    """generate_text stand-in: replies in order (an Exception is raised), tracking how many calls overlap."""
+
+    def __init__(self, replies=(REPLY,), latency=0.0):
+        self.replies = list(replies)
+        self.latency = latency
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            reply = self.replies[min(self.calls, len(self.replies) - 1)]
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.latency)
+        with self._lock:
+            self.running -= 1
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+@pytest.fixture
+def model(monkeypatch):
+    def install(*replies, latency=0.0):
+        fake = FakeModel(replies or (REPLY,), latency)
+        monkeypatch.setattr(llm, "generate_text", fake)
+        return fake
+    return install
+
+
+def queue(**kwargs) -> LLMQueue:
+    options = {"max_concurrency": 2, "max_queue": 10, "deadline": 2, "retries": 2, "backoff": 0.001, "hedge_quantile": 0}
+    return LLMQueue(**{**options, **kwargs})
+
+
+def test_retries_a_failed_call(model):
+    fake = model(RuntimeError("boom"), REPLY)
+    assert asyncio.run(queue().generate("p")) == REPLY
+    assert fake.calls == 2
+
+
+def test_a_rejected_reply_is_retried(model):
+    fake = model("not json", REPLY)
+
+    def parse(text):
+        if text != REPLY:
+            raise ValueError("bad reply")
+        return text
+
+    assert asyncio.run(queue().generate("p", parse)) == REPLY
+    assert fake.calls == 2
+
+
+def test_gives_up_after_the_retries_and_opens_the_breaker(model):
+    model(RuntimeError("boom"))
+    q = queue(retries=1)
+    q.breaker.failures = 2
+    with pytest.raises(RuntimeError):
+        asyncio.run(q.generate("p"))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(q.generate("p"))
+
+
+def test_deadline(model):
+    model(latency=0.5)
+    with pytest.raises(TimeoutError):
+        asyncio.run(queue(deadline=0.05, retries=0).generate("p"))
+
+
+def test_concurrency_limit_and_queue_bound(model):
+    fake = model(latency=0.05)
+    q = queue(max_concurrency=2, max_queue=3)
+
+    async def main():
+        return await asyncio.gather(*(q.generate("p") for _ in range(6)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert fake.peak == 2
+    # two running, three waiting, the sixth turned away
+    assert [type(r) for r in results].count(LLMQueueFull) == 1
+
+
+def test_blocking_calls_share_the_async_slots(model):
+    fake = model(latency=0.05)
+    q = queue(max_concurrency=2, max_queue=100)
+
+    async def main():
+        threads = [threading.Thread(target=q.generate_blocking, args=("p",)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        await asyncio.gather(*(q.generate("p") for _ in range(3)))
+        await asyncio.to_thread(lambda: [thread.join() for thread in threads])
+
+    asyncio.run(main())
+    assert (fake.calls, fake.peak) == (6, 2)
+    assert (q.running, q.waiting) == (0, 0)
+
+
+def test_a_timed_out_blocking_call_keeps_its_slot_until_it_ends(model):
+    model(latency=0.3)
+    q = queue(max_concurrency=1, deadline=0.05, retries=0)
+    with pytest.raises(TimeoutError):
+        q.generate_blocking("p")
+    assert q.running == 1
+    time.sleep(0.4)
+    assert q.running == 0
+
+
+def test_blocking_calls_respect_the_queue_bound(model):
+    model(latency=0.2)
+    q = queue(max_concurrency=1, max_queue=1, retries=0)
+    running, waiting = (threading.Thread(target=q.generate_blocking, args=("p",)) for _ in range(2))
+    running.start()
+    time.sleep(0.05)
+    waiting.start()
+    time.sleep(0.05)
+    with pytest.raises(LLMQueueFull):
+        q.generate_blocking("p")
+    running.join()
+    waiting.join()
+
+
+def test_a_cancelled_waiter_gives_its_permit_back():
+    permits = Permits(1)
+
+    async def main():
+        await permits.acquire()
+        waiter = asyncio.ensure_future(permits.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        permits.release()
+
+    asyncio.run(main())
+    assert (permits.free, permits.waiting) == (1, 0)
+
+
+def test_stream_reports_a_malformed_reply_to_the_breaker(monkeypatch):
+    monkeypatch.setattr(llm, "_stream_text", lambda prompt: iter(['{"priority": ', '"HIGH"']))
+    q = queue()
+
+    def parse(text):
+        raise ValueError("truncated")
+
+    async def main():
+        return [chunk async for chunk in q.stream("p", parse)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+    assert q.breaker.consecutive_failures == 1
@@ -0,0 +1,83 @@
+# backend/test_metrics.py
+import asyncio
+import json
+import logging
+
+import pytest
+
+from backend import metrics
+from backend.metrics import Counter, Gauge, Histogram, render, sample_log, span, start_trace
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh registry, so the test's metrics don't join the process-wide ones."""
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    return metrics.REGISTRY
+
+
+def test_counters_and_gauges_render_per_label(registry):
+    requests = Counter("requests_total", "Requests.", ("route",))
+    depth = Gauge("queue_depth", "Depth.")
+    requests.inc(route="/a")
+    requests.inc(2, route='/b"')
+    depth.set(1.5)
+    assert render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a"} 1',
+        'requests_total{route="/b\\""} 2',
+        "# HELP queue_depth Depth.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 1.5",
+    ]
+    assert requests.value(route="/a") == 1
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    assert list(latency.samples()) == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+    ]
+
+
+def test_spans_land_in_the_histogram_and_the_trace(registry, monkeypatch):
+    stages = Histogram("stage_seconds", "Stages.", ("stage",))
+    monkeypatch.setattr(metrics, "stage_seconds", stages)
+
+    async def request():
+        trace = start_trace()
+        with span("parse"):
+            pass
+        with span("respond"):
+            pass
+        return trace
+
+    trace = asyncio.run(request())
+    assert [stage for stage, _ in trace.stages] == ["parse", "respond"]
+    assert any(line.startswith('stage_seconds_count{stage="parse"} 1') for line in stages.samples())
+
+
+def test_only_sampled_requests_are_logged(monkeypatch, caplog):
+    monkeypatch.setattr(metrics.logger, "propagate", True)
+    caplog.set_level(logging.INFO, logger="novaroute")
+
+    async def request(rate: float):
+        monkeypatch.setattr(metrics, "LOG_SAMPLE_RATE", rate)
+        start_trace()
+        with span("work"):
+            pass
+        sample_log("analyze", user_id="user_001")
+
+    asyncio.run(request(0.0))
+    assert caplog.records == []
+    asyncio.run(request(1.0))
+    line = json.loads(caplog.records[0].getMessage())
+    assert line["event"] == "analyze" and line["user_id"] == "user_001"
+    assert [stage for stage, _ in line["stages_ms"]] == ["work"]
@@ -0,0 +1,76 @@
+# backend/test_resilience.py
+import pytest
+
+from backend import resilience
+from backend.resilience import CircuitBreaker, CircuitOpen, LatencyTracker, backoff_delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, cooldown=30)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()  # a success resets the run
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_one_probe_after_the_cooldown(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=30)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # only the probe goes through until it reports back
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=30)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert (breaker.state, breaker.consecutive_failures) == ("closed", 0)
+    breaker.before_call()
+
+
+def test_probe_failure_reopens_for_another_cooldown(clock):
+    breaker = CircuitBreaker(failures=5, cooldown=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] += 29
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    clock[0] += 1
+    breaker.before_call()
+
+
+def test_latency_quantile_needs_enough_samples():
+    tracker = LatencyTracker(window=10, min_samples=5)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        tracker.observe(seconds)
+    assert tracker.quantile(0.5) is None
+    tracker.observe(0.5)
+    assert tracker.quantile(0.5) == 0.3
+    assert tracker.quantile(0.99) == 0.5
+
+
+def test_backoff_is_bounded_by_the_doubling_ceiling():
+    assert all(0 <= backoff_delay(3, 0.2) <= 1.6 for _ in range(100))
@@ -0,0 +1,77 @@
+# backend/test_risk.py
+import os
+
+import pytest
+
+from backend import risk
+from backend.columnar import SCORE_SCHEMA, list_parts
+from backend.ingest import IngestLog
+from backend.risk import RiskAggregates
+
+
+@pytest.fixture
+def scores(tmp_path, make_scores):
+    log = IngestLog(str(tmp_path / "fraud_scores"), SCORE_SCHEMA, compact_after=0)
+    log.rewrite(make_scores("user_001", [0.9, 0.8]))
+    return log
+
+
+def test_build_reads_base_and_parts(scores, make_scores):
+    scores.append(make_scores("user_002", [0.1], start=10))
+    aggregates = RiskAggregates(scores.directory)
+    assert aggregates.get("user_001").count == 2
+    assert aggregates.get("user_001").flagged_count == 2
+    assert aggregates.get("user_001").tier == "High"
+    assert aggregates.get("user_002").tier == "Low"
+    assert aggregates.get("user_003") is None
+
+
+def test_appended_batches_are_folded_in_without_a_rebuild(scores, make_scores):
+    aggregates = RiskAggregates(scores.directory)
+    generation, before = aggregates.generation, aggregates.version("user_001")
+    scores.append(make_scores("user_001", [0.0, 0.0], start=2))
+    aggregates.refresh(force=True)
+
+    user = aggregates.get("user_001")
+    assert (user.count, user.flagged_count, user.max_score) == (4, 2, 0.9)
+    assert user.mean_score == pytest.approx(0.425)
+    assert aggregates.generation == generation
+    assert aggregates.version("user_001") != before
+    # the time of the data, not of the refresh
+    part = os.path.join(scores.directory, list_parts(scores.directory)[-1])
+    assert user.last_updated == os.stat(part).st_mtime
+
+
+def test_refresh_is_throttled_unless_forced(scores, make_scores, monkeypatch):
+    monkeypatch.setattr(risk, "SNAPSHOT_POLL_SECONDS", 3600)
+    aggregates = RiskAggregates(scores.directory)
+    scores.append(make_scores("user_001", [0.5], start=2))
+    assert aggregates.get("user_001").count == 2
+    aggregates.refresh(force=True)
+    assert aggregates.get("user_001").count == 3
+
+
+def test_compacting_seen_parts_keeps_the_table(scores, make_scores):
+    scores.append(make_scores("user_001", [0.3], start=2))
+    aggregates = RiskAggregates(scores.directory)
+    generation = aggregates.generation
+    assert scores.compact() == 1
+    scores.append(make_scores("user_001", [0.2], start=3))
+    aggregates.refresh(force=True)
+    assert aggregates.get("user_001").count == 4
+    assert aggregates.generation == generation
+
+
+def test_rewrite_rebuilds_and_swaps_the_table(scores, make_scores):
+    aggregates = RiskAggregates(scores.directory)
+    generation = aggregates.generation
+    old_table = aggregates.users
+    scores.rewrite(make_scores("user_002", [0.6]))
+    aggregates.refresh(force=True)
+
+    assert aggregates.generation == generation + 1
+    assert aggregates.get("user_001") is None
+    assert aggregates.get("user_002").tier == "Medium"
+    # readers holding the old table never see it change under them
+    assert set(old_table) == {"user_001"}
+    assert aggregates.tier_counts() == {"High": 0, "Medium": 1, "Low": 0}
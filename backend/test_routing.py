@@ -0,0 +1,140 @@
+# backend/test_routing.py
+import asyncio
+
+import pytest
+
+from backend import routing
+from backend.routing import AgentAtCapacity, RoutingQueue, RoutingQueueFull, needs_agent, route_conversation
+
+
+@pytest.fixture
+def clock():
+    now = [1000.0]
+
+    def tick():
+        return now[0]
+    tick.now = now
+    return tick
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = RoutingQueue(str(tmp_path / "routing.sqlite3"), max_depth=10, clock=clock)
+    queue.add_agent("agent_a", 2)
+    return queue
+
+
+def test_priority_and_tier_decide_the_order(queue):
+    low = queue.enqueue("u1", "m", "LOW")
+    medium = queue.enqueue("u2", "m", "MEDIUM")
+    high = queue.enqueue("u3", "m", "HIGH")
+    risky_medium = queue.enqueue("u4", "m", "MEDIUM", tier="High")
+    queue.add_agent("agent_b", 10)
+    claimed = [queue.claim("agent_b").conversation_id for _ in range(4)]
+    assert claimed == [c.conversation_id for c in (high, risky_medium, medium, low)]
+
+
+def test_waiting_conversations_age_past_newer_urgent_ones(queue, clock):
+    low = queue.enqueue("u1", "m", "LOW")
+    clock.now[0] += routing.PRIORITY_OFFSETS["LOW"] + 1
+    queue.enqueue("u2", "m", "HIGH")
+    assert queue.claim("agent_a").conversation_id == low.conversation_id
+
+
+def test_claim_and_complete(queue, clock):
+    conversation = queue.enqueue("u1", "hello", "HIGH", tier="Medium", confidence=0.9)
+    clock.now[0] += 5
+    claimed = queue.claim("agent_a")
+    assert (claimed.user_id, claimed.message, claimed.agent_id, claimed.claimed_at) == ("u1", "hello", "agent_a", 1005.0)
+    assert queue.agents["agent_a"].active == 1
+    assert queue.claim("agent_a") is None
+    done = queue.complete(conversation.conversation_id)
+    assert done.to_dict() == claimed.to_dict()
+    assert (queue.agents["agent_a"].active, queue.agents["agent_a"].completed) == (0, 1)
+    with pytest.raises(KeyError):
+        queue.complete(conversation.conversation_id)
+
+
+def test_unknown_agents_and_conversations(queue):
+    waiting = queue.enqueue("u1", "m", "HIGH")
+    with pytest.raises(KeyError):
+        queue.claim("nobody")
+    with pytest.raises(KeyError):
+        queue.complete(waiting.conversation_id)  # not claimed yet
+    with pytest.raises(KeyError):
+        queue.complete("not-an-id")
+
+
+def test_agents_claim_up_to_capacity(queue):
+    for i in range(3):
+        queue.enqueue(f"u{i}", "m", "HIGH")
+    queue.claim("agent_a")
+    queue.claim("agent_a")
+    with pytest.raises(AgentAtCapacity):
+        queue.claim("agent_a")
+    queue.add_agent("agent_a", 3)
+    assert queue.claim("agent_a") is not None
+
+
+def test_depth_bound_rejects(queue):
+    for i in range(10):
+        queue.enqueue(f"u{i}", "m", "MEDIUM")
+    with pytest.raises(RoutingQueueFull):
+        queue.enqueue("u10", "m", "HIGH")
+    assert len(queue) == 10
+    queue.claim("agent_a")
+    queue.enqueue("u10", "m", "HIGH")
+
+
+def test_stats(queue, clock):
+    queue.enqueue("u1", "m", "HIGH")
+    clock.now[0] += 10
+    queue.enqueue("u2", "m", "MEDIUM")
+    queue.enqueue("u3", "m", "MEDIUM")
+    clock.now[0] += 2
+    queue.claim("agent_a")
+    stats = queue.stats()
+    assert stats["depth"] == 2
+    assert stats["depth_by_priority"] == {"MEDIUM": 2}
+    assert stats["oldest_wait_s"] == {"MEDIUM": 2.0}
+    assert stats["claimed_wait_s"]["p50"] == 12.0
+    assert stats["agents"] == {"count": 1, "capacity": 2, "active": 1, "utilization": 0.5}
+    assert (stats["enqueued"], stats["claimed"], stats["completed"], stats["rejected"]) == (3, 1, 0, 0)
+
+
+def test_every_process_sees_one_queue(queue, tmp_path):
+    other_worker = RoutingQueue(str(tmp_path / "routing.sqlite3"))
+    conversation = other_worker.enqueue("u1", "m", "HIGH")
+    assert queue.claim("agent_a").conversation_id == conversation.conversation_id
+    assert other_worker.agents["agent_a"].active == 1
+    other_worker.complete(conversation.conversation_id)
+    assert queue.stats()["completed"] == 1
+
+
+def test_only_conversations_that_need_a_human_are_queued(queue, monkeypatch):
+    monkeypatch.setattr(routing, "get_routing_queue", lambda: queue)
+    monkeypatch.setattr(routing, "ROUTE_MIN_PRIORITY", "MEDIUM")
+    assert not needs_agent("LOW") and needs_agent("MEDIUM") and not needs_agent("garbage")
+    assert route_conversation("user_001", "hi", {"priority": "LOW"}) == {"status": "self_service"}
+    assert len(queue) == 0
+
+
+def test_simulated_agents_work_the_queue(queue, monkeypatch):
+    monkeypatch.setattr(routing, "get_routing_queue", lambda: queue)
+    for i in range(5):
+        queue.enqueue(f"u{i}", "m", "HIGH")
+
+    async def main():
+        simulation = asyncio.ensure_future(routing.simulate_agents(0.001, poll_interval=0.01))
+        # a claim through the API racing the simulation must not stop it
+        await asyncio.to_thread(queue.claim, "agent_a")
+        for _ in range(200):
+            if queue.stats()["claimed"] == 5:
+                break
+            await asyncio.sleep(0.01)
+        simulation.cancel()
+        await asyncio.gather(simulation, return_exceptions=True)
+
+    asyncio.run(main())
+    assert len(queue) == 0
+    assert queue.stats()["claimed"] == 5
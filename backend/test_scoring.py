@@ -0,0 +1,50 @@
+# backend/test_scoring.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import shards
+from backend.columnar import SCORE_SCHEMA, SCORES_DIR, read_dataset
+from backend.ingest import scores_log, transactions_log
+from backend.scoring import FraudScorer, extract_features, score_new_transactions, score_transactions
+
+
+@pytest.fixture
+def history(workdir, monkeypatch, make_transactions):
+    monkeypatch.setattr(shards, "_count", 1)
+    txns = pd.concat([make_transactions(f"user_{i:03d}", 10) for i in range(5)], ignore_index=True)
+    transactions_log.append(txns)
+    return txns
+
+
+def test_features_are_one_float_row_per_transaction(make_transactions):
+    X = extract_features(make_transactions("user_001", 4))
+    assert X.shape[0] == 4 and X.dtype == np.float32
+    assert np.isfinite(X).all()
+
+
+def test_scores_are_in_range_and_chunking_does_not_change_them(workdir, make_transactions):
+    txns = make_transactions("user_001", 40)
+    txns.loc[txns.index[-1], ["amount", "is_foreign", "merchant_risk_score"]] = [50_000.0, 1, 0.99]
+    FraudScorer(n_estimators=20).fit(txns).save("models/test.joblib")
+    whole = score_transactions(txns, "models/test.joblib")
+    chunked = score_transactions(txns, "models/test.joblib", chunk_rows=15, workers=2)
+    assert list(whole.columns) == SCORE_SCHEMA.names
+    assert whole["fraud_score"].between(0, 1).all()
+    assert whole["fraud_score"].idxmax() == txns.index[-1]
+    pd.testing.assert_frame_equal(whole, chunked)
+
+
+def test_only_unscored_transactions_are_scored(history, make_transactions, make_scores):
+    assert score_new_transactions() == len(history)
+    assert score_new_transactions() == 0
+
+    transactions_log.append(make_transactions("user_001", 2, start=10))
+    # this one arrived with its score already
+    transactions_log.append(make_transactions("user_002", 1, start=10))
+    scores_log.append(make_scores("user_002", [0.5], start=10))
+    assert score_new_transactions() == 2
+
+    scores = read_dataset(SCORES_DIR, SCORE_SCHEMA)
+    assert scores["txn_id"].is_unique
+    assert set(scores["txn_id"]) == set(history["txn_id"]) | {"user_001-t10", "user_001-t11", "user_002-t10"}
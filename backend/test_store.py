@@ -0,0 +1,144 @@
+# backend/test_store.py
+import os
+
+import pandas as pd
+import pytest
+
+from backend import store as store_module
+from backend.columnar import SCORE_SCHEMA, TXN_SCHEMA
+from backend.ingest import IngestLog
+from backend.shards import Shard
+from backend.snapshot import current_version, publish, publish_if_stale
+from backend.store import StoreManager, TransactionStore
+
+
+def txn_ids(df) -> list[str]:
+    return list(df["txn_id"])
+
+
+@pytest.fixture
+def store(make_transactions, make_scores):
+    txns = pd.concat([make_transactions("user_001", 5), make_transactions("user_002", 2)], ignore_index=True)
+    # t9 has a score but no transaction (yet)
+    scores = pd.concat([make_scores("user_001", [0.9, 0.1, 0.8]), make_scores("user_001", [0.95], start=9)])
+    return TransactionStore.build(txns, scores)
+
+
+def test_recent_is_newest_first(store):
+    assert txn_ids(store.recent("user_001", 3)) == ["user_001-t4", "user_001-t3", "user_001-t2"]
+    assert txn_ids(store.recent("user_002", 10)) == ["user_002-t1", "user_002-t0"]
+    assert store.recent("user_003").empty
+    assert len(store) == 7
+
+
+def test_scores_are_joined_and_missing_ones_are_zero(store):
+    rows = store.transactions("user_001").set_index("txn_id")
+    assert rows.loc["user_001-t0", "fraud_score"] == 0.9
+    assert rows.loc["user_001-t4", "fraud_score"] == 0.0
+    assert rows.loc["user_001-t4", "fraud_label"] == 0
+
+
+def test_flagged_includes_scores_without_a_transaction(store):
+    assert set(txn_ids(store.flagged("user_001"))) == {"user_001-t0", "user_001-t2", "user_001-t9"}
+    assert store.flagged("user_002").empty
+
+
+def test_since_cuts_at_the_timestamp(store):
+    cutoff = pd.Timestamp("2025-01-01 03:00", tz="UTC")
+    assert txn_ids(store.since("user_001", cutoff)) == ["user_001-t4", "user_001-t3"]
+
+
+def test_an_opened_snapshot_answers_like_the_built_store(store, tmp_path):
+    directory = str(tmp_path / "snapshots")
+    version = publish(store.tables(), {"source": {}}, directory)
+    assert current_version(directory) == version
+    opened = TransactionStore.open(version, directory)
+    assert opened.version == version
+    for user_id in ("user_001", "user_002", "user_003"):
+        pd.testing.assert_frame_equal(opened.transactions(user_id), store.transactions(user_id))
+        pd.testing.assert_frame_equal(opened.flagged(user_id), store.flagged(user_id))
+
+
+def test_old_snapshot_versions_are_pruned(store, tmp_path):
+    directory = str(tmp_path / "snapshots")
+    versions = [publish(store.tables(), {}, directory) for _ in range(4)]
+    assert versions == ["v000001", "v000002", "v000003", "v000004"]
+    assert sorted(n for n in os.listdir(directory) if n.startswith("v")) == versions[-2:]
+
+
+def test_a_fresh_snapshot_is_not_rebuilt(store, tmp_path):
+    directory = str(tmp_path / "snapshots")
+    builds = []
+
+    def build():
+        builds.append(1)
+        return store.tables(), {"built": len(builds)}
+
+    first = publish_if_stale(build, lambda manifest: True, directory)
+    assert publish_if_stale(build, lambda manifest: True, directory) == first
+    assert publish_if_stale(build, lambda manifest: manifest["built"] > 1, directory) != first
+    assert len(builds) == 2
+
+
+def test_appended_rows_shadow_only_their_users(store, make_transactions, make_scores):
+    updated = store.with_appended(make_transactions("user_001", 1, start=9), make_scores("user_002", [0.7], start=1))
+    assert txn_ids(updated.recent("user_001", 2)) == ["user_001-t9", "user_001-t4"]
+    # the waiting score for t9 is joined once its transaction arrives
+    assert updated.transactions("user_001").set_index("txn_id").loc["user_001-t9", "fraud_score"] == 0.95
+    assert txn_ids(updated.flagged("user_002")) == ["user_002-t1"]
+    assert updated.version_of("user_001") != store.version_of("user_001")
+    assert updated.version_of("user_003") == store.version_of("user_003")
+    # the original store never changes
+    assert txn_ids(store.recent("user_001", 1)) == ["user_001-t4"]
+    assert len(updated) == len(store) + 1
+
+
+@pytest.fixture
+def shard_logs(workdir, make_transactions, make_scores, monkeypatch):
+    monkeypatch.setattr(store_module, "SNAPSHOT_POLL_SECONDS", 0)
+    shard = Shard(0, 1)
+    txns = IngestLog(shard.txn_dir, TXN_SCHEMA, compact_after=0)
+    scores = IngestLog(shard.scores_dir, SCORE_SCHEMA, compact_after=0)
+    txns.rewrite(make_transactions("user_001", 3))
+    scores.rewrite(make_scores("user_001", [0.1, 0.2, 0.3]))
+    return shard, txns, scores
+
+
+def test_manager_tails_appends_without_a_new_snapshot(shard_logs, make_transactions, make_scores):
+    shard, txns, scores = shard_logs
+    manager = StoreManager(shard)
+    first = manager.get()
+    txns.append(make_transactions("user_001", 1, start=3))
+    scores.append(make_scores("user_001", [0.9], start=3))
+    second = manager.get()
+    assert second.version == first.version
+    assert txn_ids(second.recent("user_001", 1)) == ["user_001-t3"]
+    assert txn_ids(second.flagged("user_001")) == ["user_001-t3"]
+    assert txn_ids(first.recent("user_001", 1)) == ["user_001-t2"]
+    # another process attaches to the published base instead of building its own
+    assert StoreManager(shard).get().version == first.version
+
+
+def test_manager_republishes_when_the_overlay_is_full(shard_logs, make_transactions):
+    shard, txns, _ = shard_logs
+    # the overlay holds every row of a re-merged user: 4, then 5
+    manager = StoreManager(shard, overlay_max_rows=4)
+    first = manager.get()
+    txns.append(make_transactions("user_001", 1, start=3))
+    assert manager.get().version == first.version
+    txns.append(make_transactions("user_001", 1, start=4))
+    refreshed = manager.get()
+    assert refreshed.version > first.version
+    assert refreshed.overlay_rows == 0
+    assert txn_ids(refreshed.recent("user_001", 2)) == ["user_001-t4", "user_001-t3"]
+
+
+def test_manager_rebuilds_after_the_data_is_replaced(shard_logs, make_transactions):
+    shard, txns, _ = shard_logs
+    manager = StoreManager(shard)
+    first = manager.get()
+    txns.rewrite(make_transactions("user_002", 2))
+    refreshed = manager.get()
+    assert refreshed.version > first.version
+    assert refreshed.recent("user_001").empty
+    assert len(refreshed.recent("user_002")) == 2
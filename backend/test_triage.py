@@ -0,0 +1,69 @@
+# backend/test_triage.py
+import pytest
+
+from backend import analyzer
+from backend.risk import UserRisk
+from backend.triage import classify_by_rules
+
+
+@pytest.mark.parametrize("message, tier, expected", [
+    ("Someone stole my card", "Low", ("HIGH", 0.9)),
+    ("Someone stole my card", "Medium", ("HIGH", 0.97)),
+    ("Why is my balance so high?", "Low", ("MEDIUM", 0.88)),
+    # routine requests from a high-risk account still go to a human
+    ("Why is my balance so high?", "High", ("HIGH", 0.8)),
+    ("How do I reset my password", "Low", ("LOW", 0.95)),
+    ("How do I reset my password", "High", ("LOW", 0.5)),
+])
+def test_rules(message, tier, expected):
+    assert classify_by_rules(message, tier)[:2] == expected
+
+
+def test_rules_leave_unclear_messages_alone():
+    assert classify_by_rules("hello there", "Low") is None
+
+
+class FakeRisk:
+    def __init__(self, users):
+        self.users = users
+
+    def get(self, user_id):
+        return self.users.get(user_id)
+
+
+@pytest.fixture
+def triage(monkeypatch):
+    """local_triage with a fixed fraud table and a stub text model: triage(message, model_reply, user)."""
+    monkeypatch.setattr(analyzer, "LOCAL_CONFIDENCE_THRESHOLD", 0.85)
+    monkeypatch.setattr(analyzer, "get_risk_aggregates", lambda: FakeRisk({
+        "risky": UserRisk(count=10, score_sum=9.0, flagged_count=9, max_score=0.95),
+    }))
+
+    def run(message, model_reply=None, user_id="calm"):
+        monkeypatch.setattr(analyzer, "classify_by_model", lambda *args, **kwargs: model_reply)
+        return analyzer.local_triage(message, user_id)
+    return run
+
+
+def test_confident_rule_answers_locally(triage):
+    result = triage("I think my account was hacked")
+    assert (result["priority"], result["answered_by"]) == ("HIGH", "rules")
+
+
+def test_unsure_rule_defers_to_the_model(triage):
+    # LOW rule at 0.5 for a high-risk user is below the threshold
+    assert triage("change my address", None, "risky") is None
+    result = triage("change my address", ("MEDIUM", 0.9), "risky")
+    assert (result["priority"], result["answered_by"]) == ("MEDIUM", "local_model")
+
+
+def test_unsure_model_goes_to_the_llm(triage):
+    assert triage("hello there", ("LOW", 0.84)) is None
+    assert triage("hello there", ("LOW", 0.85))["confidence"] == 0.85
+
+
+def test_fallback_ignores_an_unsure_model(triage, monkeypatch):
+    monkeypatch.setattr(analyzer, "classify_by_model", lambda *args, **kwargs: ("HIGH", 0.6))
+    assert analyzer.fallback_response("hello there", "calm", "circuit open")["priority"] == "LOW"
+    # the user's fraud tier still sets a floor
+    assert analyzer.fallback_response("hello there", "risky", "circuit open")["priority"] == "HIGH"
@@ -0,0 +1,61 @@
+# backend/test_warmup.py
+import threading
+
+from backend.warmup import Warmup
+
+
+def fail():
+    raise RuntimeError("no model")
+
+
+def wait(warmup: Warmup):
+    warmup.start()
+    warmup._thread.join(timeout=5)
+
+
+def test_ready_once_every_required_step_is_done():
+    release = threading.Event()
+    warmup = Warmup([("store", lambda: release.wait(5), True), ("triage_model", fail, False)])
+    warmup.start()
+    assert not warmup.ready()
+    assert warmup.report()["steps"]["triage_model"]["status"] == "pending"
+    release.set()
+    wait(warmup)
+    report = warmup.report()
+    # an optional step failing does not hold readiness back
+    assert report["ready"]
+    assert report["steps"]["store"]["status"] == "done"
+    assert report["steps"]["triage_model"]["status"] == "failed"
+    assert report["steps"]["triage_model"]["error"] == "RuntimeError('no model')"
+
+
+def test_a_failed_required_step_is_never_ready():
+    calls = []
+    warmup = Warmup([("store", fail, True), ("accounts", lambda: calls.append(1), True)])
+    wait(warmup)
+    assert not warmup.ready()
+    # the later steps still run
+    assert warmup.status == {"store": "failed", "accounts": "done"}
+
+
+def test_steps_run_once():
+    calls = []
+    warmup = Warmup([("store", lambda: calls.append(1), True)])
+    warmup.start()
+    thread = warmup._thread
+    warmup.start()
+    assert warmup._thread is thread
+    wait(warmup)
+    assert calls == [1]
+
+
+def test_health_endpoints(monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend import main
+    pending = Warmup([("store", lambda: None, True)])
+    monkeypatch.setattr(main, "warmup", pending)
+    client = TestClient(main.app)
+    assert client.get("/health/live").json() == {"status": "alive"}
+    assert client.get("/health/ready").status_code == 503
+    wait(pending)
+    assert client.get("/health/ready").status_code == 200
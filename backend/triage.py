@@ -0,0 +1,105 @@
+# backend/triage.py
+"""
+Cheap local priority classification that runs before the LLM.
+
+Two tiers, both combining the message with the user's numeric fraud context:
+  1. keyword/regex rules for clear-cut intents
+  2. a small TF-IDF + logistic regression model trained on labeled messages
+Each returns (priority, confidence); the caller decides whether that is
+confident enough to skip Gemini.
+"""
+import os
+import re
+import threading
+
+import joblib
+import pandas as pd
+
+LABELED_PATH = "data/labeled_messages.csv"
+MODEL_PATH = "models/priority_classifier.joblib"
+
+HIGH_INTENT = re.compile(
+    r"\b(fraud\w*|stole[n]?|hack(ed)?|suspicious|unauthori[sz]ed|did ?n[o']?t (make|authori[sz]e)|"
+    r"never made|don'?t recogni[sz]e|someone (used|is using|changed)|lost my (card|wallet))\b"
+)
+MEDIUM_INTENT = re.compile(
+    r"\b(payment|balance|due|dispute|refund|fee|interest|charged|owe|deposit|autopay|credit limit)\b"
+)
+LOW_INTENT = re.compile(
+    r"\b(password|username|address|phone number|hours|paperless|app|routing number|alerts?|card design|dark mode)\b"
+)
+
+
+def classify_by_rules(message: str, tier: str) -> tuple[str, float, str] | None:
+    """Return (priority, confidence, matched phrase) for clear-cut messages, else None."""
+    text = message.lower()
+    if match := HIGH_INTENT.search(text):
+        return "HIGH", 0.97 if tier != "Low" else 0.9, match.group(0)
+    if match := MEDIUM_INTENT.search(text):
+        # routine requests from a high-risk account still need a human look
+        return ("HIGH", 0.8, match.group(0)) if tier == "High" else ("MEDIUM", 0.88, match.group(0))
+    if match := LOW_INTENT.search(text):
+        confidence = {"Low": 0.95, "Medium": 0.85, "High": 0.5}[tier]
+        return "LOW", confidence, match.group(0)
+    return None
+
+
+def train_classifier(labeled_path: str = LABELED_PATH, model_path: str = MODEL_PATH):
+    """Fit the text + fraud-context model on labeled messages and save it."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    df = pd.read_csv(labeled_path)
+    features = ColumnTransformer([
+        ("text", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True), "message"),
+        ("risk", StandardScaler(), ["mean_score", "flagged_pct"]),
+    ])
+    clf = Pipeline([("features", features), ("model", LogisticRegression(C=5.0, max_iter=1000))])
+    clf.fit(df[["message", "mean_score", "flagged_pct"]], df["priority"])
+
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    joblib.dump(clf, model_path)
+    return clf
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier(wait: bool = True):
+    """
+    Load the saved model, training it first if it does not exist yet. With
+    wait=False, return None instead of waiting while another thread loads it.
+    """
+    global _classifier
+    if _classifier is None:
+        if not _classifier_lock.acquire(blocking=wait):
+            return None
+        try:
+            if _classifier is None:
+                if os.path.exists(MODEL_PATH):
+                    _classifier = joblib.load(MODEL_PATH)
+                else:
+                    _classifier = train_classifier()
+        finally:
+            _classifier_lock.release()
+    return _classifier
+
+
+def classify_by_model(message: str, mean_score: float, flagged_pct: float, wait: bool = True) -> tuple[str, float] | None:
+    """Return the model's most likely priority and its probability; None if wait=False and it is still loading."""
+    clf = get_classifier(wait)
+    if clf is None:
+        return None
+    row = pd.DataFrame({"message": [message], "mean_score": [mean_score], "flagged_pct": [flagged_pct]})
+    probs = clf.predict_proba(row)[0]
+    best = probs.argmax()
+    return clf.classes_[best], float(probs[best])
+
+
+if __name__ == "__main__":
+    train_classifier()
+    print(f"Wrote {MODEL_PATH}")
@@ -0,0 +1,126 @@
+# backend/warmup.py
+"""
+Background warm-up for a new worker.
+
+The worker binds its port right away. The data stack, store, risk table
+and models then load on a daemon thread, so liveness can be answered
+immediately. Readiness follows once the required steps are done. A request
+that arrives earlier still works: it loads whatever it needs inline, behind
+the same locks.
+"""
+import threading
+import time
+
+from backend.metrics import logger
+
+
+def _import_data_stack():
+    import backend.analyzer  # noqa: F401  (pandas, pyarrow and the store)
+    import backend.data_api  # noqa: F401
+
+
+def _load_store():
+    from backend.store import load_shards
+    # attaches every shard to its published snapshot, in parallel; builds one only if it can't be caught up
+    load_shards()
+
+
+def _load_risk():
+    from backend.risk import get_risk_aggregates
+    get_risk_aggregates().refresh()
+
+
+def _load_accounts():
+    from backend.context import get_account
+    from backend.data_api import account_cache
+    account_cache.refresh()
+    get_account("")
+
+
+def _open_chats():
+    from backend.chats import get_chat_store
+    get_chat_store()
+
+
+def _open_routing():
+    from backend.routing import get_routing_queue
+    get_routing_queue()
+
+
+def _load_triage_model():
+    from backend.triage import get_classifier
+    get_classifier()
+
+
+def _load_intent_embedder():
+    from backend.intents import embed
+    embed("")
+
+
+def _load_llm():
+    from backend.llm import get_model
+    get_model()
+
+
+# (name, load, required for readiness). The optional steps only speed up
+# requests: until the triage model is loaded, local triage uses the rules
+# alone and defers the rest to the LLM.
+STEPS = [
+    ("data_stack", _import_data_stack, True),
+    ("store", _load_store, True),
+    ("risk_aggregates", _load_risk, True),
+    ("accounts", _load_accounts, True),
+    ("chats", _open_chats, True),
+    ("routing", _open_routing, True),
+    ("triage_model", _load_triage_model, False),
+    ("intent_embedder", _load_intent_embedder, False),
+    ("llm_client", _load_llm, False),
+]
+
+
+class Warmup:
+    """Runs the warm-up steps once, in order, on a daemon thread, and reports their progress."""
+
+    def __init__(self, steps=STEPS):
+        self.steps = steps
+        self.status = {name: "pending" for name, _, _ in steps}
+        self.seconds: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        for name, load, _ in self.steps:
+            self.status[name] = "loading"
+            start = time.perf_counter()
+            try:
+                load()
+            except Exception as e:
+                self.status[name] = "failed"
+                self.errors[name] = repr(e)
+                logger.warning("Warm-up step %s failed: %r", name, e)
+            else:
+                self.status[name] = "done"
+            self.seconds[name] = round(time.perf_counter() - start, 3)
+
+    def ready(self) -> bool:
+        return all(self.status[name] == "done" for name, _, required in self.steps if required)
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready(),
+            "steps": {
+                name: {"status": self.status[name], "required": required, "seconds": self.seconds.get(name)}
+                | ({"error": self.errors[name]} if name in self.errors else {})
+                for name, _, required in self.steps
+            },
+        }
+
+
+warmup = Warmup()
@@ -5,23 +5,48 @@ import pandas as pd
 import altair as alt
 import json
 import os
+import sys
 from datetime import datetime
 import random
 import time
 
+# make the repo root importable when launched via `streamlit run frontend/app.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frontend.data import DataClient
+
 # ---- Config ----
-API_URL = "http://127.0.0.1:8000/analyze"
+BACKEND_URL = "http://127.0.0.1:8000"
+API_URL = f"{BACKEND_URL}/analyze"
+TXN_PAGE_SIZE = 50
+CHAT_PAGE_SIZE = 50
+# the user picker shows one page of matches; a search narrows it
+ACCOUNT_SEARCH_LIMIT = 50
+ACCOUNT_SEARCH_TTL = 60
+STREAM_URL = f"{API_URL}/stream"
 st.set_page_config(page_title="NovaRoute - Customer Service Routing", page_icon="💬", layout="wide")
 
-# ---- Load mock user metadata & transactions from disk ----
-DATA_DIR = "data"
-ACCOUNTS_PATH = os.path.join(DATA_DIR, "accounts.json")
-TXNS_PATH = os.path.join(DATA_DIR, "transactions.json")
-
-def load_accounts():
-    if os.path.exists(ACCOUNTS_PATH):
-        with open(ACCOUNTS_PATH) as f:
-            return {acct["user_id"]: acct for acct in json.load(f)}
+# ---- Mock user metadata & transactions come from the backend's data API ----
+@st.cache_resource
+def get_data_client():
+    # one per process: its ETag cache is shared by every session (each thread gets its own HTTP session)
+    return DataClient(BACKEND_URL)
+
+@st.cache_data(ttl=ACCOUNT_SEARCH_TTL, show_spinner=False)
+def search_accounts(prefix: str) -> dict[str, dict]:
+    # one request per distinct search, shared by every session until it expires
+    return get_data_client().accounts(prefix, ACCOUNT_SEARCH_LIMIT)
+
+def load_accounts(prefix: str = ""):
+    try:
+        accounts = search_accounts(prefix)
+        if not accounts and prefix:
+            st.sidebar.info(f"No user id starts with {prefix!r}.")
+            accounts = search_accounts("")
+    except requests.RequestException as e:
+        st.sidebar.warning(f"Backend unavailable ({e.__class__.__name__}); showing demo users.")
+        accounts = {}
+    if accounts:
+        return accounts
     # fallback small built-in if no file
     return {
         "user_001": {"user_id":"user_001","name":"Alex Johnson","account_balance":2350.21,"card_status":"Active"},
@@ -29,52 +54,17 @@ def load_accounts():
         "user_003": {"user_id":"user_003","name":"Riley Chen","account_balance":7129.42,"card_status":"Active"},
     }
 
-def load_txns():
-    if os.path.exists(TXNS_PATH):
-        with open(TXNS_PATH) as f:
-            txns = json.load(f)
-            df = pd.DataFrame(txns)
-            # ensure timestamp is datetime
-            if "timestamp" in df.columns:
-                df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
-            return df
-    return pd.DataFrame(columns=[
-        "txn_id","user_id","timestamp","amount","currency","merchant","merchant_category",
-        "city","country","channel","is_foreign","is_high_amount","velocity_24h",
-        "device_fingerprint","ip_country","merchant_risk_score","label_fraud","user_reported_issue"
-    ])
-
-accounts = load_accounts()
-txns_df = load_txns()
+data_client = get_data_client()
 
 # ---------- Helpers for "Inject High Fraud" ----------
-FRAUD_CSV = "data/fraud_scores.csv"
-TXN_CSV = "data/transactions.csv"
-
-def ensure_data_paths():
-    os.makedirs("data", exist_ok=True)
-    # create empty files if missing so injection won't crash
-    if not os.path.exists(FRAUD_CSV):
-        pd.DataFrame(columns=["txn_id","user_id","fraud_score","fraud_label"]).to_csv(FRAUD_CSV, index=False)
-    if not os.path.exists(TXN_CSV):
-        pd.DataFrame(columns=[
-            "txn_id","user_id","timestamp","amount","currency","merchant","merchant_category",
-            "city","country","channel","is_foreign","is_high_amount","velocity_24h",
-            "device_fingerprint","ip_country","merchant_risk_score","label_fraud","user_reported_issue"
-        ]).to_csv(TXN_CSV, index=False)
-
 def inject_high_fraud_into_scores(user_id: str, n: int = 5, also_add_txns: bool = True):
     """
-    Append n high-fraud rows to fraud_scores.csv for user_id.
-    If also_add_txns True, add minimal transaction rows to transactions.csv too.
+    Append n high-fraud rows to the fraud_scores dataset for user_id, through the backend.
+    If also_add_txns True, add minimal transaction rows to the transactions dataset too.
     Returns DataFrame of injected rows.
     """
-    ensure_data_paths()
-
-    fraud_df = pd.read_csv(FRAUD_CSV)
-    txns_df = pd.read_csv(TXN_CSV) if os.path.exists(TXN_CSV) else pd.DataFrame()
-
     injected = []
+    txn_rows = []
     now_ts = datetime.utcnow()
     for i in range(n):
         unique_suffix = f"{int(time.time()*1000)}_{random.randint(0,9999)}"
@@ -90,7 +80,7 @@ def inject_high_fraud_into_scores(user_id: str, n: int = 5, also_add_txns: bool
         })
 
         if also_add_txns:
-            # add a minimal transaction row so transactions.csv can display it
+            # add a minimal transaction row so the transactions view can display it
             txn_row = {
                 "txn_id": txn_id,
                 "user_id": user_id,
@@ -111,47 +101,52 @@ def inject_high_fraud_into_scores(user_id: str, n: int = 5, also_add_txns: bool
                 "label_fraud": 1,
                 "user_reported_issue": True
             }
-            # append to txns_df safely
-            txns_df = pd.concat([txns_df, pd.DataFrame([txn_row])], ignore_index=True)
+            txn_rows.append(txn_row)
 
-    # append to fraud_df and save
-    fraud_df = pd.concat([fraud_df, pd.DataFrame(injected)], ignore_index=True)
-    fraud_df.to_csv(FRAUD_CSV, index=False)
-
-    if also_add_txns:
-        txns_df.to_csv(TXN_CSV, index=False)
+    # the backend appends the scores and their transactions as one batch
+    data_client.ingest(txn_rows, injected)
 
     return pd.DataFrame(injected)
 
 
+def stream_analysis(payload: dict):
+    """Yield (event, data) pairs from the backend's Server-Sent Events analyze stream."""
+    with requests.post(STREAM_URL, json=payload, stream=True, timeout=60) as res:
+        res.raise_for_status()
+        event = None
+        for line in res.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                yield event, json.loads(line[len("data: "):])
+
+
+# ---- Sidebar: user selector ----
+st.sidebar.header("👤 Select Active User")
+accounts = load_accounts(st.sidebar.text_input("Search by user id:", key="user_search").strip())
+
 # ---- Session State ----
-if "user_chats" not in st.session_state:
-    st.session_state.user_chats = {uid: [] for uid in accounts.keys()}
 if "current_user" not in st.session_state:
     st.session_state.current_user = list(accounts.keys())[0]
 
-# ---- Sidebar: user selector + save chats ----
-st.sidebar.header("👤 Select Active User")
 user_id = st.sidebar.selectbox(
     "Choose a user:",
     options=list(accounts.keys()),
     format_func=lambda uid: f"{accounts[uid]['name']} ({uid})"
 )
 st.session_state.current_user = user_id
-
-if st.sidebar.button("💾 Save Chats"):
-    os.makedirs("local_chats", exist_ok=True)
-    for uid, chats in st.session_state.user_chats.items():
-        with open(f"local_chats/{uid}.json", "w") as f:
-            json.dump(chats, f, indent=2)
-    st.sidebar.success("Chats saved locally!")
+try:
+    # full record for the active user only; the list above carries names
+    account = data_client.account(user_id) or accounts[user_id]
+except requests.RequestException:
+    account = accounts[user_id]
 
 # ---- Layout: left = chat, right = account + transactions ----
 left, right = st.columns([2, 3])
 
 # ---- Left column: Chat UI ----
 with left:
-    user = accounts[user_id]
+    user = account
     st.title("💬 NovaRoute - Smart Customer Support")
     st.caption(f"Chatting as **{user.get('name','Unknown')}**  •  Balance: **{user.get('account_balance','N/A')}**  •  Card: **{user.get('card_status','N/A')}**")
     user_message = st.text_input("Enter your message:")
@@ -159,17 +154,18 @@ with left:
         if user_message.strip():
             payload = {"user_id": user_id, "message": user_message}
             try:
-                res = requests.post(API_URL, json=payload)
-                data = res.json()
-                st.session_state.user_chats[user_id].append(
-                    {
-                        "user": user_message,
-                        "priority": data["priority"],
-                        "response": data["response"],
-                        "info": data["info"],
-                        "confidence": data["confidence"],
-                    }
-                )
+                # show the routing decision and the reply as they stream in
+                live = st.empty()
+                routing, text = "", {"response": "", "info": ""}
+                for event, chunk in stream_analysis(payload):
+                    if event == "priority":
+                        confidence = f" ({chunk['confidence']*100:.0f}% confidence)" if chunk["confidence"] is not None else ""
+                        routing = f"**Priority:** {chunk['priority']}{confidence}"
+                    elif event in text:
+                        text[event] += chunk["delta"]
+                    live.markdown(f"{routing}\n\n**Assistant:** {text['response']}")
+                # the backend stored the turn; it shows up in the history below
+                live.empty()
             except Exception as e:
                 st.error(f"Error contacting backend: {e}")
         else:
@@ -177,15 +173,22 @@ with left:
 
     st.divider()
     st.subheader(f"Conversation with {user.get('name')}")
-    chat_history = st.session_state.user_chats[user_id]
+    try:
+        chat_history, _ = data_client.chats(user_id, limit=CHAT_PAGE_SIZE)
+    except requests.RequestException as e:
+        st.warning(f"Chat history unavailable ({e.__class__.__name__}).")
+        chat_history = []
     if chat_history:
-        for msg in reversed(chat_history):
-            st.markdown(f"**You:** {msg['user']}")
-            st.markdown(f"**Priority:** {msg['priority']} ({msg['confidence']*100:.0f}% confidence)")
+        for msg in chat_history:
+            confidence = f"{msg['confidence']*100:.0f}% confidence, " if msg["confidence"] is not None else ""
+            st.markdown(f"**You:** {msg['message']}")
+            st.markdown(f"**Priority:** {msg['priority']} ({confidence}via {msg['answered_by'] or 'llm'})")
             st.markdown(f"**Assistant:** {msg['response']}")
             st.markdown(f"**Info:** {msg['info']}")
-            st.markdown(f"*{msg.get('ts','') }*")
+            st.markdown(f"*{datetime.fromtimestamp(msg['ts']):%Y-%m-%d %H:%M:%S}*")
             st.markdown("---")
+        if len(chat_history) == CHAT_PAGE_SIZE:
+            st.caption(f"Showing the latest {CHAT_PAGE_SIZE} messages.")
     else:
         st.info("No messages yet for this user.")
 
@@ -203,9 +206,7 @@ with right:  # assuming 'right' is your account column variable
                 injected_df = inject_high_fraud_into_scores(user_id, n=int(inj_n), also_add_txns=bool(also_txns))
                 st.success(f"Injected {len(injected_df)} high-fraud entries for {user_id}.")
                 st.dataframe(injected_df, width="stretch", height=200)
-                # optional: reload local dataframes in the app (so UI shows new txns immediately)
-                # reload global txns_df and accounts if you maintain them as globals
-                txns_df = load_txns()  # if you have this loader function in your file
+                # the backend picks the new batch up on the next request, so the panel below shows it
             except Exception as e:
                 st.error(f"Injection failed: {e}")
 
@@ -213,7 +214,7 @@ with right:  # assuming 'right' is your account column variable
 # ---- Right column: Account details and transaction list ----
 with right:
     st.header("Account Overview")
-    acct = accounts[user_id]
+    acct = account
 
     # pretty account panel
     cols = st.columns([2,3])
@@ -221,12 +222,12 @@ with right:
         st.metric("Account Balance", f"${acct.get('account_balance', 'N/A')}")
         st.write(f"**Status:** {acct.get('card_status','N/A')}")
 
-        fraud_path = "data/fraud_scores.csv"
-        if os.path.exists(fraud_path):
-            risk_df = pd.read_csv(fraud_path)
-            if user_id in risk_df["user_id"].values:
-                avg_score = risk_df[risk_df["user_id"] == user_id]["fraud_score"].mean()
-                st.metric("Avg Fraud Risk", f"{avg_score:.2f}")
+        try:
+            risk = data_client.risk(user_id)
+        except requests.RequestException:
+            risk = None
+        if risk is not None:
+            st.metric("Avg Fraud Risk", f"{risk['mean_score']:.2f}")
 
     with cols[1]:
         st.write(f"**Opened:** {acct.get('opened_at', 'unknown')}")
@@ -237,31 +238,35 @@ with right:
     st.divider()
     st.subheader("Recent Transactions")
 
-    # filter transactions for selected user
-    user_txns = txns_df[txns_df["user_id"] == user_id].copy()
+    # quick filters, applied by the backend
+    with st.expander("Filters"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            min_amt = st.number_input("Min amount", value=0.0, min_value=0.0, step=1.0, key="min_amt")
+        with col2:
+            only_foreign = st.checkbox("Only foreign txns", value=False, key="only_foreign")
+        with col3:
+            only_flagged = st.checkbox("Only flagged fraud", value=False, key="only_flagged")
+
+    # cursors of the pages seen so far; a new user or filter starts again from the newest page
+    view = (user_id, min_amt, only_foreign, only_flagged)
+    if st.session_state.get("txn_view") != view:
+        st.session_state.txn_view = view
+        st.session_state.txn_cursors = [None]
+    cursors = st.session_state.txn_cursors
+
+    try:
+        user_txns, next_cursor = data_client.transactions(
+            user_id, cursor=cursors[-1], limit=TXN_PAGE_SIZE,
+            min_amount=min_amt, only_foreign=only_foreign, only_flagged=only_flagged,
+        )
+    except requests.RequestException as e:
+        st.error(f"Error loading transactions: {e}")
+        user_txns, next_cursor = pd.DataFrame(), None
 
     if user_txns.empty:
         st.info("No transactions available for this user (run scripts/generate_data.py).")
     else:
-        # sort newest first
-        user_txns = user_txns.sort_values("timestamp", ascending=False)
-
-        # quick filters
-        with st.expander("Filters"):
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                min_amt = st.number_input("Min amount", value=0.0, step=1.0, key="min_amt")
-            with col2:
-                only_foreign = st.checkbox("Only foreign txns", value=False, key="only_foreign")
-            with col3:
-                show_fraud = st.checkbox("Highlight flagged fraud", value=True, key="show_fraud")
-
-            # apply filters
-            if min_amt > 0:
-                user_txns = user_txns[user_txns["amount"] >= float(min_amt)]
-            if only_foreign:
-                user_txns = user_txns[user_txns["is_foreign"] == 1]
-
         # display a compact dataframe with the most relevant columns
         display_cols = ["timestamp","txn_id","merchant","merchant_category","amount","country","channel","is_foreign","merchant_risk_score","label_fraud"]
         available_cols = [c for c in display_cols if c in user_txns.columns]
@@ -273,34 +278,37 @@ with right:
         if "amount" in df_display.columns:
             df_display["amount"] = df_display["amount"].map(lambda x: f"${x:,.2f}")
 
-        # highlight fraud rows
-        def highlight_fraud(row):
-            return ["background-color: #ffdddd" if row.get("label_fraud",0)==1 else "" for _ in row]
-
-        st.write(f"Showing {len(df_display)} transaction(s).")
+        st.write(f"Page {len(cursors)}: showing {len(df_display)} transaction(s).")
         st.dataframe(df_display, width="stretch", height=360)
 
+        nav = st.columns(2)
+        with nav[0]:
+            if st.button("◀ Newer", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with nav[1]:
+            if st.button("Older ▶", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
+
         # option to view raw JSON for a selected txn
         txn_ids = df_display["txn_id"].tolist() if "txn_id" in df_display.columns else []
         selected_txn = st.selectbox("Inspect transaction (raw)", options=["--"] + txn_ids)
         if selected_txn and selected_txn != "--":
-            raw = user_txns[user_txns["txn_id"] == selected_txn].to_dict(orient="records")
-            st.json(raw[0])
+            raw = user_txns[user_txns["txn_id"] == selected_txn].to_json(orient="records", date_format="iso")
+            st.json(json.loads(raw)[0])
 
     st.divider()
     # small analytics for the user
     st.subheader("Quick Analytics")
 
-    if ("label_fraud" in user_txns.columns) and (len(user_txns) > 0):
-        # Map 0/1 -> strings, handle NaNs, then count
-        status_df = (
-            user_txns["label_fraud"]
-            .map({0: "Not flagged", 1: "Flagged"})
-            .fillna("Unknown")
-            .astype("string")
-            .value_counts(dropna=False)
-            .rename_axis("Status")
-            .reset_index(name="Count")
+    try:
+        counts = data_client.fraud_status(user_id)
+    except requests.RequestException:
+        counts = None
+    if counts and sum(counts.values()) > 0:
+        status_df = pd.DataFrame(
+            [(status, n) for status, n in counts.items() if n], columns=["Status", "Count"]
         )
 
         # Ensure dtype clarity for Altair
@@ -322,4 +330,3 @@ with right:
         st.altair_chart(chart, width="stretch")
     else:
         st.write("No analytics available.")
-
@@ -0,0 +1,99 @@
+# frontend/data.py
+"""Client for the backend's data endpoints, kept free of Streamlit calls so it can be benchmarked."""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import requests
+
+# responses kept for conditional GETs
+ETAG_CACHE_ENTRIES = 256
+
+
+class DataClient:
+    """
+    Reads accounts, transactions and risk from the backend. Every response is
+    remembered with its ETag and revalidated with If-None-Match, so pages
+    that have not changed come back as an empty 304. One client can serve
+    many threads: the ETag cache is shared, but each thread gets its own
+    requests.Session, which is not thread-safe.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def get(self, path: str, **params):
+        """GET path as JSON, or None on 404."""
+        params = {k: v for k, v in params.items() if v is not None}
+        key = (path, tuple(sorted(params.items())))
+        with self._lock:
+            cached = self._cache.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        res = self.session.get(self.base_url + path, params=params, headers=headers, timeout=self.timeout)
+        if res.status_code == 304 and cached:
+            with self._lock:
+                self._cache.move_to_end(key)
+            return cached[1]
+        if res.status_code == 404:
+            return None
+        res.raise_for_status()
+        body = res.json()
+        if "ETag" in res.headers:
+            with self._lock:
+                self._cache[key] = (res.headers["ETag"], body)
+                self._cache.move_to_end(key)
+                while len(self._cache) > ETAG_CACHE_ENTRIES:
+                    self._cache.popitem(last=False)
+        return body
+
+    def accounts(self, prefix: str = "", limit: int = 50) -> dict[str, dict]:
+        """user_id -> {"user_id", "name"} for the first `limit` accounts whose user_id starts with prefix."""
+        page = self.get("/accounts", prefix=prefix or None, limit=limit)
+        return {acct["user_id"]: acct for acct in page["accounts"]}
+
+    def account(self, user_id: str) -> dict | None:
+        return self.get(f"/accounts/{user_id}")
+
+    def transactions(
+        self, user_id: str, cursor: str | None = None, limit: int = 50,
+        min_amount: float = 0.0, only_foreign: bool = False, only_flagged: bool = False,
+    ) -> tuple[pd.DataFrame, str | None]:
+        """One page of the user's transactions, newest first, and the cursor for the next."""
+        page = self.get(
+            f"/accounts/{user_id}/transactions", cursor=cursor, limit=limit,
+            min_amount=min_amount, only_foreign=only_foreign, only_flagged=only_flagged,
+        )
+        df = pd.DataFrame(page["rows"], columns=page["columns"])
+        if "timestamp" in df.columns:
+            df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, format="ISO8601")
+        return df, page["next_cursor"]
+
+    def fraud_status(self, user_id: str) -> dict[str, int]:
+        return self.get(f"/accounts/{user_id}/fraud-status")
+
+    def risk(self, user_id: str) -> dict | None:
+        return self.get(f"/accounts/{user_id}/risk")
+
+    def ingest(self, transactions: list[dict], scores: list[dict]) -> dict:
+        """Append transaction and fraud-score rows through the backend, as one batch."""
+        res = self.session.post(
+            self.base_url + "/ingest", json={"transactions": transactions, "scores": scores}, timeout=self.timeout,
+        )
+        res.raise_for_status()
+        return res.json()
+
+    def chats(self, user_id: str, before: int | None = None, limit: int = 50) -> tuple[list[dict], int | None]:
+        """The user's chat turns, newest first, and the id to pass as before for older ones."""
+        page = self.get(f"/chats/{user_id}", before=before, limit=limit)
+        return page["turns"], page["next_before"]
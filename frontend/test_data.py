@@ -0,0 +1,90 @@
+# frontend/test_data.py
+import threading
+
+from frontend import data
+from frontend.data import DataClient
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body=None, etag: str | None = None):
+        self.status_code = status_code
+        self.headers = {"ETag": etag} if etag else {}
+        self._body = body
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class FakeBackend:
+    """Answers like the data API: 304 when If-None-Match names the current version of the path."""
+
+    def __init__(self):
+        self.versions = {}
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        path = url.removeprefix("http://backend")
+        self.requests.append((path, params, headers))
+        if path not in self.versions:
+            return FakeResponse(404)
+        etag = f'"{path}:{self.versions[path]}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return FakeResponse(304, etag=etag)
+        return FakeResponse(200, {"path": path, "version": self.versions[path]}, etag)
+
+
+def client_with(backend: FakeBackend) -> DataClient:
+    client = DataClient("http://backend/")
+    client._local.session = backend
+    return client
+
+
+def test_unchanged_responses_are_revalidated_not_refetched():
+    backend = FakeBackend()
+    backend.versions["/accounts/user_001"] = 1
+    client = client_with(backend)
+    first = client.account("user_001")
+    assert client.account("user_001") is first
+    assert backend.requests[1][2] == {"If-None-Match": '"/accounts/user_001:1"'}
+    backend.versions["/accounts/user_001"] = 2
+    assert client.account("user_001")["version"] == 2
+
+
+def test_params_are_part_of_the_cache_key_and_none_is_dropped():
+    backend = FakeBackend()
+    backend.versions["/accounts/user_001/transactions"] = 1
+    client = client_with(backend)
+    client.get("/accounts/user_001/transactions", cursor=None, limit=10)
+    client.get("/accounts/user_001/transactions", cursor="abc", limit=10)
+    assert backend.requests[0][1] == {"limit": 10}
+    assert backend.requests[1][2] == {}
+
+
+def test_missing_resources_are_none():
+    assert client_with(FakeBackend()).risk("user_404") is None
+
+
+def test_the_etag_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(data, "ETAG_CACHE_ENTRIES", 2)
+    backend = FakeBackend()
+    client = client_with(backend)
+    for user_id in ("user_001", "user_002", "user_003"):
+        backend.versions[f"/accounts/{user_id}"] = 1
+        client.account(user_id)
+    assert [key[0] for key in client._cache] == ["/accounts/user_002", "/accounts/user_003"]
+    client.account("user_001")
+    assert backend.requests[-1][2] == {}
+
+
+def test_each_thread_gets_its_own_session():
+    client = DataClient("http://backend")
+    sessions = [client.session]
+    thread = threading.Thread(target=lambda: sessions.append(client.session))
+    thread.start()
+    thread.join()
+    assert sessions[0] is client.session
+    assert sessions[1] is not sessions[0]
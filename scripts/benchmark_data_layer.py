@@ -0,0 +1,223 @@
+# scripts/benchmark_data_layer.py
+"""
+Microbenchmarks for the data-access and context-building layer.
+
+Every scale ("<users>x<txns per user>") gets a synthetic dataset in a scratch
+directory, built with the vectorized generator plus drawn fraud scores, and is
+measured in a fresh process so load time and peak memory belong to that scale
+alone. Results are written as JSON; pass an earlier file as --baseline to flag
+regressions (exit status 1 if any).
+
+    python -m scripts.benchmark_data_layer --scales 5x1000 10000x100 1000000x10
+    python -m scripts.benchmark_data_layer --scales 5x1000 --baseline benchmarks/data_layer-<stamp>.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCALES = ["5x1000", "10000x100", "1000000x10"]
+MESSAGE = "I see a charge I don't recognize, can you check my account?"
+# ratio of new to baseline latency that counts as a regression, and a floor
+# below which differences are treated as timer noise
+DEFAULT_THRESHOLD = 1.2
+NOISE_FLOOR_MS = 0.25
+
+
+def parse_scale(spec: str) -> tuple[int, int]:
+    users, _, per_user = spec.partition("x")
+    return int(users), int(per_user)
+
+
+def prepare(spec: str, seed: int):
+    """Write the dataset for spec into the current directory."""
+    import pandas as pd
+
+    from backend.ingest import scores_log, transactions_log
+    from scripts.generate_data import generate_at_scale
+
+    users, per_user = parse_scale(spec)
+    generate_at_scale(users, per_user, seed=seed)
+
+    # scores that agree with the generator's ground truth most of the time
+    txns = transactions_log.read(columns=["txn_id", "user_id", "label_fraud"])
+    rng = np.random.default_rng(seed)
+    fraud = txns["label_fraud"].to_numpy() == 1
+    score = np.where(fraud, rng.beta(8, 2, len(txns)), rng.beta(2, 8, len(txns))).round(6)
+    scores_log.rewrite(pd.DataFrame({
+        "txn_id": txns["txn_id"], "user_id": txns["user_id"],
+        "fraud_score": score, "fraud_label": (score > 0.5).astype(np.int8),
+    }))
+
+
+def _summarize(samples_s: list[float]) -> dict:
+    ms = np.array(samples_s) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def measure(spec: str, iterations: int, seed: int) -> dict:
+    """Time every operation against the dataset in the current directory."""
+    from backend.analyzer import build_prompt, get_fraud_transactions_for_user, get_user_risk_summary
+    from backend.columnar import read_accounts
+    from backend.data_api import transactions_page
+    from backend.risk import get_risk_aggregates
+    from backend.store import get_store
+    from scripts.get_recent_transactions import get_recent_transactions_with_scores
+
+    users, per_user = parse_scale(spec)
+    result = {"users": users, "transactions": users * per_user, "load_s": {}, "ops": {}}
+
+    # one-off loads, in the order the backend hits them
+    _, result["load_s"]["store"] = _timed(get_store)
+    _, result["load_s"]["risk_aggregates"] = _timed(lambda: get_risk_aggregates().refresh())
+    user_ids = read_accounts(columns=["user_id"])["user_id"].tolist()
+
+    ops = {
+        "get_user_risk_summary": get_user_risk_summary,
+        "get_fraud_transactions_for_user": get_fraud_transactions_for_user,
+        "get_recent_transactions_with_scores": lambda u: get_recent_transactions_with_scores(u, n=10),
+        "build_prompt": lambda u: build_prompt(MESSAGE, u),
+        "transactions_page": lambda u: transactions_page(u, min_amount=100.0),
+    }
+    sample = np.random.default_rng(seed).choice(user_ids, iterations)
+    # the functions print their frames; that cost is part of what they do
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, op in ops.items():
+            for user_id in sample[:3]:
+                op(user_id)  # warm up
+            samples = [_timed(lambda: op(user_id))[1] for user_id in sample]
+            tracemalloc.start()
+            for user_id in sample[:5]:
+                op(user_id)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["ops"][name] = {**_summarize(samples), "peak_alloc_kb": round(peak / 1024, 1)}
+
+    result["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def run_scale(spec: str, iterations: int, seed: int) -> dict:
+    """Build and measure spec in a scratch directory, each step in its own process."""
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT, "NOVAROUTE_LLM": "stub"}
+    with tempfile.TemporaryDirectory(prefix="novaroute-bench-") as workdir:
+        base = [sys.executable, "-m", "scripts.benchmark_data_layer", "--scales", spec, "--seed", str(seed)]
+        subprocess.run(base + ["--prepare"], cwd=workdir, env=env, check=True)
+        out = os.path.join(workdir, "result.json")
+        subprocess.run(
+            base + ["--measure", "--iterations", str(iterations), "--output", out], cwd=workdir, env=env, check=True
+        )
+        with open(out) as f:
+            return json.load(f)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Human-readable lines for every metric that got slower than threshold allows."""
+    regressions = []
+    for spec, scale in current["scales"].items():
+        old = baseline["scales"].get(spec)
+        if old is None:
+            continue
+        metrics = [
+            (f"load {name}", value * 1000, old["load_s"].get(name, 0) * 1000)
+            for name, value in scale["load_s"].items()
+        ]
+        for name, stats in scale["ops"].items():
+            if name in old["ops"]:
+                metrics += [(f"{name} {key}", stats[key], old["ops"][name][key]) for key in ("p50_ms", "p95_ms")]
+        for label, new, before in metrics:
+            if before and new - before > NOISE_FLOOR_MS and new / before > threshold:
+                regressions.append(f"{spec} {label}: {before:.3f} -> {new:.3f} ms ({new / before:.2f}x)")
+    return regressions
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, help="<users>x<txns per user> ...")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per operation, on random users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default: benchmarks/data_layer-<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # internal steps, run by run_scale() inside the scratch directory
+    if args.prepare:
+        prepare(args.scales[0], args.seed)
+        return
+    if args.measure:
+        with open(args.output, "w") as f:
+            json.dump(measure(args.scales[0], args.iterations, args.seed), f)
+        return
+
+    now = datetime.now(timezone.utc)
+    report = {
+        "created": now.isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "scales": {},
+    }
+    for spec in args.scales:
+        print(f"== {spec}", flush=True)
+        scale = report["scales"][spec] = run_scale(spec, args.iterations, args.seed)
+        loads = "  ".join(f"{name} {seconds:.2f}s" for name, seconds in scale["load_s"].items())
+        print(f"   load: {loads}  max rss {scale['max_rss_mb']} MB")
+        for name, stats in scale["ops"].items():
+            print(f"   {name:38s} p50 {stats['p50_ms']:9.3f}  p95 {stats['p95_ms']:9.3f}  "
+                  f"p99 {stats['p99_ms']:9.3f} ms  peak {stats['peak_alloc_kb']:9.1f} KB")
+
+    output = args.output or os.path.join("benchmarks", f"data_layer-{now:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold}x against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# scripts/convert_to_columnar.py
+"""
+Convert legacy text data (transactions.csv/.json, fraud_scores.csv,
+accounts.json/.csv) into the columnar Parquet layout in backend/columnar.py.
+
+    python -m scripts.convert_to_columnar --src data
+"""
+import argparse
+import os
+
+import pandas as pd
+
+from backend.columnar import ACCOUNTS_PATH, write_accounts
+from backend.ingest import scores_log, transactions_log
+
+
+def _read_first(src: str, names: list[str], **csv_kwargs) -> pd.DataFrame | None:
+    for name in names:
+        path = os.path.join(src, name)
+        if not os.path.exists(path):
+            continue
+        if name.endswith(".json"):
+            return pd.read_json(path, dtype=False)
+        return pd.read_csv(path, **csv_kwargs)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src", default="data", help="directory holding the legacy text files")
+    args = parser.parse_args()
+
+    txns = _read_first(args.src, ["transactions.csv", "transactions.json"], keep_default_na=False)
+    if txns is not None:
+        transactions_log.rewrite(txns)
+        print(f"Wrote {len(txns)} transactions to {len(transactions_log.logs)} shard(s)")
+
+    scores = _read_first(args.src, ["fraud_scores.csv"])
+    if scores is not None:
+        scores_log.rewrite(scores)
+        print(f"Wrote {len(scores)} fraud scores to {len(scores_log.logs)} shard(s)")
+
+    accounts = _read_first(args.src, ["accounts.json", "accounts.csv"])
+    if accounts is not None:
+        write_accounts(accounts)
+        print(f"Wrote {len(accounts)} accounts to {ACCOUNTS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# scripts/fault_drill.py
+"""
+Run analyze requests against the local stub model while it injects faults,
+and report what the resilience layer made of them: latency percentiles,
+who answered, retries, hedges and circuit-breaker trips.
+
+    python -m scripts.fault_drill --requests 300 --error-rate 0.1 --malformed-rate 0.05 --slow-rate 0.05
+    python -m scripts.fault_drill --requests 300 --outage   # the middle third fails outright
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+USERS = ["user_001", "user_002", "user_003", "user_004", "user_005"]
+MESSAGES = [
+    "Someone used my card for a purchase I didn't make",
+    "When is my payment due?",
+    "How do I change my password?",
+    "Can you tell me more about my account?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean stub model latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-factor", type=float, default=20.0)
+    parser.add_argument("--deadline", type=float, default=2.0, help="seconds per request")
+    parser.add_argument("--outage", action="store_true", help="fail every call during the middle third")
+    args = parser.parse_args()
+
+    # must be set before backend.llm is imported
+    os.environ.update({
+        "NOVAROUTE_LLM": "stub",
+        "NOVAROUTE_STUB_LATENCY": str(args.latency),
+        "NOVAROUTE_STUB_ERROR_RATE": str(args.error_rate),
+        "NOVAROUTE_STUB_MALFORMED_RATE": str(args.malformed_rate),
+        "NOVAROUTE_STUB_SLOW_RATE": str(args.slow_rate),
+        "NOVAROUTE_STUB_SLOW_FACTOR": str(args.slow_factor),
+        "NOVAROUTE_LLM_DEADLINE": str(args.deadline),
+        "NOVAROUTE_BREAKER_COOLDOWN": "1",
+        # every message goes to the model, and none is answered from the cache
+        "NOVAROUTE_LOCAL_CONFIDENCE": "2",
+        "NOVAROUTE_CACHE_SIZE": "0",
+        "NOVAROUTE_INTENT_CACHE_SIZE": "0",
+    })
+    from backend import llm, resilience
+    from backend.analyzer import analyze_message_async
+
+    model = llm.get_model()
+    results = []
+
+    async def one(i: int, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            if args.outage:
+                third = args.requests // 3
+                model.error_rate = 1.0 if third <= i < 2 * third else args.error_rate
+            start = time.perf_counter()
+            result = await analyze_message_async(f"{MESSAGES[i % len(MESSAGES)]} (#{i})", USERS[i % len(USERS)])
+            results.append((time.perf_counter() - start, result))
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(args.concurrency)
+        await asyncio.gather(*(one(i, semaphore) for i in range(args.requests)))
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+
+    latency_ms = np.array([seconds for seconds, _ in results]) * 1000
+    fallbacks = [result for _, result in results if result["answered_by"] == "fallback"]
+    report = {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 2),
+        "latency_ms": {f"p{q}": round(float(np.percentile(latency_ms, q)), 1) for q in (50, 95, 99)}
+        | {"max": round(float(latency_ms.max()), 1)},
+        "answered_by": dict(Counter(result["answered_by"] for _, result in results)),
+        "fallback_priorities": dict(Counter(result["priority"] for result in fallbacks)),
+        "retries": int(llm.retries.value()),
+        "hedges": int(llm.hedges.value()),
+        "breaker_trips": int(resilience.breaker_trips.value()),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
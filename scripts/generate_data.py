@@ -1,7 +1,25 @@
 # scripts/generate_data.py
-import random, json, os, uuid
+# run from the repo root:
+#   python -m scripts.generate_data                                  # small demo dataset
+#   python -m scripts.generate_data --users 200000 --tx-per-user 500  # vectorized, for scale tests
+import argparse
+import os
+import random
+import string
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from faker import Faker
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+from backend.columnar import (
+    ACCOUNT_SCHEMA, ACCOUNTS_PATH, ROW_GROUP_ROWS, TXN_SCHEMA, parquet_writer, to_table, write_accounts,
+)
+from backend.ingest import transactions_log
 
 fake = Faker()
 FRAUD_RATE = 0.02  # baseline fraud proportion (adjustable)
@@ -128,21 +146,183 @@ def simulate_users(n_users=3, tx_per_user=800):
         all_txns.extend(txns)
     return accounts, all_txns
 
+
+# --- vectorized generator -------------------------------------------------
+# Same columns and distributions as simulate_users(), drawn with NumPy a chunk
+# of accounts at a time. Chunk k always uses seed (seed, k), so the output does
+# not depend on the number of workers; chunks are streamed to the base file in
+# order as they finish, so memory stays bounded whatever the total size.
+
+CATEGORIES = list(US_MERCHANTS)
+CATEGORY_WEIGHTS = np.array([30, 10, 5, 20, 3, 32]) / 100
+MERCHANTS = [m for c in CATEGORIES for m in US_MERCHANTS[c]]
+MERCHANT_COUNT = np.array([len(US_MERCHANTS[c]) for c in CATEGORIES])
+MERCHANT_OFFSET = np.cumsum(MERCHANT_COUNT) - MERCHANT_COUNT
+CATEGORY_RISK = np.array([merchant_risk[c] for c in CATEGORIES])
+CHANNELS = ["POS", "online", "atm"]
+COUNTRIES = ["US", "JP", "RU", "CN", "NG"]  # home, foreign, then the risky IP countries
+LOGIN_COUNTRIES = ["US", "CA", "GB"]
+LETTERS = np.array(list(string.ascii_letters))
+POOL_SIZE = 5000
+MINUTE_US = 60 * 1_000_000
+
+_pools = None
+
+
+def make_pools(seed, size=POOL_SIZE):
+    """Names and cities drawn from Faker once, so per-row generation never calls it."""
+    f = Faker()
+    f.seed_instance(seed)
+    return np.array([f.name() for _ in range(size)]), [f.city() for _ in range(size)]
+
+
+def _init_worker(pools):
+    global _pools
+    _pools = pools
+
+
+def _dict_array(indices, values):
+    return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(values, pa.string()))
+
+
+def generate_chunk(chunk, n_users, tx_per_user, accounts_per_chunk, seed, now_us):
+    """Accounts of one chunk and their transactions, as (accounts table, transactions table in base order)."""
+    rng = np.random.default_rng([seed, chunk])
+    names, cities = _pools
+    first = chunk * accounts_per_chunk
+    n_accts = min(accounts_per_chunk, n_users - first)
+    width = max(3, len(str(n_users)))
+    uids = [f"user_{k + 1:0{width}d}" for k in range(first, first + n_accts)]
+
+    avg = rng.uniform(300, 2000, n_accts).round(2)
+    devices = ["dev_" + "".join(chars) for chars in LETTERS[rng.integers(0, len(LETTERS), (n_accts, 3))]]
+    priority = np.array(["LOW", "MEDIUM", "HIGH"])[rng.integers(0, 3, n_accts)]
+    priority[rng.random(n_accts) < 0.12] = "HIGH"  # user exaggerates
+    accounts = pd.DataFrame({
+        "user_id": uids,
+        "name": names[rng.integers(0, len(names), n_accts)],
+        "account_type": np.array(["checking", "savings"])[rng.integers(0, 2, n_accts)],
+        "opened_at": pd.Timestamp.now().normalize() - pd.to_timedelta(rng.integers(365, 6 * 365, n_accts), unit="D"),
+        "account_balance": rng.uniform(0, 10000, n_accts).round(2),
+        "avg_monthly_spend": avg,
+        "std_monthly_spend": (avg * rng.uniform(0.2, 0.8, n_accts)).round(2),
+        "card_status": np.array(["Active", "Frozen"])[rng.integers(0, 2, n_accts)],
+        "reported_priority": priority,
+        "true_risk_flag": np.zeros(n_accts, dtype=np.int8),
+        "chargeback_history": rng.integers(0, 3, n_accts),
+        "last_login_ip_country": np.array(LOGIN_COUNTRIES)[rng.integers(0, 3, n_accts)],
+        "device_fingerprint": devices,
+    })
+
+    n = n_accts * tx_per_user
+    acct = np.repeat(np.arange(n_accts), tx_per_user)
+    pos = np.tile(np.arange(tx_per_user), n_accts)
+    ts = now_us - rng.integers(0, 60 * 24 * 90, n, endpoint=True) * MINUTE_US  # last 90 days
+    cat = rng.choice(len(CATEGORIES), n, p=CATEGORY_WEIGHTS)
+    merchant = MERCHANT_OFFSET[cat] + (rng.random(n) * MERCHANT_COUNT[cat]).astype(np.int64)
+    # amount distribution: small purchases common, occasional large ones
+    amount = np.where(rng.random(n) < 0.95, rng.exponential(20, n), rng.uniform(200, 5000, n)).round(2)
+    is_foreign = (rng.random(n) < 0.03).astype(np.int8)
+    country = is_foreign.astype(np.int32)
+    ip_country = country.copy()
+    m_risk = (CATEGORY_RISK[cat] + rng.uniform(-0.02, 0.05, n)).round(2)
+    is_high_amount = (amount > avg[acct] * 2.5).astype(np.int8)
+    label = (rng.random(n) < FRAUD_RATE).astype(np.int8)
+    true_risk = np.zeros(n_accts, dtype=np.int8)
+
+    # pattern 1: one large foreign txn from a risky IP country
+    burst = np.flatnonzero(rng.random(n_accts) < 0.2)
+    rows = burst * tx_per_user + rng.integers(0, tx_per_user, len(burst))
+    amount[rows] = rng.uniform(1500, 5000, len(rows)).round(2)
+    is_foreign[rows] = 1
+    ip_country[rows] = rng.integers(2, len(COUNTRIES), len(rows))
+    m_risk[rows] = 0.95
+    label[rows] = 1
+    true_risk[burst] = 1
+    # pattern 2: many small rapid txns (card test)
+    if tx_per_user >= 20:
+        tested = np.flatnonzero(rng.random(n_accts) < 0.15)
+        offsets = rng.integers(0, tx_per_user - 20, len(tested), endpoint=True)[:, None] + np.arange(8)
+        rows = (tested[:, None] * tx_per_user + offsets).ravel()
+        amount[rows] = rng.uniform(0.5, 5.0, len(rows)).round(2)
+        ts[rows] = now_us - offsets.ravel() * MINUTE_US
+        label[rows] = 1
+        true_risk[tested] = 1
+
+    accounts["true_risk_flag"] = true_risk
+
+    seq_width = max(5, len(str(tx_per_user - 1)))
+    txn_id = pc.binary_join_element_wise(
+        pa.array([f"t_{u}_" for u in uids]).take(acct),
+        pa.array([f"{i:0{seq_width}d}" for i in range(tx_per_user)]).take(pos),
+        "",
+    )
+    txns = pa.Table.from_arrays([
+        txn_id,
+        _dict_array(acct, uids),
+        pa.array(ts, pa.timestamp("us", tz="UTC")),
+        pa.array(amount),
+        _dict_array(np.zeros(n), ["USD"]),
+        _dict_array(merchant, MERCHANTS),
+        _dict_array(cat, CATEGORIES),
+        _dict_array(rng.integers(0, len(cities), n), cities),
+        _dict_array(country, COUNTRIES),
+        _dict_array(rng.integers(0, len(CHANNELS), n), CHANNELS),
+        pa.array(is_foreign),
+        pa.array(is_high_amount),
+        pa.array(rng.integers(1, 6, n, endpoint=True).astype(np.int16)),
+        _dict_array(acct, devices),
+        _dict_array(ip_country, COUNTRIES),
+        pa.array(m_risk),
+        pa.array(label),
+        pa.array(np.zeros(n, dtype=bool)),
+    ], schema=TXN_SCHEMA)
+    # base order: users ascending (the zero padding keeps ids in index order), newest first
+    txns = txns.take(np.lexsort((-ts, acct)))
+    return to_table(accounts, ACCOUNT_SCHEMA), txns
+
+
+def generate_at_scale(n_users, tx_per_user, workers=None, seed=0):
+    """Stream n_users accounts and n_users * tx_per_user transactions to disk using a process pool."""
+    accounts_per_chunk = max(1, ROW_GROUP_ROWS // tx_per_user)
+    n_chunks = -(-n_users // accounts_per_chunk)
+    now_us = int(datetime.now(timezone.utc).timestamp()) * 1_000_000
+    window = 2 * (workers or os.cpu_count() or 1)
+
+    def chunks():
+        # keep a bounded window of chunks in flight and hand them back in order
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(make_pools(seed),)) as pool:
+            pending = deque()
+            for chunk in range(n_chunks):
+                pending.append(pool.submit(
+                    generate_chunk, chunk, n_users, tx_per_user, accounts_per_chunk, seed, now_us
+                ))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    with parquet_writer(ACCOUNTS_PATH, ACCOUNT_SCHEMA) as accounts_writer:
+        def txn_tables():
+            for accounts, txns in chunks():
+                accounts_writer.write_table(accounts)
+                yield txns
+
+        transactions_log.rewrite_stream(txn_tables())
+
+
 if __name__ == "__main__":
-    os.makedirs("data", exist_ok=True)
-    accounts, txns = simulate_users(n_users=5, tx_per_user=1000)
-    with open("data/accounts.json","w") as f:
-        json.dump(accounts, f, indent=2)
-    with open("data/transactions.json","w") as f:
-        json.dump(txns, f, indent=2)
-    # also write CSVs for ML convenience
-    import csv
-    with open("data/transactions.csv","w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=list(txns[0].keys()))
-        writer.writeheader()
-        writer.writerows(txns)
-    with open("data/accounts.csv","w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=list(accounts[0].keys()))
-        writer.writeheader()
-        writer.writerows(accounts)
-    print("Wrote data/accounts.json, data/transactions.json, data/transactions.csv")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, help="generate this many accounts with the vectorized generator")
+    parser.add_argument("--tx-per-user", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.users:
+        generate_at_scale(args.users, args.tx_per_user, args.workers, args.seed)
+    else:
+        accounts, txns = simulate_users(n_users=5, tx_per_user=1000)
+        write_accounts(pd.DataFrame(accounts))
+        transactions_log.rewrite(pd.DataFrame(txns))
+    print(f"Wrote {ACCOUNTS_PATH} and transactions to {len(transactions_log.logs)} shard(s)")
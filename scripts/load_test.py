@@ -0,0 +1,219 @@
+# scripts/load_test.py
+"""
+End-to-end load test for /analyze. Starts the mock LLM server and uvicorn
+running backend.main:app against it (NOVAROUTE_LLM=http), replays a
+user/message mix at a fixed concurrency (closed loop) or arrival rate (open
+loop), and reports throughput, latency percentiles and how often the default
+fallback response came back.
+
+    python -m scripts.load_test --concurrency 64 --requests 2000 --latency-ms 800 --malformed-rate 0.05
+    python -m scripts.load_test --rps 100 --duration 60 --workers 4 --error-rate 0.02 --no-cache
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+from backend.columnar import read_accounts
+from backend.triage import LABELED_PATH
+from scripts.mock_llm_server import LATENCY_DISTRIBUTIONS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_mix(n: int, seed: int = 0, replay: str | None = None) -> list[tuple[str, str]]:
+    """n (user_id, message) pairs: replayed from a user_id,message CSV, or drawn from the labeled messages."""
+    if replay:
+        df = pd.read_csv(replay)
+        pairs = list(zip(df["user_id"], df["message"]))
+        return [pairs[i % len(pairs)] for i in range(n)]
+    rng = random.Random(seed)
+    users = read_accounts(columns=["user_id"])["user_id"].tolist() or ["user_001"]
+    messages = pd.read_csv(LABELED_PATH)["message"].tolist()
+    # a few users account for most conversations
+    weights = [1 / (rank + 1) for rank in range(len(users))]
+    return list(zip(rng.choices(users, weights, k=n), rng.choices(messages, k=n)))
+
+
+_local = threading.local()
+
+
+def send(url: str, user_id: str, message: str, timeout: float, scheduled: float | None = None) -> dict:
+    """POST one message; latency counts from scheduled (open loop) so queueing in the client is included."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        response = session.post(url, json={"user_id": user_id, "message": message}, timeout=timeout)
+        status = response.status_code
+        answered_by = response.json().get("answered_by") if status == 200 else None
+    except (requests.RequestException, ValueError):
+        status, answered_by = "error", None
+    return {"latency": time.perf_counter() - start, "status": status, "answered_by": answered_by}
+
+
+def run_closed_loop(url, mix, concurrency, duration, timeout) -> list[dict]:
+    """concurrency clients, each sending its next message as soon as the last one is answered."""
+    items = iter(mix if duration is None else itertools.cycle(mix))
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def client():
+        results = []
+        while deadline is None or time.perf_counter() < deadline:
+            with lock:
+                item = next(items, None)
+            if item is None:
+                break
+            results.append(send(url, *item, timeout))
+        return results
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        futures = [pool.submit(client) for _ in range(concurrency)]
+        return [r for f in futures for r in f.result()]
+
+
+def run_open_loop(url, mix, rps, duration, timeout, max_inflight) -> list[dict]:
+    """Send at a steady rps regardless of how fast answers come back."""
+    count = len(mix) if duration is None else int(rps * duration)
+    with ThreadPoolExecutor(max_inflight) as pool:
+        futures = []
+        start = time.perf_counter()
+        for i in range(count):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(send, url, *mix[i % len(mix)], timeout, scheduled))
+        return [f.result() for f in futures]
+
+
+def summarize(results: list[dict], elapsed: float) -> dict:
+    ok = [r for r in results if r["status"] == 200]
+    latency_ms = np.array([r["latency"] for r in ok]) * 1000
+    answered_by = Counter(r["answered_by"] for r in ok)
+    return {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "status": dict(Counter(str(r["status"]) for r in results)),
+        "latency_ms": {
+            key: round(float(np.percentile(latency_ms, q)), 1) if len(ok) else None
+            for key, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "answered_by": dict(answered_by),
+        "fallback_rate": round(answered_by["fallback"] / len(ok), 4) if ok else None,
+    }
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, name: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"{name} exited with status {proc.returncode} during startup")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    sys.exit(f"{name} did not come up within {timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=32, help="closed loop: clients sending back to back")
+    load.add_argument("--rps", type=float, help="open loop: target arrival rate")
+    parser.add_argument("--requests", type=int, default=1000, help="messages to send (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="open loop: client connection cap")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--replay", help="CSV with user_id,message columns to replay in order")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the report as JSON here")
+
+    backend = parser.add_argument_group("backend")
+    backend.add_argument("--backend-url", help="test an already running backend instead of starting one")
+    backend.add_argument("--port", type=int, default=8800)
+    backend.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    backend.add_argument("--llm-concurrency", type=int, help="NOVAROUTE_LLM_CONCURRENCY for the backend")
+    backend.add_argument("--no-cache", action="store_true", help="disable the response and intent caches")
+    backend.add_argument("--no-local-triage", action="store_true", help="send every message to the LLM")
+
+    mock = parser.add_argument_group("mock LLM")
+    mock.add_argument("--mock-port", type=int, default=8900)
+    mock.add_argument("--latency-ms", type=float, default=500)
+    mock.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="uniform")
+    mock.add_argument("--sigma", type=float, default=0.5)
+    for name in ("error", "malformed", "prose", "no-json"):
+        mock.add_argument(f"--{name}-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    procs = []
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    try:
+        if args.backend_url:
+            base_url = args.backend_url.rstrip("/")
+        else:
+            procs.append(subprocess.Popen([
+                sys.executable, "-m", "scripts.mock_llm_server", "--port", str(args.mock_port),
+                "--latency-ms", str(args.latency_ms), "--latency-dist", args.latency_dist, "--sigma", str(args.sigma),
+                "--error-rate", str(args.error_rate), "--malformed-rate", str(args.malformed_rate),
+                "--prose-rate", str(args.prose_rate), "--no-json-rate", str(args.no_json_rate),
+            ], cwd=REPO_ROOT))
+            _wait_ready(f"{mock_url}/stats", procs[-1], "mock LLM server")
+
+            env = {**os.environ, "NOVAROUTE_LLM": "http", "NOVAROUTE_LLM_URL": f"{mock_url}/generate"}
+            if args.llm_concurrency:
+                env["NOVAROUTE_LLM_CONCURRENCY"] = str(args.llm_concurrency)
+            if args.no_cache:
+                env["NOVAROUTE_CACHE_SIZE"] = "0"
+                env["NOVAROUTE_INTENT_CACHE_SIZE"] = "0"
+            if args.no_local_triage:
+                env["NOVAROUTE_LOCAL_CONFIDENCE"] = "1.01"  # nothing is ever that sure
+            base_url = f"http://127.0.0.1:{args.port}"
+            # the backend prints debug frames on every request; keep them out of the report
+            procs.append(subprocess.Popen([
+                sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(args.port),
+                "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+            ], cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL))
+            _wait_ready(f"{base_url}/", procs[-1], "backend")
+
+        mix = build_mix(args.requests, args.seed, args.replay)
+        url = f"{base_url}/analyze"
+        mode = f"{args.rps} rps" if args.rps else f"concurrency {args.concurrency}"
+        what = f"for {args.duration:.0f}s" if args.duration else f"{len(mix)} requests"
+        print(f"Sending {what} at {mode} to {url}")
+        start = time.perf_counter()
+        if args.rps:
+            results = run_open_loop(url, mix, args.rps, args.duration, args.timeout, args.max_inflight)
+        else:
+            results = run_closed_loop(url, mix, args.concurrency, args.duration, args.timeout)
+        report = {"mode": mode, **summarize(results, time.perf_counter() - start)}
+        if not args.backend_url:
+            report["mock_llm"] = requests.get(f"{mock_url}/stats", timeout=5).json()
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# scripts/measure_analyze_throughput.py
+"""
+Compare blocking vs async analyze throughput against the local stub model.
+
+    python -m scripts.measure_analyze_throughput --requests 200 --latency 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+
+USERS = ["user_001", "user_002", "user_003", "user_004", "user_005"]
+MESSAGES = [
+    "Someone used my card for a purchase I didn't make",
+    "When is my payment due?",
+    "How do I change my password?",
+    "What's my current balance?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean stub model latency in seconds")
+    parser.add_argument("--sync-requests", type=int, default=10, help="requests to time on the blocking path")
+    args = parser.parse_args()
+
+    # must be set before backend.llm is imported
+    os.environ["NOVAROUTE_LLM"] = "stub"
+    os.environ["NOVAROUTE_STUB_LATENCY"] = str(args.latency)
+    from backend.analyzer import analyze_message_async, analyze_message_with_gemini
+    from backend.llm import llm_queue
+
+    jobs = [(MESSAGES[i % len(MESSAGES)], USERS[i % len(USERS)]) for i in range(args.requests)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # warm the data store so both runs measure steady state
+        analyze_message_with_gemini(*jobs[0])
+
+        start = time.perf_counter()
+        for message, user_id in jobs[:args.sync_requests]:
+            analyze_message_with_gemini(message, user_id)
+        sync_rps = args.sync_requests / (time.perf_counter() - start)
+
+        async def run_all():
+            return await asyncio.gather(*(analyze_message_async(m, u) for m, u in jobs))
+
+        start = time.perf_counter()
+        asyncio.run(run_all())
+        async_elapsed = time.perf_counter() - start
+
+    print(f"blocking: {sync_rps:8.1f} req/s  ({args.sync_requests} requests, one at a time)")
+    print(f"async:    {args.requests / async_elapsed:8.1f} req/s  "
+          f"({args.requests} requests, concurrency limit {llm_queue.max_concurrency})")
+
+
+if __name__ == "__main__":
+    main()
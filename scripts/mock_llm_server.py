@@ -0,0 +1,128 @@
+# scripts/mock_llm_server.py
+"""
+Local stand-in for the LLM, served over HTTP for load tests (the backend's
+NOVAROUTE_LLM=http client talks to it). Answers like the stub model after a
+latency drawn from the chosen distribution, and can be told to fail a share
+of requests with server errors, malformed JSON, JSON wrapped in prose, or
+prose with no JSON at all, to exercise reply validation and retries. Requests
+with "stream": true get the text as a chunked body, first chunk early.
+
+    python -m scripts.mock_llm_server --port 8900 --latency-ms 800 --latency-dist lognormal \\
+        --error-rate 0.02 --malformed-rate 0.05
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from backend.llm import STREAM_CHUNK_CHARS, STUB_FIRST_CHUNK, StubModel
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    stream: bool = False
+
+
+def sample_latency(dist: str, mean_s: float, sigma: float = 0.5) -> float:
+    """One latency in seconds; every distribution has the given mean (lognormal: median)."""
+    if dist == "fixed":
+        return mean_s
+    if dist == "uniform":
+        return random.uniform(0.5, 1.5) * mean_s
+    if dist == "exponential":
+        return random.expovariate(1 / mean_s) if mean_s > 0 else 0.0
+    return random.lognormvariate(0, sigma) * mean_s
+
+
+def create_app(
+    latency_s: float = 0.5,
+    latency_dist: str = "uniform",
+    sigma: float = 0.5,
+    error_rate: float = 0.0,
+    malformed_rate: float = 0.0,
+    prose_rate: float = 0.0,
+    no_json_rate: float = 0.0,
+) -> FastAPI:
+    app = FastAPI()
+    counts = Counter()
+
+    @app.post("/generate")
+    async def generate(data: GenerateRequest):
+        latency = sample_latency(latency_dist, latency_s, sigma)
+        if not data.stream:
+            await asyncio.sleep(latency)
+            return reply(data.prompt)
+        # streamed: headers after the first-chunk share of the latency, the rest spread over the text
+        await asyncio.sleep(latency * STUB_FIRST_CHUNK)
+        result = reply(data.prompt)
+        if isinstance(result, JSONResponse):
+            return result
+        text = result["text"]
+        pieces = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+
+        async def chunks():
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(latency * (1 - STUB_FIRST_CHUNK) / (len(pieces) - 1))
+                yield piece
+
+        return StreamingResponse(chunks(), media_type="text/plain; charset=utf-8")
+
+    def reply(prompt: str):
+        counts["requests"] += 1
+        text = StubModel.reply(prompt)
+        roll = random.random()
+        if roll < error_rate:
+            counts["error"] += 1
+            return JSONResponse({"error": "mock upstream failure"}, status_code=random.choice([500, 503]))
+        roll -= error_rate
+        if roll < malformed_rate:
+            counts["malformed"] += 1
+            return {"text": text[: len(text) // 2]}  # cut off mid-object, like a truncated reply
+        roll -= malformed_rate
+        if roll < prose_rate:
+            counts["prose"] += 1
+            return {"text": f"Sure! Here is the classification:\n```json\n{text}\n```\nLet me know if you need more."}
+        roll -= prose_rate
+        if roll < no_json_rate:
+            counts["no_json"] += 1
+            return {"text": "I'm sorry, I can't help with that request."}
+        counts["ok"] += 1
+        return {"text": text}
+
+    @app.get("/stats")
+    def stats():
+        return dict(counts)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal shape")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share answered with HTTP 500/503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share answered with truncated JSON")
+    parser.add_argument("--prose-rate", type=float, default=0.0, help="share with JSON wrapped in prose")
+    parser.add_argument("--no-json-rate", type=float, default=0.0, help="share answered with prose only")
+    args = parser.parse_args()
+
+    app = create_app(
+        args.latency_ms / 1000, args.latency_dist, args.sigma,
+        args.error_rate, args.malformed_rate, args.prose_rate, args.no_json_rate,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
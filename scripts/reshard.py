@@ -0,0 +1,69 @@
+# scripts/reshard.py
+"""
+Move the transaction and fraud-score datasets to a different number of
+hash-by-user shards (see backend/shards.py).
+
+The new layout is written next to the live one, one source shard at a time,
+so memory use is bounded by the largest shard. Then data/shards/LAYOUT is
+switched and the old files are removed. Stop the backend first: a running
+worker keeps the layout it started with.
+
+    python -m scripts.reshard --shards 8
+    python -m scripts.reshard --shards 1    # back to the unsharded layout
+"""
+import argparse
+import os
+import shutil
+
+from backend.columnar import SCORE_SCHEMA, TXN_SCHEMA, read_dataset
+from backend.ingest import IngestLog
+from backend.shards import SHARD_ROOT, all_shards, scatter, shard_count, split_by_shard, write_layout
+from backend.store import snapshot_dir
+
+DATASETS = {"transactions": TXN_SCHEMA, "fraud_scores": SCORE_SCHEMA}
+
+
+def _shard_paths(shard) -> list[str]:
+    return [shard.directory(dataset) for dataset in DATASETS] + [snapshot_dir(shard)]
+
+
+def reshard(count: int):
+    old, new = all_shards(), all_shards(count)
+    # leftovers of an interrupted run; nothing reads the new layout yet
+    for shard in new:
+        for path in _shard_paths(shard):
+            shutil.rmtree(path, ignore_errors=True)
+
+    for dataset, schema in DATASETS.items():
+        # compaction is deferred: every source shard adds one part to each target
+        targets = [IngestLog(shard.directory(dataset), schema, compact_after=0) for shard in new]
+        for shard in old:
+            rows = read_dataset(shard.directory(dataset), schema)
+            for target, part in zip(targets, split_by_shard(rows, count)):
+                if len(part):
+                    target.append(part)
+        scatter(IngestLog.compact, targets)
+        print(f"{dataset}: {len(old)} -> {count} shard(s)")
+
+    write_layout(count)
+    for shard in old:
+        for path in _shard_paths(shard):
+            shutil.rmtree(path, ignore_errors=True)
+    if len(old) > 1:
+        shutil.rmtree(os.path.join(SHARD_ROOT, str(len(old))), ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, required=True)
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.shards == shard_count():
+        print(f"Already {args.shards} shard(s)")
+        return
+    reshard(args.shards)
+
+
+if __name__ == "__main__":
+    main()
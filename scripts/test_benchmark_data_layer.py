@@ -0,0 +1,27 @@
+# scripts/test_benchmark_data_layer.py
+from scripts.benchmark_data_layer import compare, parse_scale
+
+
+def run(load_s: float, p50_ms: float, p95_ms: float) -> dict:
+    return {"scales": {"5x1000": {
+        "load_s": {"store": load_s},
+        "ops": {"build_prompt": {"p50_ms": p50_ms, "p95_ms": p95_ms}},
+    }}}
+
+
+def test_parse_scale():
+    assert parse_scale("10000x100") == (10000, 100)
+
+
+def test_slower_beyond_the_threshold_is_a_regression():
+    regressions = compare(run(0.5, 2.0, 4.0), run(0.1, 1.0, 3.9), threshold=1.2)
+    assert regressions == [
+        "5x1000 load store: 100.000 -> 500.000 ms (5.00x)",
+        "5x1000 build_prompt p50_ms: 1.000 -> 2.000 ms (2.00x)",
+    ]
+
+
+def test_timer_noise_and_new_scales_are_ignored():
+    # 3x slower, but by less than the noise floor
+    assert compare(run(0.1, 0.15, 3.0), run(0.1, 0.05, 3.0), threshold=1.2) == []
+    assert compare(run(9.0, 9.0, 9.0), {"scales": {}}, threshold=1.2) == []
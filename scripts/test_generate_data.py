@@ -0,0 +1,58 @@
+# scripts/test_generate_data.py
+import pyarrow.parquet as pq
+import pytest
+
+from backend import shards
+from backend.columnar import ACCOUNTS_PATH, BASE_NAME, TXN_SCHEMA, read_accounts, read_dataset
+from backend.ingest import ShardedLog
+from backend.shards import shard_of
+from scripts import generate_data
+
+
+@pytest.fixture
+def generate(tmp_path, monkeypatch):
+    # the generator writes to the relative data/ paths
+    monkeypatch.chdir(tmp_path)
+    # chunks of four users, so the stream has several of them
+    monkeypatch.setattr(generate_data, "ROW_GROUP_ROWS", 100)
+
+    def run(n_users: int, tx_per_user: int, shard_count: int = 1, seed: int = 0) -> ShardedLog:
+        monkeypatch.setattr(shards, "_count", shard_count)
+        generate_data.generate_at_scale(n_users, tx_per_user, workers=2, seed=seed)
+        return ShardedLog("transactions", TXN_SCHEMA)
+    return run
+
+
+def test_every_user_gets_an_account_and_their_transactions(generate):
+    log = generate(10, 25)
+    accounts = read_accounts(ACCOUNTS_PATH)
+    assert list(accounts["user_id"]) == [f"user_{i:03d}" for i in range(1, 11)]
+    txns = log.read()
+    assert len(txns) == 250 and txns["txn_id"].is_unique
+    assert txns.groupby("user_id", observed=True).size().eq(25).all()
+    assert set(txns["label_fraud"]) <= {0, 1}
+
+
+def test_the_base_is_in_user_then_newest_first_order(generate):
+    log = generate(10, 25)
+    directory = log.logs[0].directory
+    txns = read_dataset(directory, TXN_SCHEMA)
+    assert txns["user_id"].astype(str).is_monotonic_increasing
+    for _, rows in txns.groupby("user_id", observed=True):
+        assert rows["timestamp"].is_monotonic_decreasing
+    # one row group per generated chunk
+    assert pq.ParquetFile(f"{directory}/{BASE_NAME}").metadata.num_row_groups == 3
+
+
+def test_rows_land_in_their_users_shard(generate):
+    log = generate(10, 25, shard_count=2)
+    for index, shard_log in enumerate(log.logs):
+        users = set(read_dataset(shard_log.directory, TXN_SCHEMA)["user_id"].astype(str))
+        assert users and all(shard_of(user, 2) == index for user in users)
+
+
+def test_the_same_seed_generates_the_same_accounts(generate):
+    generate(6, 25, seed=7)
+    first = read_accounts(ACCOUNTS_PATH).drop(columns="opened_at")
+    generate(6, 25, seed=7)
+    assert read_accounts(ACCOUNTS_PATH).drop(columns="opened_at").equals(first)
@@ -0,0 +1,56 @@
+# scripts/test_mock_llm_server.py
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.analyzer import InvalidReply, parse_response
+from scripts.load_test import summarize
+from scripts.mock_llm_server import create_app, sample_latency
+
+PROMPT = "USER MESSAGE: someone stole my card\nBased on the above"
+
+
+def generate(**faults) -> tuple[int, dict]:
+    client = TestClient(create_app(latency_s=0, **faults))
+    response = client.post("/generate", json={"prompt": PROMPT})
+    return response.status_code, response.json()
+
+
+def test_answers_like_the_stub_model():
+    status, body = generate()
+    assert status == 200
+    assert parse_response(body["text"])["priority"] == "HIGH"
+
+
+def test_streamed_text_is_the_same_reply():
+    client = TestClient(create_app(latency_s=0))
+    streamed = client.post("/generate", json={"prompt": PROMPT, "stream": True})
+    assert streamed.headers["content-type"].startswith("text/plain")
+    assert streamed.text == client.post("/generate", json={"prompt": PROMPT}).json()["text"]
+    assert client.get("/stats").json() == {"requests": 2, "ok": 2}
+
+
+def test_injected_faults():
+    status, _ = generate(error_rate=1.0)
+    assert status in (500, 503)
+    assert parse_response(generate(prose_rate=1.0)[1]["text"])["priority"] == "HIGH"
+    for faults in ({"malformed_rate": 1.0}, {"no_json_rate": 1.0}):
+        with pytest.raises(InvalidReply):
+            parse_response(generate(**faults)[1]["text"])
+
+
+@pytest.mark.parametrize("dist", ["fixed", "uniform", "exponential", "lognormal"])
+def test_latencies_are_non_negative(dist):
+    assert all(sample_latency(dist, 0.1) >= 0 for _ in range(100))
+
+
+def test_summary_counts_fallbacks_among_successes():
+    results = [
+        {"latency": 0.1, "status": 200, "answered_by": "llm"},
+        {"latency": 0.3, "status": 200, "answered_by": "fallback"},
+        {"latency": 5.0, "status": 503, "answered_by": None},
+    ]
+    summary = summarize(results, elapsed=2.0)
+    assert summary["throughput_rps"] == 1.0
+    assert summary["status"] == {"200": 2, "503": 1}
+    assert summary["fallback_rate"] == 0.5
+    assert summary["latency_ms"]["max"] == 300.0